@@ -1,5 +1,4 @@
 from abc import ABCMeta, abstractmethod
-import subprocess
 
 class Generator(object):
     __metaclass__ = ABCMeta
@@ -12,18 +11,8 @@ class Generator(object):
         return config['videomode']
 
     def getMouseMode(self, config, rom=None):
-        # Check if /usr/bin/batocera-version exists
-        if subprocess.call(['which', 'batocera-version'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) != 0:
-            return False
-        else:
-            # Get batocera version and compare
-            process = subprocess.Popen(['batocera-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            out, err = process.communicate()
-            if process.returncode == 0 and out:
-                version = int(out.decode('utf-8').strip()[:2])
-                if version >= 39 and rom is not None:
-                    return False
-            return False
+        # no switch emulator needs the mouse, whatever the batocera version
+        return False
 
     def executionDirectory(self, config, rom):
         return None
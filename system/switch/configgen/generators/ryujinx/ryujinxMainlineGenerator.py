@@ -13,6 +13,8 @@ import controllersConfig as controllersConfig
 from shutil import copyfile
 from utils.logger import get_logger
 import subprocess
+import time
+from switchutils import firmwareInstaller, gpuProfile, hostInfo, launchMetrics, slots, titleIndex
 
 
 eslog = get_logger(__name__)
@@ -20,16 +22,12 @@ eslog = get_logger(__name__)
 class RyujinxMainlineGenerator(Generator):
 
     def generate(self, system, rom, playersControllers, gameResolution):
+        #the launcher script of the shell updater, it runs the binary of the current install slot
+        appimage = str(slots.appImage(slots.EMULATORS.get(system.config['emulator'], "RYUJINX")))
         #handles chmod so you just need to download Ryujinx.AppImage
-        if os.path.exists("/userdata/system/switch/Ryujinx.AppImage"):
-            st = os.stat("/userdata/system/switch/Ryujinx.AppImage")
-            os.chmod("/userdata/system/switch/Ryujinx.AppImage", st.st_mode | stat.S_IEXEC)
-        if os.path.exists("/userdata/system/switch/Ryujinx-Avalonia.AppImage"):
-            st = os.stat("/userdata/system/switch/Ryujinx-Avalonia.AppImage")
-            os.chmod("/userdata/system/switch/Ryujinx-Avalonia.AppImage", st.st_mode | stat.S_IEXEC)
-        if os.path.exists("/userdata/system/switch/Ryujinx-LDN.AppImage"):
-            st = os.stat("/userdata/system/switch/Ryujinx-LDN.AppImage")
-            os.chmod("/userdata/system/switch/Ryujinx-LDN.AppImage", st.st_mode | stat.S_IEXEC)  
+        if os.path.exists(appimage):
+            st = os.stat(appimage)
+            os.chmod(appimage, st.st_mode | stat.S_IEXEC)
 
         if not path.isdir(path.join(batoceraPaths.CONFIGS, "Ryujinx")):
             os.mkdir(path.join(batoceraPaths.CONFIGS, "Ryujinx"))
@@ -42,25 +40,26 @@ class RyujinxMainlineGenerator(Generator):
         firstrun = True
         if path.exists(RyujinxConfig):
             firstrun = False
-        #First Run - Open Ryujinx for firmware install if it's never existed before
+        #First Run - install the firmware from the bios folder directly into the NAND
+        #Only open Ryujinx for a manual firmware install if there is none to install
+        if firstrun and firmwareInstaller.ensureFirmware():
+            firstrun = False
+
+        #Only the rom and its updates/DLC are listed, Ryujinx doesn't scan the library
+        gameDirs = None
+        if not (system.isOptSet('launch_view') and system.config["launch_view"] == '0'):
+            try:
+                gameDirs = titleIndex.launchView(rom)
+            except OSError as e:
+                eslog.warning(f"unable to link the game files: {e}")
 
         #Configuration update
-        RyujinxMainlineGenerator.writeRyujinxConfig(RyujinxConfig, system, playersControllers)
+        RyujinxMainlineGenerator.writeRyujinxConfig(RyujinxConfig, system, playersControllers, gameDirs)
 
         if firstrun:  #Run Ryujinx with no rom so users can install firmware
-            if system.config['emulator'] == 'ryujinx-avalonia':
-                commandArray = ["/userdata/system/switch/Ryujinx-Avalonia.AppImage"]
-            elif system.config['emulator'] == 'ryujinx-ldn':
-                commandArray = ["/userdata/system/switch/Ryujinx-LDN.AppImage"]
-            else:
-                commandArray = ["/userdata/system/switch/Ryujinx.AppImage"]
+            commandArray = [appimage]
         else:
-            if system.config['emulator'] == 'ryujinx-avalonia':
-                commandArray = ["/userdata/system/switch/Ryujinx-Avalonia.AppImage" , rom]
-            elif system.config['emulator'] == 'ryujinx-ldn':
-                commandArray = ["/userdata/system/switch/Ryujinx-LDN.AppImage" , rom]
-            else:
-                commandArray = ["/userdata/system/switch/Ryujinx.AppImage" , rom]
+            commandArray = [appimage , rom]
         eslog.debug("Controller Config before Playing: {}".format(controllersConfig.generateSdlGameControllerConfig(playersControllers)))
         #, "SDL_GAMECONTROLLERCONFIG": controllersConfig.generateSdlGameControllerConfig(playersControllers)
         return Command.Command(
@@ -68,23 +67,19 @@ class RyujinxMainlineGenerator(Generator):
             env={"XDG_CONFIG_HOME":RyujinxHome, "XDG_CACHE_HOME":batoceraPaths.CACHE, "QT_QPA_PLATFORM":"xcb", "SDL_GAMECONTROLLERCONFIG": controllersConfig.generateSdlGameControllerConfig(playersControllers)}
             )
 
-    def writeRyujinxConfig(RyujinxConfigFile, system, playersControllers):
+    def writeRyujinxConfig(RyujinxConfigFile, system, playersControllers, gameDirs=None):
 
-        #Get ryujinx version
+        #Get ryujinx version, from the host snapshot
+        ryu_version = hostInfo.host().emulatorVersion(slots.EMULATORS.get(system.config['emulator'], "RYUJINX"))
         if system.config['emulator'] == 'ryujinx-avalonia':
-            filename = "/userdata/system/switch/extra/ryujinxavalonia/version.txt"
             os.environ["PYSDL2_DLL_PATH"] = "/userdata/system/switch/extra/ryujinxavalonia/"
         elif system.config['emulator'] == 'ryujinx-ldn':
-            filename = "/userdata/system/switch/extra/ryujinxldn/version.txt"
             os.environ["PYSDL2_DLL_PATH"] = "/userdata/system/switch/extra/ryujinxldn/"
         else:
-            filename = "/userdata/system/switch/extra/ryujinx/version.txt"
             os.environ["PYSDL2_DLL_PATH"] = "/userdata/system/switch/extra/ryujinx/"
             
-        if os.path.exists(filename):
-            file = open(filename, 'r')
-            ryu_version = int(file.readline())
-            file.close()
+        if ryu_version is not None and ryu_version.isdigit():
+            ryu_version = int(ryu_version)
         else:
             ryu_version = 382
         #import SDL to try and guess controller order
@@ -140,13 +135,15 @@ class RyujinxMainlineGenerator(Generator):
 
         data['logging_enable_debug'] = bool(0)
         data['logging_enable_stub'] = bool(0)
-        data['logging_enable_info'] = bool(0)
-        data['logging_enable_warn'] = bool(0)
+        # the log analyzer follows the shader cache and PPTC lines of the output
+        analyzed = system.isOptSet('log_analyzer') and system.config["log_analyzer"] == '1'
+        data['logging_enable_info'] = analyzed
+        data['logging_enable_warn'] = analyzed
         data['logging_enable_error'] = bool(0)
         data['logging_enable_trace'] = bool(0)
         data['logging_enable_guest'] = bool(0)
         data['logging_enable_fs_access_log'] = bool(0)
-        data['logging_filtered_classes'] = []
+        data['logging_filtered_classes'] = ['Gpu', 'Ptc'] if analyzed else []
         data['logging_graphics_debug_level'] = 'None'
 
         if system.isOptSet('system_language'):
@@ -237,7 +234,7 @@ class RyujinxMainlineGenerator(Generator):
         data['show_console'] = bool('true')
         data['enable_keyboard'] = bool(0)
         data['enable_mouse'] = bool(0)
-        data['game_dirs'] = ["/userdata/roms/switch"]
+        data['game_dirs'] = [str(gameDirs) if gameDirs is not None else "/userdata/roms/switch"]
         data['keyboard_config'] = []
         data['controller_config'] = []
         hotkeys = {}
@@ -274,13 +271,7 @@ class RyujinxMainlineGenerator(Generator):
             if not os.path.exists(filename_sdl2):
                 os.replace(filename_sdl2_configgen, filename_sdl2)
 
-            filename = "/userdata/system/switch/configgen/debugcontrollers.txt"
-            if os.path.exists(filename):
-                file = open(filename, 'r')
-                debugcontrollers = bool(file.readline())
-                file.close()
-            else:
-                debugcontrollers = False
+            debugcontrollers = hostInfo.host().debug.get("controllers", False)
             
             if debugcontrollers:
                 eslog.debug("=====================================================Start Bato Controller Debug Info=========================================================")
@@ -296,6 +287,8 @@ class RyujinxMainlineGenerator(Generator):
                 eslog.debug("=====================================================End Bato Controller Debug Info===========================================================")
                 eslog.debug("")
 
+            # the probe, sdl2 import included, is reported in the launch metrics
+            sdl_probe = time.monotonic()
             import sdl2
             from sdl2 import (
                 SDL_TRUE
@@ -376,6 +369,7 @@ class RyujinxMainlineGenerator(Generator):
                         sdl_devices.append(controller_value)
                         sdl2.SDL_GameControllerClose(pad)
             sdl2.SDL_Quit()
+            launchMetrics.recorder.add("sdl_probe", time.monotonic() - sdl_probe)
 
             eslog.debug("Joysticks: {}".format(sdl_devices))
             #New Logic
@@ -688,11 +682,11 @@ class RyujinxMainlineGenerator(Generator):
         else:
             data['enable_texture_recompression'] = False
 
-        #Vulkan or OpenGl
+        #Vulkan or OpenGl, picked from the gpu when unset
         if system.isOptSet('ryu_backend'):
             data['graphics_backend'] = system.config["ryu_backend"]
         else:
-            data['graphics_backend'] = 'Vulkan'
+            data['graphics_backend'] = gpuProfile.defaults(system).get("ryu_backend", 'Vulkan')
 
         #Audio backend: SDL2 or OpenAL
         if system.isOptSet('ryu_audio_backend'):
@@ -20,6 +20,8 @@ from configgen.controller import generate_sdl_game_controller_config
 from ..Generator import Generator
 
 from . import yuzuControllers
+from switchutils import firmwareInstaller, gpuProfile, titleIndex
+from switchutils.firmwareSync import YUZU_NAND
 from .yuzuPaths import YUZU_CONFIG, YUZU_FIRMWARE, YUZU_KEYS, YUZU_ROMDIR, YUZU_SAVES, YUZU_APPIMAGE, YUZU_EA_APPIMAGE
 
 if TYPE_CHECKING:
@@ -50,8 +52,23 @@ class YuzuGenerator(Generator):
         if len(paths) >= 1:
             rom_path = paths[0]
 
+        # Only the rom and its updates/DLC are listed, yuzu doesn't scan the library
+        game_dirs = []
+        if not (system.isOptSet('launch_view') and system.config["launch_view"] == '0'):
+            try:
+                view = titleIndex.launchView(rom)
+            except OSError as e:
+                eslog.warning(f"unable to link the game files: {e}")
+                view = None
+            if view is not None:
+                game_dirs = [view]
+
         # Create the settings file
-        YuzuGenerator.YuzuConfig(YUZU_CONFIG / "qt-config.ini", system, players_controllers)
+        YuzuGenerator.YuzuConfig(YUZU_CONFIG / "qt-config.ini", system, players_controllers, game_dirs)
+
+        # Install the bios firmware into the NAND if it's missing, an existing one is left to the scheduler
+        if not firmwareInstaller.hasFirmware(YUZU_NAND):
+            firmwareInstaller.ensureFirmware([YUZU_NAND])
 
         # Set-up the controllers
         yuzuControllers.generateControllerConfig(system, players_controllers, YUZU_CONFIG / "qt-config.ini")
@@ -82,7 +99,7 @@ class YuzuGenerator(Generator):
         return Command.Command(array=commandArray, env=environment_variables)
 
     @staticmethod
-    def YuzuConfig(yuzu_config_file, system, players_controllers):
+    def YuzuConfig(yuzu_config_file, system, players_controllers, game_dirs=None):
         # Write the Yuzu configuration file.
 
         eslog.info("Writing Yuzu configuration...")
@@ -128,12 +145,17 @@ class YuzuGenerator(Generator):
         yuzu_config.set("UI", "hideInactiveMouse\\default", "true")
         
         # Roms path (need for load update/dlc)
-        yuzu_config.set("UI", "Paths\\gamedirs\\1\\deep_scan", "true")
-        yuzu_config.set("UI", "Paths\\gamedirs\\1\\deep_scan\\default", "false")
-        yuzu_config.set("UI", "Paths\\gamedirs\\1\\expanded", "true")
-        yuzu_config.set("UI", "Paths\\gamedirs\\1\\expanded\\default", "true")
-        yuzu_config.set("UI", "Paths\\gamedirs\\1\\path", YUZU_ROMDIR)
-        yuzu_config.set("UI", "Paths\\gamedirs\\size", "1")
+        # without the launch view the whole library is deep scanned
+        deep_scan = "false" if game_dirs else "true"
+        for key in [k for k in yuzu_config.options("UI") if k.startswith("Paths\\gamedirs\\")]:
+            yuzu_config.remove_option("UI", key)
+        for number, game_dir in enumerate(game_dirs or [YUZU_ROMDIR], 1):
+            yuzu_config.set("UI", f"Paths\\gamedirs\\{number}\\deep_scan", deep_scan)
+            yuzu_config.set("UI", f"Paths\\gamedirs\\{number}\\deep_scan\\default", "false")
+            yuzu_config.set("UI", f"Paths\\gamedirs\\{number}\\expanded", "true")
+            yuzu_config.set("UI", f"Paths\\gamedirs\\{number}\\expanded\\default", "true")
+            yuzu_config.set("UI", f"Paths\\gamedirs\\{number}\\path", str(game_dir))
+        yuzu_config.set("UI", "Paths\\gamedirs\\size", str(len(game_dirs or [YUZU_ROMDIR])))
 
         yuzu_config.set("UI", "Screenshots\\enable_screenshot_save_as", "true")
         yuzu_config.set("UI", "Screenshots\\enable_screenshot_save_as\\default", "true")
@@ -188,18 +210,21 @@ class YuzuGenerator(Generator):
             yuzu_config.set("Renderer", "aspect_ratio", "0")
             yuzu_config.set("Renderer", "aspect_ratio\\default", "true")
 
+        # Graphics defaults picked from the gpu for the options left unset
+        gpu_defaults = gpuProfile.defaults(system)
+
         # Graphical backend
         if system.isOptSet('yuzu_backend'):
             yuzu_config.set("Renderer", "backend", system.config["yuzu_backend"])
         else:
-            yuzu_config.set("Renderer", "backend", "0")
+            yuzu_config.set("Renderer", "backend", gpu_defaults.get("yuzu_backend", "0"))
         yuzu_config.set("Renderer", "backend\\default", "false")
 
         # Async Shader compilation
         if system.isOptSet('async_shaders'):
             yuzu_config.set("Renderer", "use_asynchronous_shaders", system.config["async_shaders"])
         else:
-            yuzu_config.set("Renderer", "use_asynchronous_shaders", "true")
+            yuzu_config.set("Renderer", "use_asynchronous_shaders", gpu_defaults.get("async_shaders", "true"))
         yuzu_config.set("Renderer", "use_asynchronous_shaders\\default", "false")
 
         # Assembly shaders
@@ -207,8 +232,9 @@ class YuzuGenerator(Generator):
             yuzu_config.set("Renderer", "shader_backend", system.config["shaderbackend"])
             yuzu_config.set("Renderer", "shader_backend\\default", "false")
         else:
-            yuzu_config.set("Renderer", "shader_backend", "0")
-            yuzu_config.set("Renderer", "shader_backend\\default", "true")
+            shader_backend = gpu_defaults.get("shaderbackend", "0")
+            yuzu_config.set("Renderer", "shader_backend", shader_backend)
+            yuzu_config.set("Renderer", "shader_backend\\default", "true" if shader_backend == "0" else "false")
 
         # Async Gpu Emulation
         if system.isOptSet('async_gpu'):
@@ -287,8 +313,9 @@ class YuzuGenerator(Generator):
             yuzu_config.set("Renderer", "accelerate_astc", system.config["accelerate_astc"])
             yuzu_config.set("Renderer", "accelerate_astc\\default", "false")
         else:
-            yuzu_config.set("Renderer", "accelerate_astc", "1")
-            yuzu_config.set("Renderer", "accelerate_astc\\default", "true")            
+            accelerate_astc = gpu_defaults.get("accelerate_astc", "1")
+            yuzu_config.set("Renderer", "accelerate_astc", accelerate_astc)
+            yuzu_config.set("Renderer", "accelerate_astc\\default", "true" if accelerate_astc == "1" else "false")
 
         # ASTC Texture Recompression
         if system.isOptSet('astc_recompression'):
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+# Player blocks of the [Controls] section of qt-config.ini
+# Every pad type is described by a table, compiled once into (option, template, source) rows. A rendered
+# block is a tuple of (option suffix, value) memoized on (guid, port, pad type, bindings), the caller
+# only prefixes the options with player_N. Pad types are the p<N>_pad values: 2 = left joycon,
+# 3 = right joycon, anything else = pro controller, dual joycons or handheld.
+
+LEFT_JOYCON = "2"
+RIGHT_JOYCON = "3"
+DEFAULT_PAD = "0"
+
+
+def padLayout(padType: str | None) -> str:
+    return padType if padType in (LEFT_JOYCON, RIGHT_JOYCON) else DEFAULT_PAD
+
+
+class Binding(NamedTuple):
+    type: str
+    id: str
+    value: str
+
+
+def inputBindings(inputs: Mapping) -> tuple:
+    # hashable snapshot of a batocera controller's inputs, used as the cache key
+    return tuple(sorted((name, i.type, i.id, i.value) for name, i in inputs.items()))
+
+
+def sdlBindings(sdl_mapping: Mapping) -> tuple:
+    return tuple(sorted((k, v) for k, v in sdl_mapping.items() if k.startswith(("button_", "axis_")) or k == "type"))
+
+
+def hatdirectionvalue(value):
+    return {1: "up", 4: "down", 2: "right", 8: "left"}.get(int(value))
+
+
+def setButton(key, padGuid, padInputs, controllernumber):
+    # it would be better to pass the joystick num instead of the guid because 2 joysticks may have the same guid
+    if key in padInputs:
+        input = padInputs[key]
+        if input.type == "button":
+            return "button:{},guid:{},port:{},engine:sdl".format(input.id, padGuid, controllernumber)
+        elif input.type == "hat":
+            return "hat:{},direction:{},guid:{},port:{},engine:sdl".format(input.id, hatdirectionvalue(input.value), padGuid, controllernumber)
+        elif input.type == 'axis':
+            return "threshold:0.500000,axis:{},pad:0,port:{},guid:{},engine:sdl".format(input.id, controllernumber, padGuid)
+
+
+STICK = "engine:sdl,port:{},guid:{},axis_x:{},offset_x:-0.011750,axis_y:{},offset_y:-0.027467,invert_x:{},invert_y:{},deadzone:0.150000,range:0.950000"
+
+
+def setAxis(key, padGuid, padInputs, controllernumber, axisReversed):
+    inputx = padInputs.get(key + "left")
+    inputy = padInputs.get(key + "up")
+    if inputx is None or inputy is None:
+        return "0"
+    if axisReversed == 1:
+        # left joycon
+        return STICK.format(controllernumber, padGuid, inputy.id, inputx.id, "-", "+")
+    if axisReversed == 2:
+        # right joycon
+        return STICK.format(controllernumber, padGuid, inputy.id, inputx.id, "+", "1")
+    return STICK.format(controllernumber, padGuid, inputx.id, inputy.id, "+", "+")
+
+
+# Batocera mappings: yuzu button -> es input name
+_BATOCERA_BUTTONS = {
+    "button_a": "a", "button_b": "b", "button_x": "x", "button_y": "y",
+    "button_dup": "up", "button_ddown": "down", "button_dleft": "left", "button_dright": "right",
+    "button_l": "pageup", "button_r": "pagedown", "button_plus": "start", "button_minus": "select",
+    "button_sl": "pageup", "button_sr": "pagedown", "button_lstick": "l3", "button_rstick": "r3",
+    "button_home": "hotkey", "button_zl": "l2", "button_zr": "r2",
+}
+# the joycons take the dpad from the face buttons and get a screenshot button acting as home
+_BATOCERA_REMAP = {
+    LEFT_JOYCON: {"button_dup": "y", "button_ddown": "a", "button_dleft": "b", "button_dright": "x",
+                  "button_screenshot": "hotkey"},
+    RIGHT_JOYCON: {"button_a": "b", "button_b": "y", "button_x": "a", "button_y": "x",
+                   "button_dup": "y", "button_ddown": "a", "button_dleft": "b", "button_dright": "x",
+                   "button_screenshot": "hotkey"},
+    DEFAULT_PAD: {},
+}
+# stick -> (es joystick, setAxis reversal)
+_BATOCERA_AXIS = {
+    LEFT_JOYCON: ((("lstick", "joystick1"), ("rstick", "joystick1")), 1),
+    RIGHT_JOYCON: ((("lstick", "joystick1"), ("rstick", "joystick1")), 2),
+    DEFAULT_PAD: ((("lstick", "joystick1"), ("rstick", "joystick2")), 0),
+}
+
+# SDL mappings: yuzu button -> key of the sdl_mapping probed by generateControllerConfig
+_SDL_BUTTONS = (
+    "button_a", "button_b", "button_x", "button_y", "button_l", "button_r", "button_plus", "button_minus",
+    "button_sl", "button_sr", "button_lstick", "button_rstick", "button_home",
+    "button_dup", "button_ddown", "button_dleft", "button_dright", "button_zl", "button_zr",
+)
+_SWAP_ABXY = {"button_a": "button_b", "button_b": "button_a", "button_x": "button_y", "button_y": "button_x"}
+# (pad type, swapped) -> remapped buttons, switch pads (sdl type 0) and the others don't swap ABXY the same way
+_SDL_REMAP = {
+    (LEFT_JOYCON, True): {**_SWAP_ABXY, "button_dup": "button_x", "button_ddown": "button_b",
+                          "button_dleft": "button_a", "button_dright": "button_y"},
+    (LEFT_JOYCON, False): {"button_dup": "button_y", "button_ddown": "button_a",
+                           "button_dleft": "button_b", "button_dright": "button_x"},
+    (RIGHT_JOYCON, True): {"button_b": "button_x", "button_x": "button_b", "button_rstick": "button_lstick",
+                           "button_dup": "button_x", "button_ddown": "button_b",
+                           "button_dleft": "button_a", "button_dright": "button_y"},
+    (RIGHT_JOYCON, False): {"button_a": "button_b", "button_b": "button_y", "button_x": "button_a",
+                            "button_y": "button_x", "button_rstick": "button_lstick",
+                            "button_dup": "button_x", "button_ddown": "button_b",
+                            "button_dleft": "button_a", "button_dright": "button_y"},
+    (DEFAULT_PAD, True): _SWAP_ABXY,
+    (DEFAULT_PAD, False): {},
+}
+# stick -> sdl axis, then offsets of the x/y axis from it and their inversion
+_SDL_AXIS = {
+    LEFT_JOYCON: ((("lstick", "axis_lstick_x"), ("rstick", "axis_rstick_x")), (1, 0), ("-", "+")),
+    RIGHT_JOYCON: ((("lstick", "axis_lstick_x"), ("rstick", "axis_lstick_x")), (1, 0), ("+", "-")),
+    DEFAULT_PAD: ((("lstick", "axis_lstick_x"), ("rstick", "axis_rstick_x")), (0, 1), ("+", "+")),
+}
+_SDL_HAT = {"button_dup": "up", "button_ddown": "down", "button_dleft": "left", "button_dright": "right"}
+_SDL_AXIS_BUTTONS = {"button_zl": "axis_button_zl", "button_zr": "axis_button_zr"}
+
+# Real joycons through yuzu's joycon driver: pad 1 is the left one, pad 2 the right one
+_JOYCON_BUTTONS = (
+    # (button, code, pad side)
+    ("button_l", 64, 0), ("button_minus", 65536, 0), ("button_lstick", 524288, 0),
+    ("button_screenshot", 2097152, 0), ("button_dup", 2, 0), ("button_ddown", 1, 0),
+    ("button_dleft", 8, 0), ("button_dright", 4, 0), ("button_zl", 128, 0),
+    ("button_a", 2048, 1), ("button_b", 1024, 1), ("button_x", 512, 1), ("button_y", 256, 1),
+    ("button_r", 16384, 1), ("button_plus", 131072, 1), ("button_rstick", 262144, 1),
+    ("button_home", 1048576, 1), ("button_zr", 32768, 1),
+)
+_JOYCON_SL_SR = {1: (32, 16), 2: (8192, 4096)}
+_JOYCON = "pad:{},button:{},port:{},guid:0000000000000000000000000000000{},engine:joycon"
+_JOYCON_STICK = "axis_y:{},axis_x:{},pad:{},port:{},guid:0000000000000000000000000000000{},engine:joycon"
+_JOYCON_MOTION = "motion:{},pad:{},port:{},guid:0000000000000000000000000000000{},engine:joycon"
+
+
+def _quoted(value) -> str:
+    return '"{}"'.format(value)
+
+
+def _sdlMotion(guid: str, port: int) -> tuple:
+    motion = _quoted("engine:sdl,motion:0,port:{},guid:{}".format(port, guid))
+    return ("motionleft", motion), ("motionright", motion)
+
+
+@lru_cache(maxsize=None)
+def _compileBatocera(layout: str) -> tuple:
+    buttons = {**_BATOCERA_BUTTONS, **_BATOCERA_REMAP[layout]}
+    return (tuple((key, key + "\\default", source) for key, source in buttons.items()),
+            tuple((key, key + "\\default", source) for key, source in _BATOCERA_AXIS[layout][0]),
+            _BATOCERA_AXIS[layout][1])
+
+
+@lru_cache(maxsize=None)
+def _compileSdl(layout: str, swapped: bool) -> tuple:
+    remap = _SDL_REMAP[(layout, swapped)]
+    buttons = tuple((key, key + "\\default", remap.get(key, key)) for key in _SDL_BUTTONS)
+    sticks, offsets, inverts = _SDL_AXIS[layout]
+    return buttons, sticks, offsets, inverts
+
+
+@lru_cache(maxsize=None)
+def batoceraBlock(guid: str, port: int, padType: str | None, bindings: tuple) -> tuple:
+    inputs = {name: Binding(type, id, value) for name, type, id, value in bindings}
+    buttons, sticks, reversal = _compileBatocera(padLayout(padType))
+    block = []
+    for key, default, source in buttons:
+        block += [(key, _quoted(setButton(source, guid, inputs, port))), (default, "false")]
+    for key, default, source in sticks:
+        block += [(key, _quoted(setAxis(source, guid, inputs, port, reversal))), (default, "false")]
+    return tuple(block) + _sdlMotion(guid, port)
+
+
+@lru_cache(maxsize=None)
+def sdlBlock(guid: str, port: int, padType: str | None, bindings: tuple) -> tuple:
+    mapping = dict(bindings)
+    buttons, sticks, offsets, inverts = _compileSdl(padLayout(padType), mapping["type"] == 0)
+    block = []
+    for key, default, source in buttons:
+        value = mapping[source]
+        if "hat" in str(value):
+            rendered = "{},direction:{},guid:{},port:{},engine:sdl".format(value, _SDL_HAT[key], guid, port)
+        elif "axis" in str(value):
+            rendered = "engine:sdl,invert:+,port:{},guid:{},axis:{},threshold:0.500000".format(port, guid, mapping[_SDL_AXIS_BUTTONS[key]])
+        else:
+            rendered = "button:{},guid:{},port:{},engine:sdl".format(value, guid, port)
+        block += [(key, _quoted(rendered)), (default, "false")]
+    for key, source in sticks:
+        axis = int(mapping[source])
+        block.append((key, _quoted(STICK.format(port, guid, axis + offsets[0], axis + offsets[1], *inverts))))
+    # the screenshot button stays unbound on sdl pads
+    return tuple(block) + _sdlMotion(guid, port) + (("button_screenshot", "[empty]"), ("button_screenshot\\default", "false"))
+
+
+@lru_cache(maxsize=None)
+def joyconBlock(port: int, pad1: int, pad2: int) -> tuple:
+    # pad1 == pad2 for a single joycon, 1 and 2 for a pair
+    block = [(key, _quoted(_JOYCON.format(pad, code, port, pad)))
+             for key, code, side in _JOYCON_BUTTONS for pad in ((pad1, pad2)[side],)]
+    if pad1 == pad2:
+        sl, sr = _JOYCON_SL_SR[pad1]
+        block += [("button_sl", _quoted(_JOYCON.format(pad1, sl, port, pad1))),
+                  ("button_sr", _quoted(_JOYCON.format(pad1, sr, port, pad1)))]
+    else:
+        # sl and sr not connected for dual joycon mode
+        block += [("button_sl", "[empty]"), ("button_sr", "[empty]")]
+    block += [("lstick", _quoted(_JOYCON_STICK.format(1, 0, pad1, port, pad1))),
+              ("rstick", _quoted(_JOYCON_STICK.format(3, 2, pad2, port, pad2))),
+              # enable motion no matter what, as enabling won't hurt things if it doesn't exist
+              ("motionleft", _quoted(_JOYCON_MOTION.format(0, pad1, port, pad1))),
+              ("motionright", _quoted(_JOYCON_MOTION.format(1, pad2, port, pad2)))]
+    return tuple(block)
+
+
+def _keyboard(code: int) -> str:
+    return _quoted("toggle:0,code:{},engine:keyboard".format(code))
+
+
+def _emptyPlayer() -> tuple:
+    codes = {
+        "button_a": 67, "button_b": 88, "button_ddown": 16777237, "button_dleft": 16777234,
+        "button_dright": 16777236, "button_dup": 16777235, "button_home": 0, "button_l": 81,
+        "button_lstick": 70, "button_minus": 78, "button_plus": 77, "button_r": 69, "button_rstick": 71,
+        "button_screenshot": 0, "button_sl": 81, "button_sr": 69, "button_x": 86, "button_y": 90,
+        "button_zl": 82, "button_zr": 84,
+    }
+    block = []
+    for key, code in codes.items():
+        block += [(key, _keyboard(code)), (key + "\\default", "true")]
+    block += [
+        ("lstick", '"modifier_scale:0.500000,modifier:toggle$00$1code$016777248$1engine$0keyboard,right:toggle$00$1code$068$1engine$0keyboard,left:toggle$00$1code$065$1engine$0keyboard,down:toggle$00$1code$083$1engine$0keyboard,up:toggle$00$1code$087$1engine$0keyboard,engine:analog_from_button"'),
+        ("lstick\\default", "true"),
+        ("rstick", '"modifier_scale:0.500000,modifier:toggle$00$1code$00$1engine$0keyboard,right:toggle$00$1code$076$1engine$0keyboard,left:toggle$00$1code$074$1engine$0keyboard,down:toggle$00$1code$075$1engine$0keyboard,up:toggle$00$1code$073$1engine$0keyboard,engine:analog_from_button"'),
+        ("rstick\\default", "true"),
+        ("connected", "false"), ("connected\\default", "true"),
+        ("type", "0"), ("type\\default", "true"),
+        ("vibration_enabled", "true"), ("vibration_enabled\\default", "true"),
+    ]
+    return tuple(block)
+
+
+# the keyboard defaults of the players left unplugged, the same for every one of them
+EMPTY_PLAYER = _emptyPlayer()
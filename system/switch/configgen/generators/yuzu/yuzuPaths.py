@@ -1,14 +1,15 @@
 from __future__ import annotations
 
-from pathlib import Path
 from typing import Final
 
 from configgen.batoceraPaths import BIOS, CONFIGS, ROMS, SAVES
+from switchutils import slots
 
 YUZU_CONFIG: Final = CONFIGS / "yuzu"
 YUZU_ROMDIR: Final = ROMS / "switch"
 YUZU_SAVES:  Final = SAVES / 'switch' / 'yuzu'
 YUZU_KEYS: Final = BIOS / 'switch'
 YUZU_FIRMWARE: Final = BIOS / 'switch' / 'firmware'
-YUZU_APPIMAGE: Final = Path('/userdata/system/switch/yuzu.AppImage')
-YUZU_EA_APPIMAGE: Final = Path('/userdata/system/switch/yuzuEA.AppImage')
\ No newline at end of file
+# the launcher scripts of the shell updater, they run the binary of the current install slot
+YUZU_APPIMAGE: Final = slots.appImage('YUZU')
+YUZU_EA_APPIMAGE: Final = slots.appImage('YUZUEA')
\ No newline at end of file
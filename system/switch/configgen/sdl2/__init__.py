@@ -1,48 +1,74 @@
-"""SDL2 wrapper package"""
+"""SDL2 wrapper package
+
+The submodules are imported lazily: ``sdl2.SDL_Init``, ``from sdl2 import joystick`` or
+``from sdl2 import SDL_TRUE`` only load the submodule that defines the name, so the ctypes
+prototypes of audio, render, video... are never created by the generators that don't use them.
+"""
+import importlib
+import os
+import re
+
 from .dll import get_dll_file, _bind
 
-from ._sdl_init import *
-from .audio import *
-from .blendmode import *
-from .clipboard import *
-from .cpuinfo import *
-from .endian import *
-from .error import *
-from .events import *
-from .filesystem import *
-from .gamecontroller import *
-from .gesture import *
-from .guid import *
-from .haptic import *
-from .hidapi import *
-from .hints import *
-from .joystick import *
-from .keyboard import *
-from .loadso import *
-from .log import *
-from .messagebox import *
-from .metal import *
-from .mouse import *
-from .pixels import *
-from .platform import *
-from .power import *
-from .rect import *
-from .render import *
-from .rwops import *
-from .sensor import *
-from .shape import *
-from .stdinc import *
-from .surface import *
-from .syswm import *
-from .timer import *
-from .touch import *
-from .version import *
-from .video import *
-from .locale import *
-from .misc import *
-
-from .keycode import *
-from .scancode import *
+# Same order as the former star imports, a name exported by several submodules resolves to the
+# last one like it used to.
+_SUBMODULES = (
+    "_sdl_init", "audio", "blendmode", "clipboard", "cpuinfo", "endian", "error", "events",
+    "filesystem", "gamecontroller", "gesture", "guid", "haptic", "hidapi", "hints", "joystick",
+    "keyboard", "loadso", "log", "messagebox", "metal", "mouse", "pixels", "platform", "power",
+    "rect", "render", "rwops", "sensor", "shape", "stdinc", "surface", "syswm", "timer", "touch",
+    "version", "video", "locale", "misc", "keycode", "scancode",
+)
+
+_ALL_BLOCK = re.compile(r"^__all__ = \[(.*?)^\]", re.MULTILINE | re.DOTALL)
+_STRING = re.compile(r"\"(\w+)\"")
+_FUNCDEF = re.compile(r"SDLFunc\(\"(\w+)\"")
+_ASSIGNMENT = re.compile(r"^([A-Za-z]\w*)\s*=", re.MULTILINE)
+_IMPORTED = re.compile(r"^from \S+ import ([\w, ]+)$", re.MULTILINE)
+_index = None
+
+
+def _exports(source):
+    # the names "from .module import *" binds, read from the source so nothing gets imported
+    block = _ALL_BLOCK.search(source)
+    if block is None:
+        imported = [n.strip() for names in _IMPORTED.findall(source) for n in names.split(",")]
+        return [n for n in imported if not n.startswith("_")] + _ASSIGNMENT.findall(source)
+    names = _STRING.findall(re.sub(r"#.*", "", block.group(1)))
+    names += _FUNCDEF.findall(source)
+    return names
+
+
+def _build_index():
+    global _index
+    if _index is None:
+        index = {}
+        folder = os.path.dirname(__file__)
+        for module in _SUBMODULES:
+            # through the loader, the package may be imported from the configgen bundle zip
+            source = __loader__.get_data(os.path.join(folder, module + ".py")).decode("utf-8")
+            for name in _exports(source):
+                index[name] = module
+        _index = index
+    return _index
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module("." + name, __name__)
+    if name == "__all__":
+        public = {n for n in globals() if not n.startswith("_")} - {"importlib", "os", "re"}
+        return sorted(set(_build_index()) | public | {m for m in _SUBMODULES if not m.startswith("_")})
+    module = _build_index().get(name)
+    if module is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__getattr__("__all__")))
 
 
 # At least Win32 platforms need this now.
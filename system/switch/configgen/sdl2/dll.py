@@ -1,10 +1,10 @@
 from __future__ import absolute_import
+import json
 import os
 import sys
 import warnings
 from platform import machine as cpu_arch
 from ctypes import CDLL, POINTER, Structure, c_uint8, cast, addressof
-from ctypes.util import find_library
 from ._internal import AttributeDict, prettywarn, get_pointer
 
 __all__ = ["DLL", "nullfunc"]
@@ -199,6 +199,7 @@ def _findlib(libnames, path=None):
         results = _finds_libs_at_path(libnames, path, patterns)
 
     # Next, search for library in system library search paths
+    from ctypes.util import find_library
     for libname in searchfor:
         dllfile = find_library(libname)
         if dllfile:
@@ -216,6 +217,73 @@ def _findlib(libnames, path=None):
     return results
 
 
+# Cache of library lookups, persisted between runs. find_library() may spawn ldconfig or gcc,
+# so a lookup is kept with the mtimes of everything it depends on (the searched folders,
+# ld.so.cache and the found files) and reused as long as none of them changed.
+
+_CACHE_FILE = os.getenv("PYSDL2_DLL_CACHE") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pysdl2", "dll.json")
+_LDCONFIG_CACHE = "/etc/ld.so.cache"
+_cache = None
+
+
+def _cache_key(libnames, path):
+    return "|".join([sys.platform, path or "", os.getenv("LD_LIBRARY_PATH") or "", ",".join(libnames)])
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cache_stamps(path, libfiles):
+    stamps = {_LDCONFIG_CACHE: None}
+    if path and path.lower() != "system":
+        stamps.update((subpath, None) for subpath in str.split(path, os.pathsep))
+    stamps.update((libfile, None) for libfile in libfiles if os.sep in libfile)
+    return {name: _mtime(name) for name in stamps}
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(_CACHE_FILE) as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+
+def _cached_findlib(libnames, path=None):
+    """Find libraries like _findlib, from the lookup cache when it's still valid."""
+    entry = _load_cache().get(_cache_key(libnames, path))
+    if entry is not None and all(_mtime(name) == mtime for name, mtime in entry["stamps"].items()):
+        return list(entry["libs"])
+    return _findlib(libnames, path)
+
+
+def _remember(libnames, path, libfiles, loaded):
+    """Store a lookup with the library that could be loaded first."""
+    libs = [loaded] + [libfile for libfile in libfiles if libfile != loaded]
+    key = _cache_key(libnames, path)
+    cache = _load_cache()
+    entry = {"libs": libs, "stamps": _cache_stamps(path, libs)}
+    if cache.get(key) == entry:
+        return
+    cache[key] = entry
+    try:
+        os.makedirs(os.path.dirname(_CACHE_FILE), exist_ok=True)
+        temporary = "%s.%d" % (_CACHE_FILE, os.getpid())
+        with open(temporary, "w") as f:
+            json.dump(cache, f)
+        os.replace(temporary, _CACHE_FILE)
+    except OSError:
+        pass
+
+
 # Classes for loading libraries and binding ctypes functions
 
 class SDLFunc(object):
@@ -247,7 +315,7 @@ class DLL(object):
             "SDL2_image": (2, 0, 1),
             "SDL2_gfx": (1, 0, 3)
         }
-        foundlibs = _findlib(libnames, path)
+        foundlibs = _cached_findlib(libnames, path)
         dllmsg = "PYSDL2_DLL_PATH: %s" % (os.getenv("PYSDL2_DLL_PATH") or "unset")
         if len(foundlibs) == 0:
             raise RuntimeError("could not find any library for %s (%s)" %
@@ -274,6 +342,7 @@ class DLL(object):
         if self._dll is None:
             raise RuntimeError("found %s, but it's not usable for the library %s" %
                                (foundlibs, libinfo))
+        _remember(libnames, path, foundlibs, self._libfile)
         if _using_ms_store_python():
             self._deps = _preload_deps(libinfo, self._libfile)
         if path is not None and sys.platform in ("win32",) and \
@@ -1,8 +1,9 @@
 import io
+import mmap
 import sys
 from ctypes import (
-    c_int, c_size_t, c_void_p, c_char_p, memmove, string_at, CFUNCTYPE,
-    Structure, Union, _Pointer
+    c_int, c_size_t, c_void_p, c_char, c_char_p, memmove, string_at, CFUNCTYPE,
+    Structure, Union, _Pointer, addressof, cast
 )
 from ctypes import POINTER as _P
 from .dll import _bind, SDLFunc, AttributeDict, version
@@ -18,7 +19,7 @@ __all__ = [
     "RW_SEEK_SET", "RW_SEEK_CUR", "RW_SEEK_END",
     
     # Python Functions
-    "rw_from_object",
+    "rw_from_object", "rw_from_buffer", "rw_from_mmap",
 ]
 
 def _ptr2obj(ptr):
@@ -298,3 +299,54 @@ def rw_from_object(obj):
     else:
         rwops.write = _sdlwrite()
     return rwops
+
+
+def rw_from_buffer(obj):
+    """Creates a read-only SDL_RWops over a buffer without copying it.
+
+    ``obj`` can be any object supporting the buffer protocol: bytes,
+    bytearray, memoryview, mmap... SDL reads the memory directly through
+    :func:`SDL_RWFromConstMem`, no Python callback is involved. Bytes and
+    writable buffers are used in place, other read-only buffers are copied
+    once.
+
+    The buffer is kept alive by the returned pointer, which must be freed
+    with :func:`SDL_RWclose` or by passing ``freesrc=1`` to the function
+    reading it, like any SDL_RWops created by SDL.
+
+    """
+    view = memoryview(obj).cast("B")
+    size = view.nbytes
+    if size == 0 or size > 0x7FFFFFFF:
+        raise ValueError("buffer size must be between 1 byte and 2 GiB")
+    if isinstance(obj, bytes):
+        data = obj
+        address = cast(c_char_p(obj), c_void_p)
+    elif not view.readonly:
+        data = (c_char * size).from_buffer(view)
+        address = addressof(data)
+    else:
+        data = (c_char * size).from_buffer_copy(view)
+        address = addressof(data)
+    rw = SDL_RWFromConstMem(address, size)
+    if not rw:
+        raise RuntimeError("SDL_RWFromConstMem failed")
+    # ties the lifetime of the memory to the RWops
+    rw._source = (obj, view, data)
+    return rw
+
+
+def rw_from_mmap(path):
+    """Creates a read-only SDL_RWops over a memory-mapped file.
+
+    The file is mapped copy-on-write, pages are only read from disk when SDL
+    accesses them and nothing is copied into Python memory. The mapping is
+    released once the returned pointer has been freed with
+    :func:`SDL_RWclose` (or ``freesrc=1``) and garbage collected.
+
+    """
+    if isinstance(path, bytes):
+        path = path.decode("utf-8")
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    return rw_from_buffer(mapping)
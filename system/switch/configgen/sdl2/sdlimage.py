@@ -4,7 +4,7 @@ from ctypes import POINTER as _P
 from .dll import DLL, SDLFunc, AttributeDict
 from .version import SDL_version, SDL_VERSIONNUM
 from .surface import SDL_Surface
-from .rwops import SDL_RWops
+from .rwops import SDL_RWops, rw_from_buffer, rw_from_mmap
 from .render import SDL_Texture, SDL_Renderer
 from .error import SDL_SetError, SDL_GetError
 
@@ -25,7 +25,7 @@ __all__ = [
     "IMG_GetError", "IMG_SetError",
     
     # Python Functions
-    "get_dll_file"
+    "get_dll_file", "IMG_Load_RW_mmap", "IMG_Load_RW_buffer",
 ]
 
 
@@ -359,6 +359,41 @@ def IMG_Load_RW(src, freesrc):
     """
     return _ctypes["IMG_Load_RW"](src, freesrc)
 
+def IMG_Load_RW_mmap(file):
+    """Loads an image file to a new surface through a memory mapping.
+
+    Same as :func:`IMG_Load`, but the file is memory-mapped and handed to
+    :func:`IMG_Load_RW` with :func:`~sdl2.rwops.rw_from_mmap`: the decoder
+    reads the pages directly, without Python callbacks or an intermediate
+    copy of the file. The mapping is released once the image is decoded.
+    Unlike :func:`IMG_Load`, TGA files are not supported.
+
+    Args:
+        file (str or bytes): The path of the image file to load.
+
+    Returns:
+        POINTER(:obj:`SDL_Surface`): A pointer to the new surface containing the
+        image, or a null pointer if there was an error.
+
+    """
+    return _ctypes["IMG_Load_RW"](rw_from_mmap(file), 1)
+
+def IMG_Load_RW_buffer(buffer):
+    """Loads an image from an in-memory buffer to a new surface.
+
+    ``buffer`` can be any object supporting the buffer protocol (bytes,
+    bytearray, memoryview, mmap...), see :func:`~sdl2.rwops.rw_from_buffer`.
+
+    Args:
+        buffer: The encoded image data.
+
+    Returns:
+        POINTER(:obj:`SDL_Surface`): A pointer to the new surface containing the
+        image, or a null pointer if there was an error.
+
+    """
+    return _ctypes["IMG_Load_RW"](rw_from_buffer(buffer), 1)
+
 def IMG_LoadTexture(renderer, file):
     """Loads an image file to a new texture using a given renderer.
     
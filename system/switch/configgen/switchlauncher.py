@@ -3,11 +3,24 @@
 # Code is emulatorlauncher.py from Batocera 35 with minor changes to generator importer
 # Added for Switch Add-On
 
+import os
+import sys
+
+# startup-optimised mode: the modules are imported from the precompiled bundle of switchutils/bundle.py
+# rather than from the folders of /userdata, as long as it was built after this file was updated.
+# The updater removes the bundle whenever it rewrites configgen
+_bundle = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       f"configgen.{sys.implementation.cache_tag}.zip")
+try:
+    if os.stat(_bundle).st_mtime >= os.stat(__file__).st_mtime:
+        sys.path.insert(0, _bundle)
+except OSError:
+    pass
+
 from configgen.types import DeviceInfoDict, GunDict, Resolution
 from configgen.Command import Command
 from generators.Generator import Generator
 from collections.abc import Iterable, Mapping
-import os
 from batoceraPaths import SAVES, SYSTEM_SCRIPTS, USER_SCRIPTS
 from configgen.Emulator import Emulator
 from configgen.controller import Controller
@@ -24,10 +37,10 @@ import subprocess
 import time
 import signal
 import GeneratorImporter
+from switchutils import frameTimes, launchMetrics, logAnalyzer, maintenance, nszCache, sessionSampler, titleIndex
 import argparse
-import platform
-from packaging import version
 
+# platform and packaging.version are only needed by this check, they aren't imported any more
 # if version.parse(platform.release()) < version.parse("6.1.18"):
 #     import sys
 #     sys.path.append('/usr/lib/python3.10/site-packages/configgen/')
@@ -62,13 +75,17 @@ def main(args: argparse.Namespace, maxnbplayers: int) -> int:
 
 
 def start_rom(args: argparse.Namespace, maxnbplayers: int, rom: str, romConfiguration: str) -> int:
+    metrics = launchMetrics.recorder
+
     # Initialize player controllers
-    player_controllers = Controller.load_for_players(maxnbplayers, args)
+    with metrics.phase("controllers"):
+        player_controllers = Controller.load_for_players(maxnbplayers, args)
 
     # find the system to run
     systemName = args.system
     eslog.debug(f"Running system: {systemName}")
-    system = Emulator(systemName, romConfiguration)
+    with metrics.phase("settings"):
+        system = Emulator(systemName, romConfiguration)
 
     if args.emulator is not None:
         system.config["emulator"] = args.emulator
@@ -87,6 +104,8 @@ def start_rom(args: argparse.Namespace, maxnbplayers: int, rom: str, romConfigur
         if "emulator" in system.config:
             eslog.debug("emulator: {}".format(system.config["emulator"]))
 
+    metrics.configure(system, romConfiguration)
+
     # metadata
     metadata = controllers.getGamesMetaData(systemName, rom)
 
@@ -118,6 +137,8 @@ def start_rom(args: argparse.Namespace, maxnbplayers: int, rom: str, romConfigur
     resolutionChanged = False
     mouseChanged = False
     exitCode = -1
+    # the updater, firmware and nsz jobs pause until the game exits
+    maintenance.publish(system.config['emulator'], romConfiguration)
     try:
         # lower the resolution if mode is auto
         # newsystemmode is the mode after minmax (ie in 1K if tv was in 4K), systemmode is the mode before (ie in es)
@@ -195,17 +216,19 @@ def start_rom(args: argparse.Namespace, maxnbplayers: int, rom: str, romConfigur
         subprocess.run(["unclutter-remote", "-s"])
         
         # run a script before emulator starts
-        callExternalScripts(SYSTEM_SCRIPTS, "gameStart", [
-                            systemName, system.config['emulator'], effectiveCore, effectiveRom])
-        callExternalScripts(USER_SCRIPTS, "gameStart", [
-                            systemName, system.config['emulator'], effectiveCore, effectiveRom])
+        with metrics.phase("game_start_scripts"):
+            callExternalScripts(SYSTEM_SCRIPTS, "gameStart", [
+                                systemName, system.config['emulator'], effectiveCore, effectiveRom])
+            callExternalScripts(USER_SCRIPTS, "gameStart", [
+                                systemName, system.config['emulator'], effectiveCore, effectiveRom])
 
         # run the emulator
         from configgen.utils.evmapy import evmapy
         with (
             evmapy(systemName, system.config['emulator'], effectiveCore,
                    effectiveRomConfiguration, player_controllers, guns),
-            set_hotkeygen_context(generator)
+            set_hotkeygen_context(generator),
+            nszCache.launchRom(system, rom) as rom
         ):
             # change directory if wanted
             executionDirectory = generator.executionDirectory(
@@ -214,12 +237,14 @@ def start_rom(args: argparse.Namespace, maxnbplayers: int, rom: str, romConfigur
                 os.chdir(executionDirectory)
 
             # Generate command
-            cmd = generator.generate(
-                system, rom, player_controllers, gameResolution)
+            with metrics.generating():
+                cmd = generator.generate(
+                    system, rom, player_controllers, gameResolution)
 
             # Bezels
-            hud_bezel = getHudBezel(system, generator, rom, gameResolution, controllers.gunsBordersSizeName(
-                guns, system.config), controllers.gunsBorderRatioType(guns, system.config))
+            with metrics.phase("bezel"):
+                hud_bezel = getHudBezel(system, generator, rom, gameResolution, controllers.gunsBordersSizeName(
+                    guns, system.config), controllers.gunsBorderRatioType(guns, system.config))
             if (system.isOptSet('hud') and system.config['hud'] != "" and system.config['hud'] != "none") or hud_bezel is not None:
                 gameinfos = extractGameInfosFromXml(args.gameinfoxml)
                 cmd.env["MANGOHUD_DLSYM"] = "1"
@@ -231,10 +256,22 @@ def start_rom(args: argparse.Namespace, maxnbplayers: int, rom: str, romConfigur
                 cmd.env["MANGOHUD_CONFIGFILE"] = hud_config_file
                 if not generator.hasInternalMangoHUDCall():
                     cmd.array.insert(0, "mangohud")
+            # frame times logged by mangohud, with or without a hud shown
+            frames = frameTimes.fromConfig(system, metrics.record.started_at)
+            if frames is not None:
+                frames.attach(cmd, generator.hasInternalMangoHUDCall())
 
+            sampler = sessionSampler.fromConfig(system, metrics.record.started_at)
+            analyzer = logAnalyzer.fromConfig(system)
             if _profiler:
                 _profiler.disable()
-            exitCode = runCommand(cmd)
+            exitCode = runCommand(cmd, sampler, analyzer)
+            if sampler is not None:
+                metrics.record.resources = sampler.summary
+            if analyzer is not None:
+                metrics.record.log_events = analyzer.report()
+            if frames is not None:
+                metrics.record.frame_times = frames.finish(system, systemName, romConfiguration)
             if _profiler:
                 _profiler.enable()
 
@@ -244,7 +281,22 @@ def start_rom(args: argparse.Namespace, maxnbplayers: int, rom: str, romConfigur
         callExternalScripts(SYSTEM_SCRIPTS, "gameStop", [
                             systemName, system.config['emulator'], effectiveCore, effectiveRom])
 
+        # saves the game changed are snapshotted, a game that saved nothing costs a directory walk
+        if not (system.isOptSet('save_snapshots') and system.config['save_snapshots'] == "0"):
+            from switchutils import saveSnapshots
+            with metrics.phase("save_snapshot"):
+                saveSnapshots.fromConfig(system, rom)
+
+        # the session is written to the database while the launcher winds down
+        if not (system.isOptSet('session_db') and system.config['session_db'] == "0"):
+            from switchutils import sessionDb
+            sessionDb.writer.add(metrics.record)
+            sessionDb.writer.flush()
+
     finally:
+        maintenance.release()
+        titleIndex.removeView()
+
         # always restore the resolution
         if resolutionChanged:
             try:
@@ -387,6 +439,21 @@ def getHudBezel(system: Emulator, generator: Generator, rom: str, gameResolution
         bezel_stretch = True
     else:
         bezel_stretch = False
+
+    # sdl compositor: resize, tattoo and borders in a single decode/encode pass
+    if system.isOptSet('bezel_compositor') and system.config['bezel_compositor'] == "sdl":
+        if (bezel_width != gameResolution["width"] or bezel_height != gameResolution["height"]) or \
+                (system.isOptSet('bezel.tattoo') and system.config['bezel.tattoo'] != "0") or bordersSize is not None:
+            try:
+                from switchutils import bezelCompositor
+                overlay_png_file = bezelCompositor.composeFromConfig(system, overlay_png_file, Path("/tmp/bezel_composed.png"),
+                                                                     gameResolution["width"], gameResolution["height"],
+                                                                     bezel_stretch, bordersSize, bordersRatio)
+                eslog.debug(f"applying bezel {overlay_png_file}")
+                return overlay_png_file
+            except Exception as e:
+                eslog.warning(f"sdl bezel compositor failed, falling back to PIL: {e}")
+
     if (bezel_width != gameResolution["width"] or bezel_height != gameResolution["height"]):
         eslog.debug("bezel needs to be resized")
         output_png_file = Path("/tmp/bezel.png")
@@ -509,7 +576,8 @@ def getHudConfig(system: Emulator, systemName: str, emulator: str, core: str, ro
     return configstr
 
 # Execute command to launch game
-def runCommand(command: Command) -> int:
+def runCommand(command: Command, sampler: sessionSampler.Sampler | None = None,
+               analyzer: logAnalyzer.LogAnalyzer | None = None) -> int:
     global proc
 
     # compute environment : first the current envs, then override by values set at generator level
@@ -524,11 +592,20 @@ def runCommand(command: Command) -> int:
     if command.array:
         proc = subprocess.Popen(
             command.array, env=command.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        launchMetrics.recorder.started()
+        if sampler is not None:
+            sampler.start(proc.pid)
     else:
         return exitcode
     try:
-        out, err = proc.communicate()
+        if analyzer is not None:
+            out, err = analyzer.follow(proc)
+        else:
+            out, err = proc.communicate()
         exitcode = proc.returncode
+        launchMetrics.recorder.stopped(exitcode)
+        if sampler is not None:
+            sampler.stop()
         eslog.debug(out.decode())
         eslog.error(err.decode())
     except BrokenPipeError:
@@ -624,6 +701,9 @@ def launch() -> None:
 
         # this seems to be required so that the gpu memory is restituated and available for es
         time.sleep(1)
+        launchMetrics.recorder.finish(exitcode)
+        if "switchutils.sessionDb" in sys.modules:
+            sys.modules["switchutils.sessionDb"].writer.wait()
         eslog.debug(f"Exiting configgen with status {exitcode!s}")
 
         exit(exitcode)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+# Single pass bezel compositor
+# The PIL path of getHudBezel decodes and encodes a png in /tmp for every step (resize, tattoo, gun
+# borders). This builds the same overlay on a single SDL surface: the bezel is decoded once from a
+# memory mapping, resized, tattooed and framed in place and encoded once. Enabled with
+# switch.bezel_compositor=sdl, getHudBezel falls back to PIL when it fails.
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from ctypes import c_ubyte, string_at
+from dataclasses import dataclass
+from pathlib import Path
+
+eslog = logging.getLogger(__name__)
+
+CONTROLLER_OVERLAYS = Path("/usr/share/batocera/controller-overlays")
+# same layout as bezelsUtil.tatooImage: 225px wide on a 1080p screen, 20px below/above the hud
+TATTOO_WIDTH = 225 / 1920
+TATTOO_MARGIN = 20
+OUTER_BORDER_COLOR = (0, 0, 0)
+COLORS = {
+    "white": (255, 255, 255), "black": (0, 0, 0), "red": (255, 0, 0), "green": (0, 255, 0),
+    "blue": (0, 0, 255), "yellow": (255, 255, 0), "cyan": (0, 255, 255), "magenta": (255, 0, 255),
+}
+
+
+class BezelError(Exception):
+    pass
+
+
+@dataclass
+class Tattoo:
+    path: Path
+    corner: str = "NW"
+    resize: bool = True
+
+
+@dataclass
+class GunBorders:
+    inner: int
+    outer: int
+    ratio: str | None = None
+    color: tuple[int, int, int] = (255, 255, 255)
+
+
+def parseColor(value: str | None) -> tuple[int, int, int]:
+    if not value:
+        return COLORS["white"]
+    value = value.strip().lower()
+    if value in COLORS:
+        return COLORS[value]
+    value = value.lstrip("#")
+    if len(value) == 6:
+        try:
+            return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+        except ValueError:
+            pass
+    return COLORS["white"]
+
+
+def tattooFromConfig(system) -> Tattoo | None:
+    # same file selection as bezelsUtil.tatooImage
+    if not system.isOptSet('bezel.tattoo') or system.config['bezel.tattoo'] == "0":
+        return None
+    path = CONTROLLER_OVERLAYS / "generic.png"
+    if system.config['bezel.tattoo'] == 'system' and (CONTROLLER_OVERLAYS / f"{system.name}.png").exists():
+        path = CONTROLLER_OVERLAYS / f"{system.name}.png"
+    elif system.config['bezel.tattoo'] == 'custom' and system.isOptSet('bezel.tattoo_file') and \
+            os.path.exists(system.config['bezel.tattoo_file']):
+        path = Path(system.config['bezel.tattoo_file'])
+    corner = system.config['bezel.tattoo_corner'] if system.isOptSet('bezel.tattoo_corner') else "NW"
+    # like bezelsUtil.tatooImage the tattoo is resized unless the option is explicitly off
+    resize = not system.isOptSet('bezel.resize_tattoo') or system.getOptBoolean('bezel.resize_tattoo')
+    return Tattoo(path, corner.upper(), resize)
+
+
+class Compositor:
+    def __init__(self):
+        # imported here so configgen doesn't load SDL when the option is off
+        import sdl2
+        from sdl2 import sdlimage
+        self.sdl2 = sdl2
+        self.sdlimage = sdlimage
+
+    @contextmanager
+    def _surface(self, surface) -> Iterator:
+        if not surface:
+            raise BezelError(self.sdl2.SDL_GetError().decode(errors="replace"))
+        try:
+            yield surface
+        finally:
+            self.sdl2.SDL_FreeSurface(surface)
+
+    def _load(self, path: Path):
+        # decoded straight from a mapping of the file and converted to RGBA once
+        with self._surface(self.sdlimage.IMG_Load_RW_mmap(str(path))) as image:
+            return self.sdl2.SDL_ConvertSurfaceFormat(image, self.sdl2.SDL_PIXELFORMAT_RGBA32, 0)
+
+    def _new(self, width: int, height: int):
+        return self.sdl2.SDL_CreateRGBSurfaceWithFormat(0, width, height, 32, self.sdl2.SDL_PIXELFORMAT_RGBA32)
+
+    def _fill(self, surface, rect: tuple[int, int, int, int], rgba: tuple[int, int, int, int]) -> None:
+        if rect[2] <= 0 or rect[3] <= 0:
+            return
+        color = self.sdl2.SDL_MapRGBA(surface.contents.format, *rgba)
+        self.sdl2.SDL_FillRect(surface, self.sdl2.SDL_Rect(*rect), color)
+
+    def _stretch(self, source, target, rect: tuple[int, int, int, int] | None = None) -> None:
+        destination = self.sdl2.SDL_Rect(*rect) if rect is not None else None
+        if self.sdl2.SDL_SoftStretchLinear(source, None, target, destination) != 0:
+            raise BezelError(self.sdl2.SDL_GetError().decode(errors="replace"))
+
+    def compose(self, source: Path, output: Path, width: int, height: int, stretch: bool = False,
+                tattoo: Tattoo | None = None, borders: GunBorders | None = None) -> Path:
+        with self._surface(self._load(source)) as bezel:
+            if (bezel.contents.w, bezel.contents.h) == (width, height):
+                canvas = self.sdl2.SDL_DuplicateSurface(bezel)
+            else:
+                canvas = self._resize(bezel, width, height, stretch)
+        with self._surface(canvas):
+            if tattoo is not None:
+                self._tattoo(canvas, tattoo)
+            if borders is not None:
+                self._borders(canvas, borders)
+            if self.sdlimage.IMG_SavePNG(canvas, str(output).encode()) != 0:
+                raise BezelError(self.sdlimage.IMG_GetError().decode(errors="replace"))
+        return output
+
+    def _resize(self, bezel, width: int, height: int, stretch: bool):
+        canvas = self._new(width, height)
+        if not canvas:
+            raise BezelError(self.sdl2.SDL_GetError().decode(errors="replace"))
+        if stretch:
+            self._stretch(bezel, canvas)
+            return canvas
+        # keep the bezel ratio, centered on black like ImageOps.pad
+        self._fill(canvas, (0, 0, width, height), (0, 0, 0, 255))
+        scale = min(width / bezel.contents.w, height / bezel.contents.h)
+        w, h = round(bezel.contents.w * scale), round(bezel.contents.h * scale)
+        self._stretch(bezel, canvas, (round((width - w) / 2), round((height - h) / 2), w, h))
+        return canvas
+
+    def _tattoo(self, canvas, tattoo: Tattoo) -> None:
+        width, height = canvas.contents.w, canvas.contents.h
+        with self._surface(self._load(tattoo.path)) as image:
+            tw, th = image.contents.w, image.contents.h
+            stretch = True
+            if tattoo.resize:
+                tw, th = int(TATTOO_WIDTH * width), int(th * int(TATTOO_WIDTH * width) / tw)
+            elif tw > width or th > height:
+                # kept at its own size but shrunk to the screen width when it's larger than the screen
+                tw, th = width, int(th * width / tw)
+            else:
+                stretch = False
+            scaled = self._new(tw, th) if stretch else self.sdl2.SDL_DuplicateSurface(image)
+            with self._surface(scaled):
+                if stretch:
+                    self._stretch(image, scaled)
+                positions = {
+                    "NE": (width - tw, TATTOO_MARGIN),
+                    "SE": (width - tw, height - th - TATTOO_MARGIN),
+                    "SW": (0, height - th - TATTOO_MARGIN),
+                }
+                x, y = positions.get(tattoo.corner, (0, TATTOO_MARGIN))
+                self._composite(scaled, canvas, x, y)
+
+    def _composite(self, source, canvas, x: int, y: int) -> None:
+        # Image.alpha_composite of PIL with its integer rounding. SDL_BLENDMODE_BLEND ignores the
+        # alpha of the destination: over the translucent parts of a bezel it darkens the tattoo
+        src, dst = source.contents, canvas.contents
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + src.w, dst.w), min(y + src.h, dst.h)
+        if right <= left or bottom <= top:
+            return
+        sp = memoryview((c_ubyte * (src.pitch * src.h)).from_address(src.pixels)).cast("B")
+        dp = memoryview((c_ubyte * (dst.pitch * dst.h)).from_address(dst.pixels)).cast("B")
+        for row in range(top, bottom):
+            s = (row - y) * src.pitch + (left - x) * 4
+            d = row * dst.pitch + left * 4
+            for _ in range(right - left):
+                sa = sp[s + 3]
+                if sa == 255:
+                    dp[d:d + 4] = sp[s:s + 4]
+                elif sa:
+                    outa255 = sa * 255 + dp[d + 3] * (255 - sa)
+                    coef1 = sa * 255 * 255 * 128 // outa255
+                    coef2 = 255 * 128 - coef1
+                    for c in range(d, d + 3):
+                        t = sp[s + c - d] * coef1 + dp[c] * coef2 + (0x80 << 7)
+                        dp[c] = ((t >> 8) + t) >> 15
+                    t = outa255 + 0x80
+                    dp[d + 3] = ((t >> 8) + t) >> 8
+                s += 4
+                d += 4
+
+    def _borders(self, canvas, borders: GunBorders) -> int:
+        width, height = canvas.contents.w, canvas.contents.h
+        # sizes are percents of the height so the border is even on every side
+        outer = height * borders.outer // 100
+        inner = height * borders.inner // 100
+        margin = (width - height * 4 // 3) // 2 if borders.ratio == "4:3" else 0
+        frames = ((0, outer, (*OUTER_BORDER_COLOR, 255)), (outer, inner, (*borders.color, 255)))
+        for offset, size, color in frames:
+            x, y = margin + offset, offset
+            w, h = width - 2 * x, height - 2 * y
+            self._fill(canvas, (x, y, w, size), color)
+            self._fill(canvas, (x, y + h - size, w, size), color)
+            self._fill(canvas, (x, y, size, h), color)
+            self._fill(canvas, (x + w - size, y, size, h), color)
+        return outer + inner
+
+    def pixels(self, path: Path) -> tuple[int, int, bytes]:
+        with self._surface(self._load(path)) as image:
+            surface = image.contents
+            rows = [string_at(surface.pixels + y * surface.pitch, surface.w * 4) for y in range(surface.h)]
+            return surface.w, surface.h, b"".join(rows)
+
+
+def compare(first: Path, second: Path) -> tuple[int, float]:
+    # largest and mean channel difference between two images of the same size
+    compositor = Compositor()
+    w1, h1, a = compositor.pixels(first)
+    w2, h2, b = compositor.pixels(second)
+    if (w1, h1) != (w2, h2):
+        raise BezelError(f"{first} is {w1}x{h1}, {second} is {w2}x{h2}")
+    deltas = [abs(x - y) for x, y in zip(a, b)]
+    return max(deltas, default=0), sum(deltas) / max(len(deltas), 1)
+
+
+def composeFromConfig(system, source: Path, output: Path, width: int, height: int, stretch: bool,
+                      bordersSize: str | None, bordersRatio: str | None) -> Path:
+    borders = None
+    if bordersSize is not None:
+        from configgen.utils import bezels as bezelsUtil
+        inner, outer = bezelsUtil.gunBordersSize(bordersSize)
+        borders = GunBorders(inner, outer, bordersRatio, parseColor(bezelsUtil.gunsBordersColorFomConfig(system.config)))
+    return Compositor().compose(source, output, width, height, stretch, tattooFromConfig(system), borders)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="compose bezels with SDL")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compose = commands.add_parser("compose", help="resize, tattoo and frame a bezel")
+    compose.add_argument("source", type=Path)
+    compose.add_argument("output", type=Path)
+    compose.add_argument("size", help="WIDTHxHEIGHT")
+    compose.add_argument("--stretch", action="store_true")
+    compose.add_argument("--tattoo", type=Path)
+    compose.add_argument("--corner", default="NW")
+    compose.add_argument("--no-resize-tattoo", dest="resize_tattoo", action="store_false")
+    compose.add_argument("--borders", help="INNER,OUTER percents of the height")
+    compose.add_argument("--ratio")
+    compose.add_argument("--color")
+    diff = commands.add_parser("compare", help="pixel difference between two images, e.g. the SDL and PIL bezels")
+    diff.add_argument("first", type=Path)
+    diff.add_argument("second", type=Path)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.command == "compare":
+            largest, mean = compare(args.first, args.second)
+            print(f"max {largest} mean {mean:.4f}")
+            return 0
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        tattoo = Tattoo(args.tattoo, args.corner.upper(), args.resize_tattoo) if args.tattoo else None
+        borders = None
+        if args.borders:
+            inner, outer = (int(v) for v in args.borders.split(","))
+            borders = GunBorders(inner, outer, args.ratio, parseColor(args.color))
+        Compositor().compose(args.source, args.output, width, height, args.stretch, tattoo, borders)
+    except (BezelError, ImportError, OSError, ValueError) as e:
+        eslog.error(e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+# Startup-optimised configgen bundle
+# ES starts switchlauncher.py in a fresh interpreter, every module of configgen is then looked up in
+# the folders of /userdata and its .pyc read from there, or compiled and written back after an
+# update. The bundle is a single uncompressed zip of the precompiled modules, unchecked-hash .pyc
+# that zipimport loads without looking at any source. switchlauncher.py puts it first on sys.path
+# while it is newer than switchlauncher.py itself, batocera-switch-updater.sh removes it when it
+# rewrites the sources and the scheduler builds it again. The .pyc only fit the interpreter that compiled them, the cache tag is
+# part of the file name.
+#   python -m switchutils.bundle build
+#   python -m switchutils.bundle status
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import py_compile
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from .switchPaths import SWITCH_HOME
+
+eslog = logging.getLogger(__name__)
+
+CONFIGGEN = Path(__file__).resolve().parent.parent
+# ES runs it as a script, it is never imported
+LAUNCHER = "switchlauncher.py"
+# packages that read their own sources at runtime, sdl2 builds its lazy name index from them
+KEEP_SOURCES = ("sdl2",)
+
+
+def bundlePath(home: Path = SWITCH_HOME) -> Path:
+    return Path(home) / f"configgen.{sys.implementation.cache_tag}.zip"
+
+
+def sources(root: Path = CONFIGGEN) -> list[Path]:
+    found = []
+    for folder, folders, files in os.walk(root):
+        folders[:] = sorted(f for f in folders if f != "__pycache__")
+        found += [Path(folder) / name for name in sorted(files) if name.endswith(".py")]
+    return [path for path in found if path != root / LAUNCHER]
+
+
+def stale(root: Path = CONFIGGEN, bundle: Path | None = None) -> bool:
+    # a source or a folder (added or removed modules) changed since the last build
+    bundle = bundlePath() if bundle is None else bundle
+    try:
+        built = bundle.stat().st_mtime
+    except OSError:
+        return True
+    for folder, folders, files in os.walk(root):
+        folders[:] = [f for f in folders if f != "__pycache__"]
+        for name in [".", *(f for f in files if f.endswith(".py"))]:
+            try:
+                if os.stat(os.path.join(folder, name)).st_mtime > built:
+                    return True
+            except OSError:
+                return True
+    return False
+
+
+def build(root: Path = CONFIGGEN, bundle: Path | None = None) -> int:
+    # number of modules bundled
+    bundle = bundlePath() if bundle is None else bundle
+    bundle.parent.mkdir(parents=True, exist_ok=True)
+    temporary = bundle.with_name(f"{bundle.name}.{os.getpid()}.tmp")
+    modules = sources(root)
+    try:
+        with tempfile.TemporaryDirectory() as scratch, zipfile.ZipFile(temporary, "w", zipfile.ZIP_STORED) as zf:
+            compiled = Path(scratch) / "module.pyc"
+            for path in modules:
+                name = path.relative_to(root).as_posix()
+                # tracebacks still point at the sources
+                py_compile.compile(str(path), cfile=str(compiled), dfile=str(path), doraise=True,
+                                   invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+                zf.write(compiled, name + "c")
+                if name.split("/", 1)[0] in KEEP_SOURCES:
+                    zf.write(path, name)
+        os.replace(temporary, bundle)
+    except (OSError, py_compile.PyCompileError):
+        temporary.unlink(missing_ok=True)
+        raise
+    return len(modules)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="bundle the precompiled configgen modules for faster launches")
+    commands = parser.add_subparsers(dest="command", required=True)
+    building = commands.add_parser("build", help="bundle the modules again")
+    building.add_argument("--if-stale", action="store_true", help="only when a source changed")
+    commands.add_parser("remove", help="launch from the sources again")
+    commands.add_parser("status", help="print whether the launcher uses the bundle")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    bundle = bundlePath()
+    if args.command == "build":
+        if args.if_stale and not stale():
+            print(f"{bundle} is up to date")
+            return 0
+        try:
+            count = build()
+        except (OSError, py_compile.PyCompileError) as e:
+            eslog.error(f"unable to build {bundle}: {e}")
+            return 1
+        print(f"{count} modules bundled in {bundle} ({bundle.stat().st_size >> 10} KiB)")
+    elif args.command == "remove":
+        bundle.unlink(missing_ok=True)
+    elif not bundle.is_file():
+        print(f"no bundle, {LAUNCHER} imports the sources")
+    else:
+        used = bundle.stat().st_mtime >= (CONFIGGEN / LAUNCHER).stat().st_mtime
+        built = time.strftime("%Y-%m-%d %H:%M", time.localtime(bundle.stat().st_mtime))
+        print(f"{bundle}: built {built}, {'stale' if stale() else 'current'}, "
+              f"{'used' if used else f'older than {LAUNCHER}, not used'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+# Block level delta updates, zsync style
+# A block manifest (<file>.blocks.json) published next to every AppImage lists a rolling and a
+# strong checksum per block. The client first looks up the blocks of the installed AppImage at
+# their aligned offsets, then slides the rolling checksum around the ones that matched nothing, so
+# every block found there is reused whatever its offset. The missing ranges are fetched from the
+# mirror and the sha256 of the rebuilt file is checked before it is installed.
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import sys
+import urllib.request
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from . import maintenance
+
+eslog = logging.getLogger(__name__)
+
+BLOCK_SIZE = 0x8000
+BLOCKS_SUFFIX = ".blocks.json"
+# missing blocks closer than that are fetched with a single request
+MERGE_GAP = 4
+_MASK = 0xFFFF
+TIMEOUT = 30
+# the rolling scan and the transfers look at maintenance.checkpoint every CHUNK_SIZE bytes
+CHUNK_SIZE = 0x100000
+
+
+class DeltaError(Exception):
+    pass
+
+
+@dataclass
+class DeltaStats:
+    size: int = 0
+    # bytes taken from the installed file instead of the mirror
+    saved: int = 0
+    fetched: int = 0
+    requests: int = 0
+
+
+def _weak(data: bytes) -> tuple[int, int]:
+    n = len(data)
+    a = sum(data) & _MASK
+    b = sum((n - i) * x for i, x in enumerate(data)) & _MASK
+    return a, b
+
+
+def _strong(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def blockManifest(path: Path, block_size: int = BLOCK_SIZE) -> dict:
+    blocks = []
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        while data := f.read(block_size):
+            digest.update(data)
+            # the last block is padded with zeroes so every block has the same length
+            a, b = _weak(data.ljust(block_size, b"\0"))
+            blocks.append([a | b << 16, _strong(data.ljust(block_size, b"\0"))])
+    return {"size": Path(path).stat().st_size, "block_size": block_size, "sha256": digest.hexdigest(),
+            "blocks": blocks}
+
+
+def writeBlockManifest(path: Path, block_size: int = BLOCK_SIZE) -> Path:
+    path = Path(path)
+    manifest = path.with_name(path.name + BLOCKS_SUFFIX)
+    if manifest.exists() and manifest.stat().st_mtime >= path.stat().st_mtime:
+        return manifest
+    temporary = manifest.with_suffix(".tmp")
+    temporary.write_text(json.dumps(blockManifest(path, block_size)))
+    temporary.replace(manifest)
+    return manifest
+
+
+def fetchBlockManifest(url: str) -> dict:
+    with urllib.request.urlopen(url, timeout=TIMEOUT) as response:
+        return json.load(response)
+
+
+def findBlocks(local: Path, manifest: dict) -> dict[int, int]:
+    # map target block index -> offset of an identical block in the local file
+    block_size = manifest["block_size"]
+    blocks = manifest["blocks"]
+    found: dict[int, int] = {}
+    size = local.stat().st_size
+    if size < block_size or not blocks:
+        return found
+    with local.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # most unchanged blocks keep their offset between two builds: the aligned blocks are looked
+        # up by their strong checksum first, at hashlib speed
+        strong: dict[str, list[int]] = {}
+        for index, (_, digest) in enumerate(blocks):
+            strong.setdefault(digest, []).append(index)
+        unmatched = []
+        for offset in range(0, size - block_size + 1, block_size):
+            if offset % CHUNK_SIZE == 0:
+                maintenance.checkpoint("delta update")
+            indexes = strong.get(_strong(data[offset:offset + block_size]))
+            if indexes is None:
+                unmatched.append(offset)
+                continue
+            for i in indexes:
+                found.setdefault(i, offset)
+        tail = size - size % block_size
+        last = len(blocks) - 1
+        if tail < size:
+            # a short local tail can only be the short last block, padded like in the manifest
+            if (last not in found and size - tail == manifest["size"] - last * block_size
+                    and _strong(data[tail:].ljust(block_size, b"\0")) == blocks[last][1]):
+                found[last] = tail
+            else:
+                unmatched.append(tail)
+
+        # the byte-wise rolling scan only looks for the remaining blocks, around the local blocks
+        # that matched nothing and in the tail that isn't a whole block
+        wanted: dict[int, list[int]] = {}
+        for index, (weak, _) in enumerate(blocks):
+            if index not in found:
+                wanted.setdefault(weak, []).append(index)
+        for start, end in _regions(unmatched, block_size):
+            if not wanted:
+                break
+            _roll(data, max(start - block_size + 1, 0), min(end, size) - 1, block_size, blocks, wanted, found)
+    return found
+
+
+def _regions(offsets: list[int], block_size: int) -> list[tuple[int, int]]:
+    # runs of consecutive blocks as (start, end) byte offsets
+    regions: list[list[int]] = []
+    for offset in offsets:
+        if regions and regions[-1][1] == offset:
+            regions[-1][1] = offset + block_size
+        else:
+            regions.append([offset, offset + block_size])
+    return [(start, end) for start, end in regions]
+
+
+def _roll(data: mmap.mmap, offset: int, stop: int, block_size: int, blocks: list,
+          wanted: dict[int, list[int]], found: dict[int, int]) -> None:
+    # slide the weak checksum over the windows starting in [offset, stop]
+    last = min(stop, len(data) - block_size)
+    if offset > last:
+        return
+    a, b = _weak(data[offset:offset + block_size])
+    next_check = offset + CHUNK_SIZE
+    while True:
+        if offset >= next_check:
+            maintenance.checkpoint("delta update")
+            next_check = offset + CHUNK_SIZE
+        indexes = wanted.get(a | b << 16)
+        if indexes is not None:
+            strong = _strong(data[offset:offset + block_size])
+            matched = [i for i in indexes if i not in found and blocks[i][1] == strong]
+            for i in matched:
+                found[i] = offset
+            if matched:
+                # skip over the matched block instead of rolling through it
+                offset += block_size
+                if offset > last:
+                    break
+                a, b = _weak(data[offset:offset + block_size])
+                continue
+        if offset >= last:
+            break
+        out, inc = data[offset], data[offset + block_size]
+        a = (a - out + inc) & _MASK
+        b = (b - block_size * out + a) & _MASK
+        offset += 1
+
+
+def _ranges(missing: list[int]) -> list[tuple[int, int]]:
+    ranges = []
+    for index in missing:
+        if ranges and index - ranges[-1][1] <= MERGE_GAP:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return [(first, last) for first, last in ranges]
+
+
+def _fetch_range(url: str, start: int, end: int, out: BinaryIO, digest) -> int:
+    # streamed to out as it arrives, a range is never held in memory
+    request = urllib.request.Request(url, headers={"Range": f"bytes={start}-{end}"})
+    written = 0
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+        if response.status != 206:
+            raise DeltaError(f"{url}: the mirror does not support range requests")
+        while written <= end - start and (data := response.read(min(CHUNK_SIZE, end - start + 1 - written))):
+            out.write(data)
+            digest.update(data)
+            written += len(data)
+            maintenance.checkpoint("delta update")
+    if written != end - start + 1:
+        raise DeltaError(f"{url}: short range {start}-{end}")
+    return written
+
+
+def patch(local: Path, url: str, manifest: dict, destination: Path) -> DeltaStats:
+    # rebuild the file at url into destination, in order, from the local file and the missing ranges
+    block_size = manifest["block_size"]
+    size = manifest["size"]
+    count = len(manifest["blocks"])
+    found = findBlocks(Path(local), manifest)
+    missing = [i for i in range(count) if i not in found]
+    ranges = {first: last for first, last in _ranges(missing)}
+    stats = DeltaStats(size)
+    digest = hashlib.sha256()
+
+    with Path(local).open("rb") as source, Path(destination).open("wb") as out:
+        index = 0
+        while index < count:
+            if index in ranges:
+                last = ranges[index]
+                start, end = index * block_size, min((last + 1) * block_size, size) - 1
+                stats.fetched += _fetch_range(url, start, end, out, digest)
+                stats.requests += 1
+                index = last + 1
+                continue
+            # the blocks outside the fetched ranges are all in the local file
+            source.seek(found[index])
+            data = source.read(min(block_size, size - index * block_size))
+            out.write(data)
+            digest.update(data)
+            index += 1
+    stats.saved = size - sum(min(block_size, size - i * block_size) for i in missing)
+
+    if digest.hexdigest() != manifest["sha256"]:
+        Path(destination).unlink(missing_ok=True)
+        raise DeltaError(f"{url}: the rebuilt file does not match its sha256")
+    eslog.info(f"delta update of {url}: {stats.fetched >> 10} KiB fetched, {stats.saved >> 10} KiB reused")
+    return stats
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="generate block manifests for delta updates")
+    parser.add_argument("files", nargs="+", type=Path, help="AppImages to publish")
+    parser.add_argument("-b", "--block-size", type=int, default=BLOCK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    for path in args.files:
+        eslog.info(f"wrote {writeBlockManifest(path, args.block_size)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# Firmware installation straight into the Ryujinx and Yuzu NANDs
+# The firmware zip (or folder) from /userdata/bios/switch is streamed member by member, nothing is
+# extracted to /tmp. Every NCA is written once to the first NAND, verified against the hash in its
+# name and hardlinked into the others. NCAs already installed with the right size and hash are skipped.
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import zipfile
+from collections.abc import Callable
+from contextlib import AbstractContextManager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from . import maintenance
+from .firmwareSync import BIOS_FIRMWARE, MIN_NCAS, RYUJINX_NAND, YUZU_NAND, FirmwareSync, Location, linkFile
+from .nsz import default_threads
+from .switchPaths import SWITCH_BIOS
+
+eslog = logging.getLogger(__name__)
+
+CHUNK_SIZE = 0x100000
+
+
+class FirmwareError(Exception):
+    pass
+
+
+@dataclass
+class _Member:
+    name: str
+    size: int
+    open: Callable[[], AbstractContextManager[BinaryIO]]
+
+
+def _content_hash(name: str) -> str | None:
+    # firmware NCAs are named after the first 16 bytes of their sha256
+    stem = name.split(".")[0].lower()
+    if len(stem) == 32 and all(c in "0123456789abcdef" for c in stem):
+        return stem
+    return None
+
+
+def findFirmwareSource(bios: Path = SWITCH_BIOS) -> Path | None:
+    # newest firmware zip in the bios folder, or the extracted firmware folder
+    archives = sorted((p for p in bios.glob("*.zip") if "firmware" in p.name.lower()),
+                      key=lambda p: p.stat().st_mtime)
+    if archives:
+        return archives[-1]
+    if BIOS_FIRMWARE.root.is_dir() and any(BIOS_FIRMWARE.root.glob("*.nca")):
+        return BIOS_FIRMWARE.root
+    return None
+
+
+def _members(source: Path) -> list[_Member]:
+    if source.is_dir():
+        members = []
+        for path in source.iterdir():
+            if path.name.endswith(".nca"):
+                nca = path / "00" if path.is_dir() else path
+                members.append(_Member(path.name, nca.stat().st_size, nca.open))
+        return members
+
+    with zipfile.ZipFile(source) as archive:
+        infos = [i for i in archive.infolist() if not i.is_dir() and i.filename.endswith(".nca")]
+
+    def opener(info: zipfile.ZipInfo) -> Callable[[], AbstractContextManager[BinaryIO]]:
+        # one ZipFile per open, so worker threads never share a file position
+        @contextmanager
+        def open_member():
+            with zipfile.ZipFile(source) as archive, archive.open(info) as member:
+                yield member
+        return open_member
+
+    return [_Member(os.path.basename(i.filename), i.file_size, opener(i)) for i in infos]
+
+
+class FirmwareInstaller:
+    def __init__(self, source: Path, locations: list[Location] | None = None, threads: int | None = None):
+        self.source = Path(source)
+        self.locations = locations if locations is not None else [RYUJINX_NAND, YUZU_NAND]
+        self.threads = threads or default_threads()
+
+    def run(self) -> dict[str, int]:
+        members = _members(self.source)
+        if len(members) < MIN_NCAS:
+            raise FirmwareError(f"{self.source} holds {len(members)} ncas, this is not a complete firmware")
+
+        sync = FirmwareSync(self.locations)
+        installed = {location.name: sync.manifest(location).entries for location in self.locations}
+        stats = {"written": 0, "linked": 0, "skipped": 0}
+
+        jobs = []
+        for member in members:
+            missing = [location for location in self.locations
+                       if not self._is_installed(installed[location.name].get(member.name), member)]
+            if missing:
+                jobs.append((member, missing))
+            stats["skipped"] += len(self.locations) - len(missing)
+
+        eslog.info(f"installing {len(jobs)} firmware ncas from {self.source}")
+        with ThreadPoolExecutor(self.threads) as pool:
+            for linked in pool.map(lambda job: self._install(*job), jobs):
+                stats["written"] += 1
+                stats["linked"] += linked
+
+        for location in self.locations:
+            location.root.mkdir(parents=True, exist_ok=True)
+            sync.manifest(location)
+        eslog.info(f"firmware installed: {stats}")
+        return stats
+
+    @staticmethod
+    def _is_installed(entry: dict | None, member: _Member) -> bool:
+        if entry is None or entry["size"] != member.size:
+            return False
+        expected = _content_hash(member.name)
+        return expected is None or entry["sha256"].startswith(expected)
+
+    def _install(self, member: _Member, locations: list[Location]) -> int:
+        first = locations[0].path(member.name)
+        first.parent.mkdir(parents=True, exist_ok=True)
+        temporary = first.with_name(f".{first.name}.install")
+        digest = hashlib.sha256()
+        with member.open() as source, temporary.open("wb") as out:
+            while data := source.read(CHUNK_SIZE):
+                maintenance.checkpoint("firmware install")
+                digest.update(data)
+                out.write(data)
+
+        expected = _content_hash(member.name)
+        if expected is not None and not digest.hexdigest().startswith(expected):
+            temporary.unlink(missing_ok=True)
+            raise FirmwareError(f"{member.name}: hash mismatch, the firmware archive is corrupted")
+        os.replace(temporary, first)
+
+        for location in locations[1:]:
+            linkFile(first, location.path(member.name))
+        return len(locations) - 1
+
+
+def isInstalled(location: Location) -> bool:
+    return len(FirmwareSync([location]).manifest(location).entries) >= MIN_NCAS
+
+
+def hasFirmware(location: Location) -> bool:
+    # any NCA at all, from a listing without hashing anything: the launch check of a NAND
+    try:
+        with os.scandir(location.root) as entries:
+            return any(entry.name.endswith(".nca") for entry in entries)
+    except OSError:
+        return False
+
+
+def ensureFirmware(locations: list[Location] | None = None) -> bool:
+    # install the bios firmware where it's missing, True if every location has a firmware afterwards
+    locations = locations if locations is not None else [RYUJINX_NAND, YUZU_NAND]
+    missing = [location for location in locations if not isInstalled(location)]
+    if not missing:
+        return True
+    source = findFirmwareSource()
+    if source is None:
+        eslog.info("no firmware found in the bios folder")
+        return False
+    try:
+        FirmwareInstaller(source, missing).run()
+    except (FirmwareError, OSError, zipfile.BadZipFile) as e:
+        eslog.error(f"firmware installation failed: {e}")
+        return False
+    return all(isInstalled(location) for location in missing)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="install switch firmware into the emulator nands")
+    parser.add_argument("source", nargs="?", help="firmware zip or folder, newest in the bios folder by default")
+    parser.add_argument("-t", "--threads", type=int, help="worker threads, all cpus by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    source = Path(args.source) if args.source else findFirmwareSource()
+    if source is None:
+        eslog.error("no firmware found")
+        return 1
+    try:
+        FirmwareInstaller(source, threads=args.threads).run()
+    except (FirmwareError, OSError, zipfile.BadZipFile) as e:
+        eslog.error(f"firmware installation failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
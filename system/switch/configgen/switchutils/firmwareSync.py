@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+# Firmware sync between Ryujinx, Yuzu and /userdata/bios/switch/firmware
+# Replaces batocera-switch-sync-firmware.sh. Every location keeps a manifest of its NCAs
+# (name, size, mtime, inode, sha256) so an unchanged location is recognised from a stat of each
+# NCA without reading them, and the newest complete firmware is propagated with hardlinks,
+# reflinks or, across filesystems, copies.
+
+from __future__ import annotations
+
+import argparse
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import maintenance
+from .switchPaths import FIRMWARE_MANIFESTS, RYUJINX_REGISTERED, SWITCH_FIRMWARE, YUZU_REGISTERED
+
+eslog = logging.getLogger(__name__)
+
+# a location with less NCAs than that is an incomplete firmware and never used as a source
+MIN_NCAS = 200
+FICLONE = 0x40049409
+
+
+@dataclass
+class Location:
+    name: str
+    root: Path
+    # ryujinx stores every nca as a <name>.nca/00 directory
+    nested: bool = False
+
+    def path(self, nca: str) -> Path:
+        if self.nested:
+            return self.root / nca / "00"
+        return self.root / nca
+
+    def scan(self) -> dict[str, os.stat_result]:
+        found = {}
+        if not self.root.is_dir():
+            return found
+        for item in os.scandir(self.root):
+            if not item.name.endswith(".nca"):
+                continue
+            try:
+                found[item.name] = self.path(item.name).stat()
+            except OSError:
+                continue
+        return found
+
+
+@dataclass
+class Manifest:
+    entries: dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        for name in sorted(self.entries):
+            digest.update(f"{name}:{self.entries[name]['sha256']}\n".encode())
+        return digest.hexdigest()
+
+    @property
+    def newest(self) -> int:
+        return max((e["mtime"] for e in self.entries.values()), default=0)
+
+    @property
+    def complete(self) -> bool:
+        return len(self.entries) >= MIN_NCAS
+
+
+RYUJINX_NAND = Location("ryujinx", RYUJINX_REGISTERED, nested=True)
+YUZU_NAND = Location("yuzu", YUZU_REGISTERED)
+BIOS_FIRMWARE = Location("bios", SWITCH_FIRMWARE)
+LOCATIONS = [RYUJINX_NAND, YUZU_NAND, BIOS_FIRMWARE]
+
+
+def _hash(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _entry(st: os.stat_result, sha256: str) -> dict:
+    return {"size": st.st_size, "mtime": st.st_mtime_ns, "ino": [st.st_dev, st.st_ino], "sha256": sha256}
+
+
+def linkFile(source: Path, destination: Path) -> str:
+    # hardlink when possible, reflink (btrfs subvolumes) next, full copy only as a last resort
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary = destination.with_name(f".{destination.name}.sync")
+    temporary.unlink(missing_ok=True)
+    try:
+        os.link(source, temporary)
+        method = "link"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        try:
+            with source.open("rb") as src, temporary.open("wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(source, temporary)
+            method = "reflink"
+        except OSError:
+            shutil.copy2(source, temporary)
+            method = "copy"
+    os.replace(temporary, destination)
+    return method
+
+
+class FirmwareSync:
+    def __init__(self, locations: list[Location] | None = None, manifests: Path = FIRMWARE_MANIFESTS):
+        self.locations = locations if locations is not None else LOCATIONS
+        self.manifests = Path(manifests)
+        # sha256 by (device, inode, size, mtime), shared between locations so hardlinks are hashed once
+        self.known: dict[tuple, str] = {}
+
+    def manifest(self, location: Location) -> Manifest:
+        stored = self._load(location)
+        for entry in stored.entries.values():
+            self.known[(*entry["ino"], entry["size"], entry["mtime"])] = entry["sha256"]
+        return self._refresh(location, stored)
+
+    def _refresh(self, location: Location, stored: Manifest | None = None) -> Manifest:
+        # every NCA is stamped, not the directory: ryujinx rewrites its <nca>/00 files in place,
+        # which doesn't touch the mtime of the registered folder. Only new or changed files are hashed
+        manifest = Manifest()
+        for name, st in location.scan().items():
+            key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+            if key not in self.known:
+                maintenance.checkpoint("firmware sync")
+                self.known[key] = _hash(location.path(name))
+            manifest.entries[name] = _entry(st, self.known[key])
+        if stored is None or manifest.entries != stored.entries:
+            eslog.debug(f"firmware manifest of {location.name} refreshed")
+            self._save(location, manifest)
+        return manifest
+
+    def _load(self, location: Location) -> Manifest:
+        try:
+            data = json.loads((self.manifests / f"{location.name}.json").read_text())
+            return Manifest(data["entries"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return Manifest()
+
+    def _save(self, location: Location, manifest: Manifest) -> None:
+        self.manifests.mkdir(parents=True, exist_ok=True)
+        path = self.manifests / f"{location.name}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps({"entries": manifest.entries}))
+        os.replace(temporary, path)
+
+    def run(self, dry_run: bool = False) -> dict[str, dict[str, int]]:
+        manifests = {location.name: self.manifest(location) for location in self.locations}
+        candidates = [location for location in self.locations if manifests[location.name].complete]
+        if not candidates:
+            eslog.info("no complete firmware found, nothing to sync")
+            return {}
+        source = max(candidates, key=lambda location: manifests[location.name].newest)
+        reference = manifests[source.name]
+        eslog.info(f"firmware source is {source.name} ({len(reference.entries)} ncas)")
+
+        stats = {}
+        for target in self.locations:
+            if target is source or manifests[target.name].fingerprint == reference.fingerprint:
+                continue
+            stats[target.name] = self._propagate(source, reference, target, manifests[target.name], dry_run)
+        return stats
+
+    def _propagate(self, source: Location, reference: Manifest, target: Location, current: Manifest,
+                   dry_run: bool) -> dict[str, int]:
+        stats = {"link": 0, "reflink": 0, "copy": 0, "removed": 0, "kept": 0}
+        for name in current.entries.keys() - reference.entries.keys():
+            stats["removed"] += 1
+            if dry_run:
+                continue
+            if target.nested:
+                shutil.rmtree(target.root / name, ignore_errors=True)
+            else:
+                target.path(name).unlink(missing_ok=True)
+
+        for name, entry in reference.entries.items():
+            existing = current.entries.get(name)
+            if existing is not None and existing["size"] == entry["size"] and existing["sha256"] == entry["sha256"]:
+                stats["kept"] += 1
+                continue
+            if dry_run:
+                stats["link"] += 1
+                continue
+            maintenance.checkpoint("firmware sync")
+            stats[linkFile(source.path(name), target.path(name))] += 1
+            st = target.path(name).stat()
+            self.known[(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)] = entry["sha256"]
+
+        if not dry_run:
+            target.root.mkdir(parents=True, exist_ok=True)
+            self._refresh(target)
+        eslog.info(f"firmware sync {source.name} -> {target.name}: {stats}")
+        return stats
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="sync switch firmware between emulators and bios")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    for location in LOCATIONS:
+        location.root.mkdir(parents=True, exist_ok=True)
+    try:
+        FirmwareSync().run(args.dry_run)
+    except OSError as e:
+        eslog.error(f"firmware sync failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
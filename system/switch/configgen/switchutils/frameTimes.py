@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+# MangoHud frame time logging and settings tuning
+# With frametime_log=suggest or apply, MangoHud logs every frame time of the session to a CSV of
+# FRAME_LOGS, hidden when no hud is shown. At exit the logs are read line by line into a fixed
+# histogram, memory doesn't grow with the length of the session, then deleted. The percentiles
+# are kept with the session in sessions.db and checked against the target frame rate by RULES:
+# a title that can't hold it gets a lower resolution scale for its next launch, one with lots of
+# headroom a higher one, shader stutter turns the async shaders on. "suggest" only logs them,
+# "apply" writes them as per-game options of batocera.conf, never over a value the user set.
+#   python -m switchutils.frameTimes parse mangohud_2024-07-01_20-00-00.csv --emulator yuzu
+#   python -m switchutils.frameTimes tuning
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from array import array
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .logAnalyzer import family
+from .switchPaths import BATOCERA_CONF, FRAME_LOGS, FRAME_TUNING
+
+eslog = logging.getLogger(__name__)
+
+# histogram of the frame times, BIN_MS wide bins, longer frames share the last one
+BIN_MS = 0.05
+BINS = 10000
+# sessions shorter than that don't tell anything about the title
+MIN_FRAMES = 3000
+# frames longer than STUTTER times the median
+STUTTER = 2.0
+MODES = ("suggest", "apply")
+
+
+class FrameTimeError(Exception):
+    pass
+
+
+@dataclass
+class FrameSummary:
+    frames: int
+    seconds: float
+    fps: float
+    # frame times in milliseconds
+    p50: float
+    p95: float
+    p99: float
+    p999: float
+    worst: float
+    stutters: int
+
+
+class FrameStats:
+    def __init__(self):
+        self.counts = array("L", [0]) * BINS
+        self.frames = 0
+        self.total = 0.0
+        self.worst = 0.0
+
+    def add(self, milliseconds: float) -> None:
+        if milliseconds <= 0:
+            return
+        self.counts[min(int(milliseconds / BIN_MS), BINS - 1)] += 1
+        self.frames += 1
+        self.total += milliseconds
+        self.worst = max(self.worst, milliseconds)
+
+    def percentiles(self, *wanted: float) -> list[float]:
+        # upper edge of the bin holding each percentile, in one pass over the bins
+        ranks = sorted((p * self.frames / 100, i) for i, p in enumerate(wanted))
+        found = [0.0] * len(wanted)
+        seen = 0
+        current = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            while current < len(ranks) and seen >= ranks[current][0] and seen:
+                found[ranks[current][1]] = min((index + 1) * BIN_MS, self.worst)
+                current += 1
+            if current == len(ranks):
+                break
+        return found
+
+    def summary(self) -> FrameSummary:
+        if not self.frames:
+            raise FrameTimeError("no frame logged")
+        p50, p95, p99, p999 = self.percentiles(50, 95, 99, 99.9)
+        stutters = sum(self.counts[min(int(p50 * STUTTER / BIN_MS), BINS - 1):])
+        return FrameSummary(self.frames, round(self.total / 1000, 1), round(self.frames * 1000 / self.total, 1),
+                            round(p50, 2), round(p95, 2), round(p99, 2), round(p999, 2), round(self.worst, 2),
+                            stutters)
+
+
+def readLog(path: Path, stats: FrameStats) -> int:
+    # the rows after the "fps,frametime,..." header of a MangoHud log, the system infos above it
+    # are skipped, whatever their layout
+    read = 0
+    column = None
+    with path.open(errors="replace") as f:
+        for line in f:
+            fields = line.rstrip("\n").split(",")
+            if column is None:
+                if "frametime" in fields:
+                    column = fields.index("frametime")
+                continue
+            try:
+                stats.add(float(fields[column]))
+            except (IndexError, ValueError):
+                continue
+            read += 1
+    if column is None:
+        raise FrameTimeError(f"{path} has no frametime column")
+    return read
+
+
+@dataclass(frozen=True)
+class Knob:
+    option: str
+    # values from the lightest to the heaviest
+    steps: tuple[str, ...]
+    default: str
+
+
+KNOBS = {
+    # 1x to 5x, below 1x is experimental in yuzu
+    "yuzu": {"resolution": Knob("resolution_scale", ("2", "3", "4", "5", "6", "7"), "2"),
+             "async_shaders": Knob("async_shaders", ("true", "false"), "true")},
+    # the ES option, res_scale of Ryujinx.json is rewritten from it at every launch
+    "ryujinx": {"resolution": Knob("ryu_resolution_scale", ("1.0", "2.0", "3.0", "4.0"), "1.0")},
+}
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    # summary and target frame time in milliseconds
+    condition: Callable[[FrameSummary, float], bool]
+    knob: str
+    # steps to move along the knob, towards lighter values when negative
+    move: int
+
+
+RULES = (
+    Rule("under the target frame rate", lambda s, target: s.p50 > target * 1.1, "resolution", -1),
+    Rule("shader compilation stutter", lambda s, target: s.p50 <= target * 1.05 and s.p99 > target * 2,
+         "async_shaders", -1),
+    # paced frames never show headroom, this one only fires with the frame limiter off
+    Rule("headroom over the target frame rate", lambda s, target: s.p99 < target * 0.6, "resolution", 1),
+)
+
+
+@dataclass
+class Suggestion:
+    option: str
+    current: str
+    value: str
+    reason: str
+
+
+def targetFps(summary: FrameSummary, config: dict) -> float:
+    # frametime_target=30/60, auto: the rate the title runs at most of the time
+    try:
+        target = float(config.get("frametime_target", "auto"))
+    except ValueError:
+        target = 0
+    if target > 0:
+        return target
+    return 60.0 if summary.p50 <= 1000 / 45 else 30.0
+
+
+def suggest(summary: FrameSummary, emulator: str, config: dict,
+            rules: Iterable[Rule] = RULES) -> list[Suggestion]:
+    knobs = KNOBS.get(family(emulator) or "", {})
+    if summary.frames < MIN_FRAMES:
+        return []
+    target = 1000 / targetFps(summary, config)
+    suggestions = []
+    moved = set()
+    for rule in rules:
+        knob = knobs.get(rule.knob)
+        if knob is None or rule.knob in moved or not rule.condition(summary, target):
+            continue
+        current = str(config.get(knob.option, knob.default))
+        if current not in knob.steps:
+            continue
+        position = knob.steps.index(current) + rule.move
+        if 0 <= position < len(knob.steps):
+            suggestions.append(Suggestion(knob.option, current, knob.steps[position], rule.name))
+            moved.add(rule.knob)
+    return suggestions
+
+
+class Tuning:
+    # the per-game options written by "apply", the ones changed since by the user are left alone
+    def __init__(self, conf: Path = BATOCERA_CONF, state: Path = FRAME_TUNING):
+        self.conf = Path(conf)
+        self.state_path = Path(state)
+        try:
+            self.state: dict[str, dict[str, str]] = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            self.state = {}
+
+    @staticmethod
+    def key(system: str, rom: str, option: str) -> str:
+        return f'{system}["{os.path.basename(rom)}"].{option}'
+
+    def owned(self, system: str, rom: str, option: str, current: str, user_set: bool) -> bool:
+        # unset, or still the value this module wrote
+        written = self.state.get(f"{system}/{os.path.basename(rom)}", {}).get(option)
+        return not user_set or written == current
+
+    def apply(self, system: str, rom: str, suggestions: list[Suggestion]) -> None:
+        values = {self.key(system, rom, s.option): s.value for s in suggestions}
+        try:
+            lines = self.conf.read_text().splitlines()
+        except FileNotFoundError:
+            lines = []
+        kept = [line for line in lines if line.split("=", 1)[0].strip() not in values]
+        kept += [f"{key}={value}" for key, value in values.items()]
+        temporary = self.conf.with_name(f"{self.conf.name}.{os.getpid()}.tmp")
+        temporary.write_text("\n".join(kept) + "\n")
+        if self.conf.exists():
+            shutil.copymode(self.conf, temporary)
+        os.replace(temporary, self.conf)
+        written = self.state.setdefault(f"{system}/{os.path.basename(rom)}", {})
+        written.update({s.option: s.value for s in suggestions})
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(self.state, indent=2))
+
+
+class FrameLog:
+    def __init__(self, folder: Path, mode: str):
+        self.folder = Path(folder)
+        self.mode = mode
+
+    def hudConfig(self) -> str:
+        # every frame, from the start of the session
+        return f"output_folder={self.folder}\nautostart_log=1\nlog_interval=0\n"
+
+    def attach(self, cmd, internal_call: bool) -> None:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        config_file = cmd.env.get("MANGOHUD_CONFIGFILE")
+        if config_file is not None:
+            with open(config_file, "a") as f:
+                f.write("\n" + self.hudConfig())
+            return
+        # no hud was asked for, mangohud only logs
+        config_file = Path("/var/run/hud.config")
+        config_file.write_text("no_display\n" + self.hudConfig())
+        cmd.env["MANGOHUD_CONFIGFILE"] = config_file
+        cmd.env["MANGOHUD_DLSYM"] = "1"
+        # the vulkan layer, for the emulators that don't call mangohud themselves
+        cmd.env["MANGOHUD"] = "1"
+        if not internal_call:
+            cmd.array.insert(0, "mangohud")
+
+    def read(self) -> FrameSummary:
+        stats = FrameStats()
+        logs = [p for p in sorted(self.folder.glob("*.csv")) if not p.name.endswith("_summary.csv")]
+        if not logs:
+            raise FrameTimeError(f"no frame time log in {self.folder}")
+        for path in logs:
+            readLog(path, stats)
+        return stats.summary()
+
+    def finish(self, system, systemName: str, rom: str) -> dict | None:
+        # summary and suggestions of the session, the logs are removed
+        try:
+            summary = self.read()
+        except (FrameTimeError, OSError) as e:
+            eslog.warning(f"no frame times for the session: {e}")
+            return None
+        finally:
+            shutil.rmtree(self.folder, ignore_errors=True)
+        eslog.info(f"frame times: {summary.fps} fps, p50 {summary.p50} ms, p99 {summary.p99} ms, "
+                   f"{summary.stutters} stutters over {summary.frames} frames")
+        suggestions = suggest(summary, system.config.get("emulator", ""), system.config)
+        applied = []
+        if suggestions:
+            tuning = Tuning()
+            for s in suggestions:
+                eslog.info(f"suggested for {os.path.basename(rom)}: {s.option} {s.current} -> {s.value} ({s.reason})")
+            if self.mode == "apply":
+                applied = [s for s in suggestions
+                           if tuning.owned(systemName, rom, s.option, s.current, system.isOptSet(s.option))]
+                try:
+                    if applied:
+                        tuning.apply(systemName, rom, applied)
+                except OSError as e:
+                    eslog.warning(f"unable to write the per-game options to {tuning.conf}: {e}")
+                    applied = []
+        return {**asdict(summary), "suggestions": [asdict(s) for s in suggestions],
+                "applied": [s.option for s in applied]}
+
+
+def fromConfig(system, started: float) -> FrameLog | None:
+    mode = system.config.get("frametime_log", "0") if system.isOptSet("frametime_log") else "0"
+    if mode not in MODES:
+        return None
+    folder = FRAME_LOGS / f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{os.getpid()}"
+    return FrameLog(folder, mode)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="frame time percentiles of MangoHud logs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    parsing = commands.add_parser("parse", help="percentiles and suggestions of logs")
+    parsing.add_argument("logs", nargs="+", type=Path)
+    parsing.add_argument("--emulator", default="", help="yuzu or ryujinx, for the suggestions")
+    parsing.add_argument("--target", default="auto", help="target frame rate, auto by default")
+    commands.add_parser("tuning", help="per-game options written by the tuning")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "tuning":
+        print(json.dumps(Tuning().state, indent=2))
+        return 0
+    stats = FrameStats()
+    try:
+        for path in args.logs:
+            readLog(path, stats)
+        summary = stats.summary()
+    except (FrameTimeError, OSError) as e:
+        eslog.error(str(e))
+        return 1
+    print(json.dumps(asdict(summary), indent=2))
+    for s in suggest(summary, args.emulator, {"frametime_target": args.target}):
+        print(f"{s.option}: {s.current} -> {s.value} ({s.reason})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
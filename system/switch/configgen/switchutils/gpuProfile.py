@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Graphics defaults from the gpu of the host
+# The backend, shader backend, ASTC decoding and async shader defaults were the same on every
+# machine, OpenGL for yuzu even on AMD Mesa where Vulkan is far faster. They are now picked from
+# RULES by the gpu vendor and kernel driver from sysfs and the vulkan ICDs installed, all from the
+# host snapshot, nothing is asked to the gpu. The settings use the batocera option names and only
+# apply to the options the user didn't set, gpu_auto=0 restores the fixed defaults.
+#   python -m switchutils.gpuProfile
+#   python -m switchutils.gpuProfile --root /tmp/fake-sysfs
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import hostInfo
+
+eslog = logging.getLogger(__name__)
+
+VULKAN = {"yuzu_backend": "1", "ryu_backend": "Vulkan"}
+OPENGL = {"yuzu_backend": "0", "ryu_backend": "OpenGl"}
+# yuzu: shaderbackend 0 GLSL, 1 GLASM, 2 SPIR-V; accelerate_astc 0 CPU, 1 GPU, 2 CPU async
+
+
+@dataclass(frozen=True)
+class Rule:
+    # every field set has to match, the first matching rule wins
+    name: str
+    vendor: str = ""
+    drivers: tuple[str, ...] = ()
+    # a vulkan ICD of the gpu vendor is installed, lavapipe doesn't count
+    vulkan: bool | None = None
+    settings: dict[str, str] = field(default_factory=dict)
+
+    def matches(self, gpu: dict, vulkan: bool) -> bool:
+        return ((not self.vendor or gpu.get("vendor") == self.vendor)
+                and (not self.drivers or gpu.get("driver") in self.drivers)
+                and (self.vulkan is None or self.vulkan == vulkan))
+
+
+RULES = (
+    Rule("nvidia", "nvidia", ("nvidia",), True,
+         {**VULKAN, "shaderbackend": "1", "accelerate_astc": "1", "async_shaders": "true"}),
+    Rule("nvidia nouveau", "nvidia", ("nouveau",), True,
+         {**VULKAN, "shaderbackend": "0", "accelerate_astc": "1", "async_shaders": "true"}),
+    Rule("amd", "amd", (), True,
+         {**VULKAN, "shaderbackend": "0", "accelerate_astc": "1", "async_shaders": "true"}),
+    Rule("intel", "intel", (), True,
+         {**VULKAN, "shaderbackend": "0", "accelerate_astc": "1", "async_shaders": "true"}),
+    # mobile gpus: decoding ASTC in compute shaders costs more than the spare cores do
+    Rule("arm", "arm", (), True,
+         {**VULKAN, "shaderbackend": "0", "accelerate_astc": "2", "async_shaders": "true"}),
+    Rule("qualcomm", "qualcomm", (), True,
+         {**VULKAN, "shaderbackend": "0", "accelerate_astc": "2", "async_shaders": "true"}),
+    Rule("nvidia opengl", "nvidia", ("nvidia",), False,
+         {**OPENGL, "shaderbackend": "1", "accelerate_astc": "1", "async_shaders": "true"}),
+    Rule("mesa opengl", "", ("amdgpu", "radeon", "i915", "xe", "nouveau"), False,
+         {**OPENGL, "shaderbackend": "0", "accelerate_astc": "1", "async_shaders": "true"}),
+    Rule("vulkan", "", (), True,
+         {**VULKAN, "shaderbackend": "0", "accelerate_astc": "2", "async_shaders": "true"}),
+    # the defaults of the generators before this selector
+    Rule("fallback", settings={"yuzu_backend": "0", "ryu_backend": "Vulkan", "shaderbackend": "0",
+                               "accelerate_astc": "1", "async_shaders": "true"}),
+)
+
+
+def select(snapshot: hostInfo.Host, rules: tuple[Rule, ...] = RULES) -> Rule:
+    gpu = snapshot.gpu or {}
+    vulkan = bool(gpu.get("vendor")) and gpu["vendor"] in snapshot.vulkanVendors()
+    return next(rule for rule in rules if rule.matches(gpu, vulkan))
+
+
+def defaults(system) -> dict[str, str]:
+    # settings for the options the user left unset
+    if system.isOptSet("gpu_auto") and system.config["gpu_auto"] == "0":
+        return {}
+    snapshot = hostInfo.host()
+    rule = select(snapshot)
+    gpu = snapshot.gpu or {}
+    eslog.debug(f"gpu {gpu.get('vendor') or 'unknown'} ({gpu.get('driver') or 'no driver'}): {rule.name} defaults")
+    return {key: value for key, value in rule.settings.items() if not system.isOptSet(key)}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="graphics defaults picked from the gpu")
+    parser.add_argument("--root", type=Path, help="read sysfs and the vulkan ICDs below this folder")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    snapshot = hostInfo.gather(args.root) if args.root is not None else hostInfo.host()
+    rule = select(snapshot)
+    print(json.dumps({"gpu": snapshot.gpu, "vulkan": sorted(snapshot.vulkanVendors()), "rule": rule.name,
+                      "settings": rule.settings}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+# Host capability snapshot
+# The static facts the generators look at, batocera version, kernel, cpu topology, gpus from sysfs,
+# vulkan ICDs, installed emulator versions and debug flags, gathered once per boot without starting
+# any process and kept in /var/run/switch-host.json. The files that can change without a reboot
+# (the version files of an update, debugcontrollers.txt) are stamped with their mtime, a launch
+# checks these stamps and gathers the facts again when one changed.
+#   python -m switchutils.hostInfo show
+#   python -m switchutils.hostInfo refresh
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from functools import cache
+from pathlib import Path
+
+from . import slots
+from .switchPaths import HOST_SNAPSHOT, SWITCH_EXTRA, SWITCH_HOME, SWITCH_SLOTS
+
+eslog = logging.getLogger(__name__)
+
+# bumped when the layout of the snapshot changes
+FORMAT = 1
+BATOCERA_VERSION = Path("usr/share/batocera/batocera.version")
+DEBUG_CONTROLLERS = SWITCH_HOME / "configgen" / "debugcontrollers.txt"
+VULKAN_ICD_DIRS = (Path("usr/share/vulkan/icd.d"), Path("etc/vulkan/icd.d"))
+
+PCI_VENDORS = {"0x1002": "amd", "0x10de": "nvidia", "0x8086": "intel", "0x5143": "qualcomm"}
+# platform gpus have no pci ids, their kernel driver tells the vendor
+DRIVER_VENDORS = {
+    "amdgpu": "amd", "radeon": "amd", "i915": "intel", "xe": "intel", "nouveau": "nvidia", "nvidia": "nvidia",
+    "msm": "qualcomm", "panfrost": "arm", "panthor": "arm", "lima": "arm", "mali": "arm", "v3d": "broadcom",
+    "vc4": "broadcom", "etnaviv": "vivante",
+}
+# vulkan drivers, from the file name of their ICD
+ICD_VENDORS = {
+    "radeon": "amd", "amd": "amd", "intel": "intel", "nvidia": "nvidia", "nouveau": "nvidia",
+    "freedreno": "qualcomm", "panfrost": "arm", "mali": "arm", "broadcom": "broadcom", "lvp": "software",
+}
+
+
+@dataclass
+class Host:
+    batocera_version: str = ""
+    kernel: str = ""
+    machine: str = ""
+    cpu: dict = field(default_factory=dict)
+    gpus: list[dict] = field(default_factory=list)
+    vulkan_icds: list[dict] = field(default_factory=list)
+    # version.txt of every emulator of slots.TARGETS
+    emulators: dict[str, str | None] = field(default_factory=dict)
+    debug: dict[str, bool] = field(default_factory=dict)
+    stamps: dict[str, int | None] = field(default_factory=dict)
+    format: int = FORMAT
+
+    @property
+    def batoceraMajor(self) -> int | None:
+        match = re.match(r"\d+", self.batocera_version)
+        return int(match[0]) if match else None
+
+    @property
+    def gpu(self) -> dict | None:
+        # the gpu the boot console runs on
+        return self.gpus[0] if self.gpus else None
+
+    def emulatorVersion(self, target: str) -> str | None:
+        return self.emulators.get(target)
+
+    def vulkanVendors(self) -> set[str]:
+        return {icd["vendor"] for icd in self.vulkan_icds if icd.get("vendor")}
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text(errors="replace").strip()
+    except OSError:
+        return None
+
+
+def _stamp(path: Path) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cpu(root: Path) -> dict:
+    model = ""
+    for line in (_read(root / "proc/cpuinfo") or "").splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() in ("model name", "Hardware", "Model") and value.strip():
+            model = value.strip()
+            break
+    folders = [p for p in (root / "sys/devices/system/cpu").glob("cpu[0-9]*") if p.name[3:].isdigit()]
+    folders.sort(key=lambda p: int(p.name[3:]))
+    cores, packages, max_khz = set(), set(), []
+    for folder in folders:
+        package = _read(folder / "topology/physical_package_id")
+        cores.add((package, _read(folder / "topology/core_id")))
+        packages.add(package)
+        frequency = _read(folder / "cpufreq/cpuinfo_max_freq")
+        max_khz.append(int(frequency) if frequency and frequency.isdigit() else 0)
+    return {"model": model, "logical": len(folders) or os.cpu_count() or 1, "cores": len(cores) or os.cpu_count() or 1,
+            "packages": len(packages) or 1, "max_khz": max_khz}
+
+
+def _gpus(root: Path) -> list[dict]:
+    gpus = []
+    for card in sorted((root / "sys/class/drm").glob("card*")):
+        if not card.name[4:].isdigit():
+            continue
+        device = card / "device"
+        try:
+            driver = os.path.basename(os.readlink(device / "driver"))
+        except OSError:
+            uevent = dict(line.split("=", 1) for line in (_read(device / "uevent") or "").splitlines() if "=" in line)
+            driver = uevent.get("DRIVER", "")
+        vendor_id = _read(device / "vendor") or ""
+        gpus.append({"card": card.name, "vendor": PCI_VENDORS.get(vendor_id) or DRIVER_VENDORS.get(driver, ""),
+                     "vendor_id": vendor_id, "device_id": _read(device / "device") or "", "driver": driver,
+                     "boot_vga": _read(device / "boot_vga") == "1"})
+    # the boot gpu first, a discrete card is usually the one with the display
+    gpus.sort(key=lambda g: not g["boot_vga"])
+    return gpus
+
+
+def _vulkanIcds(root: Path) -> list[dict]:
+    icds = []
+    for folder in VULKAN_ICD_DIRS:
+        for path in sorted((root / folder).glob("*.json")):
+            try:
+                icd = json.loads(path.read_text()).get("ICD", {})
+            except (OSError, ValueError, AttributeError):
+                continue
+            name = path.name.lower()
+            vendor = next((v for key, v in ICD_VENDORS.items() if key in name), "")
+            icds.append({"file": str(path), "library": icd.get("library_path", ""),
+                         "api_version": icd.get("api_version", ""), "vendor": vendor})
+    return icds
+
+
+def _watched(root: Path) -> list[Path]:
+    # the files that change without a reboot
+    watched = [root / BATOCERA_VERSION, DEBUG_CONTROLLERS]
+    for target in slots.TARGETS:
+        # the slot in use, through its symlink, and the version.txt of an install without slots
+        watched += [SWITCH_SLOTS / target.lower() / slots.CURRENT / slots.VERSION_FILE,
+                    SWITCH_EXTRA / slots.TARGETS[target][1] / slots.VERSION_FILE]
+    return watched
+
+
+def gather(root: Path = Path("/")) -> Host:
+    root = Path(root)
+    emulators = {}
+    for target in slots.TARGETS:
+        version = _read(slots.versionFile(target))
+        emulators[target] = version.splitlines()[0].strip() if version else None
+    debug_controllers = _read(DEBUG_CONTROLLERS)
+    uname = os.uname()
+    return Host(batocera_version=_read(root / BATOCERA_VERSION) or "", kernel=uname.release, machine=uname.machine,
+                cpu=_cpu(root), gpus=_gpus(root), vulkan_icds=_vulkanIcds(root), emulators=emulators,
+                debug={"controllers": bool(debug_controllers)},
+                stamps={str(path): _stamp(path) for path in _watched(root)})
+
+
+def load(path: Path = HOST_SNAPSHOT) -> Host | None:
+    # None when missing, of another format or stamped files changed
+    try:
+        data = json.loads(path.read_text())
+        snapshot = Host(**data)
+    except (OSError, ValueError, TypeError):
+        return None
+    if snapshot.format != FORMAT:
+        return None
+    if any(_stamp(Path(name)) != stamp for name, stamp in snapshot.stamps.items()):
+        return None
+    return snapshot
+
+
+def save(snapshot: Host, path: Path = HOST_SNAPSHOT) -> None:
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary.write_text(json.dumps(asdict(snapshot), indent=2))
+        os.replace(temporary, path)
+    except OSError as e:
+        eslog.warning(f"unable to save the host snapshot {path}: {e}")
+
+
+@cache
+def host() -> Host:
+    snapshot = load()
+    if snapshot is None:
+        snapshot = gather()
+        save(snapshot)
+    return snapshot
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="capabilities of the host, gathered once per boot")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("show", help="print the snapshot")
+    commands.add_parser("refresh", help="gather the facts again")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "refresh":
+        save(gather())
+    print(json.dumps(asdict(host()), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# Import time benchmark
+# Runs `python -X importtime` on a statement in a fresh interpreter, a few times to smooth the noise,
+# and fails when the best cumulative time of the watched module exceeds its budget. Used to keep
+# the lazy sdl2 package lazy:
+#   python -m switchutils.importTime "import sdl2; sdl2.SDL_Init; from sdl2 import joystick" --module sdl2 --budget 40
+# and the imports of a launch, from the configgen bundle when there is a current one, within
+# LAUNCH_BUDGET_MS:
+#   python -m switchutils.importTime --launch
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+CONFIGGEN = Path(__file__).resolve().parent.parent
+# everything switchlauncher.py imports before it parses its arguments
+LAUNCH_STATEMENT = "import switchlauncher"
+LAUNCH_BUDGET_MS = 250.0
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    # 0 for the imports done by the statement itself
+    depth: int
+
+
+def measure(statement: str, python: str = sys.executable, cwd: Path = CONFIGGEN) -> list[ImportTime]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (str(cwd), env.get("PYTHONPATH", "")) if p)
+    result = subprocess.run([python, "-X", "importtime", "-c", statement], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        times.append(ImportTime(module.strip(), int(self_us), int(cumulative_us), depth))
+    return times
+
+
+def cumulative(times: list[ImportTime], module: str) -> int:
+    # the package and the submodules the statement loads lazily after it
+    return sum(t.cumulative_us for t in times
+               if t.depth == 0 and (t.module == module or t.module.startswith(module + ".")))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="check the import time of configgen modules")
+    parser.add_argument("statement", nargs="?", help="python statement to time, e.g. 'import sdl2'")
+    parser.add_argument("-m", "--module", help="module whose cumulative import time is checked")
+    parser.add_argument("-b", "--budget", type=float, help="budget in milliseconds")
+    parser.add_argument("-l", "--launch", action="store_true",
+                        help=f"time the imports of switchlauncher.py, {LAUNCH_BUDGET_MS:g} ms budget by default")
+    parser.add_argument("-r", "--runs", type=int, default=5)
+    parser.add_argument("-t", "--top", type=int, default=10, help="slowest imports to show")
+    args = parser.parse_args(argv)
+    if args.launch:
+        args.statement = args.statement or LAUNCH_STATEMENT
+        args.module = args.module or "switchlauncher"
+        args.budget = LAUNCH_BUDGET_MS if args.budget is None else args.budget
+    if not args.statement or not args.module:
+        parser.error("a statement and --module are needed without --launch")
+
+    runs = [measure(args.statement) for _ in range(args.runs)]
+    best = min(runs, key=lambda times: cumulative(times, args.module))
+    total = cumulative(best, args.module) / 1000
+    for t in sorted(best, key=lambda t: t.self_us, reverse=True)[:args.top]:
+        print(f"{t.self_us / 1000:8.2f} ms  {t.module}")
+    print(f"{args.module}: {total:.2f} ms" + (f" (budget {args.budget:.2f} ms)" if args.budget else ""))
+    if args.budget is not None and total > args.budget:
+        print(f"{args.module} is over its import time budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
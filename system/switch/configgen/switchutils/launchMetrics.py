@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+# Launch metrics across launches
+# switchlauncher times the phases of every launch, the generator, the SDL controller probe and the time
+# from the emulator exit back to ES, and folds them into Prometheus histograms and counters. The state
+# is the textfile itself: it is parsed, updated and replaced with a rename after each launch, so the
+# node_exporter textfile collector can read it and nothing else is needed to keep the totals.
+#   node_exporter --collector.textfile.directory=/userdata/system/switch/metrics
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import re
+import resource
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from configgen.batoceraPaths import CONFIGS
+
+from .switchPaths import SWITCH_METRICS
+
+if TYPE_CHECKING:
+    from .sessionSampler import ResourceSummary
+
+eslog = logging.getLogger(__name__)
+
+PREFIX = "switch_launcher_"
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAUNCH_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 60.0)
+# folders holding the files written by the generators, not recursed
+CONFIG_ROOTS = (CONFIGS / "yuzu", CONFIGS / "Ryujinx", CONFIGS / "Ryujinx" / "system")
+
+_SAMPLE = re.compile(r"^(?P<name>[a-zA-Z_:][\w:]*)(?:\{(?P<labels>.*)\})?\s+(?P<value>\S+)")
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m[1] == "n" else m[1], value)
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _labels(labels: Labels, extra: str = "") -> str:
+    text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    text = ",".join(t for t in (text, extra) if t)
+    return "{" + text + "}" if text else ""
+
+
+@dataclass
+class Metric:
+    name: str
+    kind: str
+    help: str
+    buckets: tuple[float, ...] = ()
+    # histograms: a count per bucket, then +Inf, then the sum. counters: the value
+    samples: dict[Labels, list[float]] = field(default_factory=dict)
+
+    def _sample(self, labels: Labels) -> list[float]:
+        if labels not in self.samples:
+            self.samples[labels] = [0.0] * (len(self.buckets) + 2 if self.kind == "histogram" else 1)
+        return self.samples[labels]
+
+    def observe(self, value: float, **labels: str) -> None:
+        sample = self._sample(tuple(sorted(labels.items())))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                sample[i] += 1
+        sample[-2] += 1
+        sample[-1] += value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self._sample(tuple(sorted(labels.items())))[0] += amount
+
+    def load(self, suffix: str, labels: dict[str, str], value: float) -> None:
+        le = labels.pop("le", None)
+        sample = self._sample(tuple(sorted(labels.items())))
+        if self.kind == "counter":
+            sample[0] = value
+        elif suffix == "_sum":
+            sample[-1] = value
+        elif suffix == "_bucket" and le == "+Inf":
+            sample[-2] = value
+        elif suffix == "_bucket" and le is not None and float(le) in self.buckets:
+            sample[self.buckets.index(float(le))] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, sample in sorted(self.samples.items()):
+            if self.kind == "counter":
+                lines.append(f"{self.name}{_labels(labels)} {_number(sample[0])}")
+                continue
+            for bound, count in zip((*self.buckets, float("inf")), sample):
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(labels, le)} {_number(count)}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(round(sample[-1], 6))}")
+            lines.append(f"{self.name}_count{_labels(labels)} {_number(sample[-2])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        self.phase = self._add("phase_seconds", "histogram", "duration of the launch phases", SECONDS_BUCKETS)
+        self.launch = self._add("launch_seconds", "histogram", "process start to emulator start", LAUNCH_BUCKETS)
+        self.generator = self._add("generator_seconds", "histogram", "time spent in generator.generate", SECONDS_BUCKETS)
+        self.sdl_probe = self._add("sdl_probe_seconds", "histogram", "SDL controller probe of the generators", SECONDS_BUCKETS)
+        self.exit_to_es = self._add("exit_to_es_seconds", "histogram", "emulator exit to launcher exit", SECONDS_BUCKETS)
+        self.config_bytes = self._add("config_bytes_total", "counter", "bytes of emulator configuration written")
+        self.exits = self._add("exits_total", "counter", "emulator exits by exit code")
+
+    def _add(self, name: str, kind: str, help: str, buckets: tuple[float, ...] = ()) -> Metric:
+        metric = Metric(PREFIX + name, kind, help, buckets)
+        self.metrics[metric.name] = metric
+        return metric
+
+    def parse(self, text: str) -> None:
+        for line in text.splitlines():
+            match = _SAMPLE.match(line)
+            if match is None or line.startswith("#"):
+                continue
+            name, suffix = match["name"], ""
+            for ending in ("_bucket", "_sum", "_count"):
+                if name.endswith(ending) and name[:-len(ending)] in self.metrics:
+                    name, suffix = name[:-len(ending)], ending
+            metric = self.metrics.get(name)
+            if metric is None or suffix == "_count":
+                continue
+            labels = {k: _unescape(v) for k, v in _LABEL.findall(match["labels"] or "")}
+            try:
+                metric.load(suffix, labels, float(match["value"]))
+            except ValueError:
+                continue
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics.values() if metric.samples for line in metric.render()) + "\n"
+
+
+def processAge() -> float:
+    # seconds since this process was started, so the interpreter startup counts in the launch latency
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rpartition(")")[2].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            return max(float(f.read().split()[0]) - started, 0.0)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def configBytes(since: float, roots: tuple[Path, ...] = CONFIG_ROOTS) -> int:
+    written = 0
+    for root in roots:
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if entry.is_file(follow_symlinks=False) and stat.st_mtime >= since:
+                written += stat.st_size
+    return written
+
+
+@dataclass
+class LaunchRecord:
+    emulator: str = "unknown"
+    rom: str | None = None
+    # settings of the launch, wall clock time of the process start
+    settings: dict[str, str] = field(default_factory=dict)
+    started_at: float = 0.0
+    phases: dict[str, float] = field(default_factory=dict)
+    config_bytes: int = 0
+    # seconds from the process start to the emulator start, then to its exit, then to the launcher exit
+    launch: float | None = None
+    duration: float | None = None
+    exit_to_es: float | None = None
+    exit_code: int = -1
+    # of the emulator tree, from the rusage of the children the launcher waited for
+    peak_rss: int | None = None
+    cpu_time: float | None = None
+    resources: ResourceSummary | None = None
+    # the logAnalyzer report of the emulator output
+    log_events: dict | None = None
+    # the frameTimes percentiles and suggestions of the session
+    frame_times: dict | None = None
+
+
+def update(path: Path, record: LaunchRecord) -> None:
+    registry = Registry()
+    try:
+        registry.parse(path.read_text())
+    except OSError:
+        pass
+    emulator = record.emulator
+    for phase, seconds in record.phases.items():
+        if phase == "generator":
+            registry.generator.observe(seconds, emulator=emulator)
+        elif phase == "sdl_probe":
+            registry.sdl_probe.observe(seconds, emulator=emulator)
+        else:
+            registry.phase.observe(seconds, emulator=emulator, phase=phase)
+    if record.launch is not None:
+        registry.launch.observe(record.launch, emulator=emulator)
+    if record.exit_to_es is not None:
+        registry.exit_to_es.observe(record.exit_to_es, emulator=emulator)
+    registry.config_bytes.inc(record.config_bytes, emulator=emulator)
+    registry.exits.inc(1, emulator=emulator, code=str(record.exit_code))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_text(registry.render())
+    os.replace(temporary, path)
+
+
+class LaunchRecorder:
+    def __init__(self):
+        self.record = LaunchRecord()
+        self.path: Path | None = SWITCH_METRICS
+        age = processAge()
+        self._origin = time.monotonic() - age
+        self.record.started_at = time.time() - age
+        self._stopped: float | None = None
+        self._usage: resource.struct_rusage | None = None
+
+    def configure(self, system, rom: str | None) -> None:
+        self.record.emulator = system.config.get("emulator", "unknown")
+        self.record.rom = rom
+        self.record.settings = dict(system.config)
+        if system.isOptSet("metrics") and system.config["metrics"] == "0":
+            self.path = None
+        elif system.isOptSet("metrics_textfile") and system.config["metrics_textfile"] != "":
+            self.path = Path(system.config["metrics_textfile"])
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.record.phases[phase] = self.record.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    @contextmanager
+    def generating(self) -> Iterator[None]:
+        # the generator phase and what it wrote to the emulator configs
+        # fat/exfat userdata only keeps mtimes to 2 seconds
+        since = time.time() - 2
+        with self.phase("generator"):
+            yield
+        self.record.config_bytes += configBytes(since)
+
+    def started(self) -> None:
+        self.record.launch = time.monotonic() - self._origin
+        self._usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    def stopped(self, exit_code: int) -> None:
+        self._stopped = time.monotonic()
+        if self.record.launch is not None:
+            self.record.duration = self._stopped - self._origin - self.record.launch
+        self.record.exit_code = exit_code
+        if self._usage is not None:
+            # maxrss is the largest child waited for, the emulator unless a script outgrew it
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self.record.peak_rss = usage.ru_maxrss * 1024
+            self.record.cpu_time = (usage.ru_utime + usage.ru_stime) - (self._usage.ru_utime + self._usage.ru_stime)
+
+    def finish(self, exit_code: int) -> None:
+        # called right before the launcher exits, never fails the launch
+        self.record.exit_code = exit_code
+        if self._stopped is not None:
+            self.record.exit_to_es = time.monotonic() - self._stopped
+        if self.path is None:
+            return
+        try:
+            update(self.path, self.record)
+        except Exception as e:
+            eslog.warning(f"unable to write the launch metrics: {e}")
+
+
+# the launch of this process, filled by switchlauncher and the generators
+recorder = LaunchRecorder()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="show the switch launcher metrics")
+    parser.add_argument("path", nargs="?", type=Path, default=SWITCH_METRICS)
+    args = parser.parse_args(argv)
+
+    registry = Registry()
+    try:
+        registry.parse(args.path.read_text())
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    for metric in (registry.launch, registry.generator, registry.sdl_probe, registry.exit_to_es):
+        for labels, sample in sorted(metric.samples.items()):
+            if sample[-2]:
+                print(f"{metric.name[len(PREFIX):]:<20} {dict(labels)} {sample[-2]:.0f} launches, mean {sample[-1] / sample[-2]:.3f}s")
+    for labels, sample in sorted(registry.exits.samples.items()):
+        print(f"{'exits':<20} {dict(labels)} {sample[0]:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
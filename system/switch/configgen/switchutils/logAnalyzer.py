@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+# Streaming emulator log analyzer
+# Follows the emulator output while the game runs, the stdout/stderr pipes for ryujinx and the log file
+# for yuzu, and matches every line against the rules of its emulator: shader and pipeline compilation,
+# shader/pipeline cache loads and rebuilds, PPTC loads and translations. Only the counters, the open
+# begin/end pairs and the current second of compile events are kept, plus a bounded tail of the output
+# for the launcher log, so memory doesn't grow with the session. The summary goes into the session
+# record. Enabled with switch.log_analyzer=1.
+#   python -m switchutils.logAnalyzer yuzu /userdata/system/configs/yuzu/log/yuzu_log.txt
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+from configgen.batoceraPaths import CONFIGS
+
+eslog = logging.getLogger(__name__)
+
+# longest line kept, the rest of a longer line is skipped
+MAX_LINE = 0x2000
+# lines of each output stream kept for the launcher log
+TAIL_LINES = 2000
+POLL_INTERVAL = 0.5
+YUZU_LOG = CONFIGS / "yuzu" / "log" / "yuzu_log.txt"
+
+_TIMESTAMPS = (
+    # ryujinx: 00:01:02.345 |I| ...
+    (re.compile(rb"^(\d+):(\d\d):(\d\d)\.(\d+)"), lambda m: int(m[1]) * 3600 + int(m[2]) * 60 + float(m[3] + b"." + m[4])),
+    # yuzu: [  62.345678] ...
+    (re.compile(rb"^\[\s*(\d+\.\d+)\]"), lambda m: float(m[1])),
+)
+
+
+@dataclass(frozen=True)
+class Rule:
+    event: str
+    pattern: re.Pattern
+    # groups holding a count and a duration in seconds, 0 when the line has none
+    count: int = 0
+    seconds: int = 0
+    # "begin" starts the timer of the event, "end" stops it and adds the elapsed time
+    phase: str | None = None
+
+
+def _rule(event: str, pattern: str, **kwargs) -> Rule:
+    return Rule(event, re.compile(pattern.encode(), re.IGNORECASE), **kwargs)
+
+
+RULES = {
+    "ryujinx": (
+        _rule("shader_cache_load", r"\bGpu\b.*\bLoading\b.*\bshader", phase="begin"),
+        _rule("shader_cache_load", r"Shader cache loaded (\d+)", count=1, phase="end"),
+        _rule("shader_rebuild", r"Rebuilding (\d+) shaders", count=1),
+        _rule("shader_compile", r"\bGpu\b.*\b(?:compil|translat)\w* (?:shader|program)"),
+        _rule("ptc_load", r"\bPtc\b.*\bLoad(?:ed|ing)? (?:translation|profiling)"),
+        _rule("ptc_translate", r"(\d+) of \d+ functions translated.*?in ([\d.]+) ?s", count=1, seconds=2),
+        _rule("ptc_rebuild", r"\bPtc\b.*\b(?:invalid|outdated|rebuild|mismatch)"),
+    ),
+    "yuzu": (
+        _rule("pipeline_cache_load", r"\bRender_\w+\b.*\b(?:Loading|LoadDiskResources)\b.*\b(?:pipeline|shader)", phase="begin"),
+        _rule("pipeline_cache_load", r"(?:Total Pipeline Count:|Loaded) (\d+)", count=1, phase="end"),
+        _rule("pipeline_compile", r"\bRender_Vulkan\b.*\b(?:creat|build|compil)\w* (?:graphics |compute )?pipeline"),
+        _rule("shader_compile", r"\b(?:Shader\w*|Render_\w+)\b.*\b(?:compil|recompil)\w* shader"),
+        _rule("cache_invalidated", r"(?:pipeline|shader) cache\b.*\b(?:invalid|mismatch|outdated)"),
+    ),
+}
+# events whose lines are the stalls a player sees
+COMPILE_EVENTS = {"shader_compile", "pipeline_compile"}
+
+
+def family(emulator: str) -> str | None:
+    for name in RULES:
+        if emulator.startswith(name):
+            return name
+    return None
+
+
+@dataclass
+class EventStats:
+    lines: int = 0
+    count: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class LogSummary:
+    lines: int = 0
+    events: dict[str, EventStats] = field(default_factory=dict)
+    # seconds with compile events after the cache load, and the most compile events in one of them
+    compile_seconds: int = 0
+    compile_peak: int = 0
+
+
+class LogAnalyzer:
+    def __init__(self, emulator: str, logfile: Path | None = None):
+        self.emulator = family(emulator) or emulator
+        # the log file to follow, the output of the emulator when None
+        self.logfile = logfile
+        self.rules = RULES.get(self.emulator, ())
+        self.summary = LogSummary()
+        self._lock = threading.Lock()
+        self._begun: dict[str, float] = {}
+        self._second: int | None = None
+        self._in_second = 0
+        self._origin = time.monotonic()
+
+    def _timestamp(self, line: bytes) -> float:
+        for pattern, parse in _TIMESTAMPS:
+            match = pattern.match(line)
+            if match is not None:
+                return parse(match)
+        return time.monotonic() - self._origin
+
+    def feed(self, line: bytes) -> None:
+        with self._lock:
+            self.summary.lines += 1
+            for rule in self.rules:
+                match = rule.pattern.search(line)
+                if match is not None:
+                    self._match(rule, match, line)
+
+    def _match(self, rule: Rule, match: re.Match, line: bytes) -> None:
+        stats = self.summary.events.setdefault(rule.event, EventStats())
+        stats.lines += 1
+        if rule.count and match[rule.count]:
+            stats.count += int(match[rule.count])
+        elif rule.phase != "begin":
+            stats.count += 1
+        if rule.seconds and match[rule.seconds]:
+            stats.seconds += float(match[rule.seconds])
+        if rule.phase is not None or rule.event in COMPILE_EVENTS:
+            now = self._timestamp(line)
+            if rule.phase == "begin":
+                self._begun.setdefault(rule.event, now)
+            elif rule.phase == "end" and rule.event in self._begun:
+                stats.seconds += max(now - self._begun.pop(rule.event), 0.0)
+            if rule.event in COMPILE_EVENTS:
+                self._compiled(int(now))
+
+    def _compiled(self, second: int) -> None:
+        if second != self._second:
+            self._second = second
+            self._in_second = 0
+            self.summary.compile_seconds += 1
+        self._in_second += 1
+        self.summary.compile_peak = max(self.summary.compile_peak, self._in_second)
+
+    def report(self) -> dict:
+        with self._lock:
+            return asdict(self.summary)
+
+    # sources
+
+    def _readStream(self, stream: BinaryIO, tail: deque, analyze: bool) -> None:
+        try:
+            while line := stream.readline(MAX_LINE):
+                if len(line) == MAX_LINE and not line.endswith(b"\n"):
+                    # skip the rest of an overlong line
+                    while (rest := stream.readline(MAX_LINE)) and not rest.endswith(b"\n"):
+                        pass
+                tail.append(line)
+                if analyze:
+                    self.feed(line)
+        except (OSError, ValueError):
+            pass
+
+    def _readFile(self, path: Path, stop: threading.Event) -> None:
+        # follows the file from its end, reopened when the emulator replaces or truncates it
+        f, inode, pending = None, None, b""
+        try:
+            if path.exists():
+                inode = path.stat().st_ino
+                f = path.open("rb")
+                f.seek(0, os.SEEK_END)
+            while True:
+                stopping = stop.wait(POLL_INTERVAL)
+                try:
+                    stat = path.stat()
+                except OSError:
+                    stat = None
+                if stat is not None and (f is None or stat.st_ino != inode or stat.st_size < f.tell()):
+                    if f is not None:
+                        f.close()
+                    f, inode, pending = path.open("rb"), stat.st_ino, b""
+                if f is not None:
+                    while chunk := f.read(0x10000):
+                        lines = (pending + chunk).split(b"\n")
+                        pending = lines.pop()[-MAX_LINE:]
+                        for line in lines:
+                            self.feed(line[:MAX_LINE])
+                if stopping:
+                    break
+        except OSError as e:
+            eslog.warning(f"log analyzer stopped following {path}: {e}")
+        finally:
+            if f is not None:
+                f.close()
+
+    def follow(self, proc: subprocess.Popen) -> tuple[bytes, bytes]:
+        # replaces proc.communicate(): waits for the emulator, returns the tails of its output
+        tails = (deque(maxlen=TAIL_LINES), deque(maxlen=TAIL_LINES))
+        readers = [threading.Thread(target=self._readStream, args=(stream, tail, self.logfile is None), daemon=True)
+                   for stream, tail in zip((proc.stdout, proc.stderr), tails) if stream is not None]
+        stop = threading.Event()
+        if self.logfile is not None:
+            readers.append(threading.Thread(target=self._readFile, args=(self.logfile, stop), daemon=True))
+        for reader in readers:
+            reader.start()
+        proc.wait()
+        stop.set()
+        for reader in readers:
+            reader.join(POLL_INTERVAL * 4)
+        return b"".join(tails[0]), b"".join(tails[1])
+
+
+def fromConfig(system) -> LogAnalyzer | None:
+    if not (system.isOptSet("log_analyzer") and system.config["log_analyzer"] == "1"):
+        return None
+    emulator = family(system.config.get("emulator", ""))
+    if emulator is None:
+        return None
+    # yuzu keeps its log in a file, ryujinx prints it
+    return LogAnalyzer(emulator, YUZU_LOG if emulator == "yuzu" else None)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="count the shader and cache events of an emulator log")
+    parser.add_argument("emulator", choices=sorted(RULES))
+    parser.add_argument("log", type=Path)
+    args = parser.parse_args(argv)
+
+    analyzer = LogAnalyzer(args.emulator)
+    with args.log.open("rb") as f:
+        analyzer._readStream(f, deque(maxlen=1), True)
+    print(json.dumps(analyzer.report(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
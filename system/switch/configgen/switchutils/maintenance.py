@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+# Cooperative pause of the background maintenance
+# switchlauncher publishes a session lock while a game runs. The updater, the firmware sync and
+# install, the nsz decompression and the nsz cache eviction call checkpoint() between their chunks:
+# while a session is live they suspend until it ends, while the cpu, io or memory pressure of
+# /proc/pressure is over its threshold they wait for it to drop, PRESSURE_WAIT at most so they still
+# make progress on a busy system. The launcher's own work, decompressing the rom it launches, is
+# never paused, neither by its session nor by the pressure. Jobs holding something the launcher may
+# need, the nsz pre-conversion, run interruptible(): checkpoint() raises Interrupted for a session
+# instead of waiting for it to end.
+# Shell jobs wait with: python -m switchutils.maintenance wait
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from .switchPaths import SESSION_LOCK, SWITCH_CONFIG
+
+eslog = logging.getLogger(__name__)
+
+# "some" avg10 percentages of /proc/pressure over which jobs wait, PAUSE_<RESOURCE>_PRESSURE in
+# ~/switch/CONFIG.txt, 0 never waits on that resource
+DEFAULT_THRESHOLDS = {"cpu": 60.0, "io": 40.0, "memory": 20.0}
+PRESSURE_ROOT = Path("/proc/pressure")
+# checkpoints closer than that don't look at the lock or the pressure again
+CHECK_INTERVAL = 1.0
+POLL_INTERVAL = 2.0
+PRESSURE_WAIT = 30.0
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _pid_alive(pid: int) -> bool:
+    # a launcher that exited but wasn't reaped yet is a zombie, its session is over
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_bytes()
+    except OSError:
+        return False
+    return stat[stat.rfind(b")") + 2:][:1] != b"Z"
+
+
+def publish(emulator: str, rom: str, path: Path = SESSION_LOCK) -> bool:
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary.write_text(json.dumps({"pid": os.getpid(), "emulator": emulator, "rom": rom,
+                                         "started": time.time()}))
+        os.replace(temporary, path)
+    except OSError as e:
+        eslog.warning(f"unable to publish the session lock {path}: {e}")
+        return False
+    return True
+
+
+def release(path: Path = SESSION_LOCK) -> None:
+    # only the launcher that published the lock removes it
+    if ownsSession(path):
+        path.unlink(missing_ok=True)
+
+
+@contextmanager
+def session(emulator: str, rom: str, path: Path = SESSION_LOCK) -> Iterator[None]:
+    publish(emulator, rom, path)
+    try:
+        yield
+    finally:
+        release(path)
+
+
+def readLock(path: Path = SESSION_LOCK) -> dict | None:
+    try:
+        lock = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    return lock if isinstance(lock, dict) else None
+
+
+def activeSession(path: Path = SESSION_LOCK) -> dict | None:
+    # the live session of another process, locks left by a killed launcher are ignored
+    lock = readLock(path)
+    if lock is None or not isinstance(lock.get("pid"), int):
+        return None
+    if lock["pid"] == os.getpid() or not _pid_alive(lock["pid"]):
+        return None
+    return lock
+
+
+def ownsSession(path: Path = SESSION_LOCK) -> bool:
+    lock = readLock(path)
+    return lock is not None and lock.get("pid") == os.getpid()
+
+
+def pressure(root: Path = PRESSURE_ROOT) -> dict[str, float]:
+    found = {}
+    for resource in DEFAULT_THRESHOLDS:
+        try:
+            line = (root / resource).read_text().splitlines()[0]
+        except (OSError, IndexError):
+            continue
+        values = dict(field.split("=", 1) for field in line.split()[1:] if "=" in field)
+        try:
+            found[resource] = float(values["avg10"])
+        except (KeyError, ValueError):
+            continue
+    return found
+
+
+def readThresholds(path: Path = SWITCH_CONFIG) -> dict[str, float]:
+    from .updater import readConfig
+
+    config = readConfig(path)
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for resource in thresholds:
+        value = config.get(f"PAUSE_{resource.upper()}_PRESSURE", "")
+        try:
+            thresholds[resource] = float(value)
+        except ValueError:
+            continue
+    return thresholds
+
+
+class Pause:
+    def __init__(self, thresholds: dict[str, float] | None = None, lock: Path = SESSION_LOCK,
+                 pressure_root: Path = PRESSURE_ROOT):
+        self._thresholds = thresholds
+        self.lock = lock
+        self.pressure_root = pressure_root
+        self._next_check = 0.0
+        self._guard = threading.Lock()
+        self.interruptible = False
+
+    @property
+    def thresholds(self) -> dict[str, float]:
+        if self._thresholds is None:
+            self._thresholds = readThresholds()
+        return self._thresholds
+
+    def sessionReason(self) -> str | None:
+        lock = activeSession(self.lock)
+        if lock is None:
+            return None
+        return f"{lock.get('emulator', 'a game')} is running"
+
+    def pressureReason(self) -> str | None:
+        for resource, value in pressure(self.pressure_root).items():
+            limit = self.thresholds.get(resource, 0)
+            if limit > 0 and value > limit:
+                return f"{resource} pressure {value:.1f}% over {limit:g}%"
+        return None
+
+    def reason(self) -> str | None:
+        # the launcher doesn't throttle itself: a game waiting on its rom is what the pauses protect
+        if ownsSession(self.lock):
+            return None
+        return self.sessionReason() or self.pressureReason()
+
+    def checkpoint(self, job: str = "maintenance") -> None:
+        # cheap enough to be called for every chunk, the state is looked at once per CHECK_INTERVAL
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + CHECK_INTERVAL
+        if self.reason() is None:
+            return
+        # a single thread of a job waits and logs, the others queue behind it
+        with self._guard:
+            self.wait(job)
+
+    def wait(self, job: str = "maintenance") -> float:
+        started = time.monotonic()
+        reason = self.reason()
+        if reason is None:
+            return 0.0
+        eslog.info(f"{job} paused: {reason}")
+        while reason is not None and (self.sessionReason() is not None or
+                                      time.monotonic() - started < PRESSURE_WAIT):
+            session = self.sessionReason() if self.interruptible else None
+            if session is not None:
+                raise Interrupted(f"{job} interrupted: {session}")
+            time.sleep(POLL_INTERVAL)
+            reason = self.reason()
+        waited = time.monotonic() - started
+        if reason is None:
+            eslog.info(f"{job} resumed after {waited:.0f}s")
+        else:
+            eslog.info(f"{job} throttled, going on after {waited:.0f}s: {reason}")
+        self._next_check = time.monotonic() + CHECK_INTERVAL
+        return waited
+
+
+pause = Pause()
+
+
+def checkpoint(job: str = "maintenance") -> None:
+    pause.checkpoint(job)
+
+
+@contextmanager
+def interruptible() -> Iterator[None]:
+    pause.interruptible = True
+    try:
+        yield
+    finally:
+        pause.interruptible = False
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="pause switch maintenance jobs while a game runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    waiting = commands.add_parser("wait", help="return once no game runs and the pressure is low")
+    waiting.add_argument("--job", default="maintenance", help="name of the waiting job for the log")
+    commands.add_parser("status", help="print the session lock and the pressure")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "wait":
+        # shell jobs have no chunks to throttle, they wait for the session itself to end
+        while pause.reason() is not None:
+            pause.wait(args.job)
+        return 0
+    print(json.dumps({"session": activeSession(), "pressure": pressure(), "thresholds": pause.thresholds,
+                      "paused": pause.reason()}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Local update mirror
+# Serves a folder of emulator AppImages with HTTP range support and a manifest.json generated from
+# it, so the updater can be pointed at a LAN share or exercised against a local folder. Block
+# manifests for delta updates are generated next to the AppImages when missing.
+# Files are matched to emulators by name: yuzu-<version>.AppImage, ryujinxldn-<version>.AppImage, ...
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import re
+import sys
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from .delta import writeBlockManifest
+from .slots import TARGETS
+from .updater import sha256sum
+
+eslog = logging.getLogger(__name__)
+
+_RELEASE = re.compile(r"^(?P<emulator>[a-z]+)[-_](?P<version>[0-9][0-9.]*)\.appimage$", re.IGNORECASE)
+
+
+def buildManifest(root: Path) -> dict:
+    emulators = {}
+    for path in sorted(Path(root).iterdir()):
+        match = _RELEASE.match(path.name)
+        if match is None or not path.is_file() or match["emulator"].upper() not in TARGETS:
+            continue
+        emulators[match["emulator"].upper()] = {"file": path.name, "size": path.stat().st_size,
+                                                 "sha256": sha256sum(path), "version": match["version"],
+                                                 "blocks": writeBlockManifest(path).name}
+    return {"emulators": emulators}
+
+
+class MirrorHandler(SimpleHTTPRequestHandler):
+    manifest: bytes = b""
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] == "/manifest.json":
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(self.manifest)))
+            self.end_headers()
+            self.wfile.write(self.manifest)
+            return
+
+        byte_range = self.headers.get("Range")
+        if byte_range is None:
+            super().do_GET()
+            return
+        path = Path(self.translate_path(self.path))
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", byte_range.strip())
+        if not path.is_file() or match is None:
+            self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            return
+        size = path.stat().st_size
+        start = int(match[1])
+        end = min(int(match[2]) if match[2] else size - 1, size - 1)
+        if start > end:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with path.open("rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining and (data := f.read(min(remaining, 0x100000))):
+                self.wfile.write(data)
+                remaining -= len(data)
+
+
+def serve(root: Path, host: str = "", port: int = 8000) -> ThreadingHTTPServer:
+    handler = type("Handler", (MirrorHandler,), {"manifest": json.dumps(buildManifest(root)).encode()})
+    return ThreadingHTTPServer((host, port), partial(handler, directory=str(root)))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="serve a folder of emulators to the switch updater")
+    parser.add_argument("root", type=Path, help="folder holding <emulator>-<version>.AppImage files")
+    parser.add_argument("--host", default="", help="address to listen on, all by default")
+    parser.add_argument("-p", "--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = serve(args.root, args.host, args.port)
+    eslog.info(f"serving {args.root} on port {server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
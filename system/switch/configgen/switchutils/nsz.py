@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+
+# NSZ/XCZ decompression engine
+# Replaces the pip installed nsz tool that batocera-switch-nsz-converter.sh used to run in an xterm.
+# NCZ payloads are decompressed and re-encrypted in a thread pool and written back sequentially,
+# so memory use is bounded by the pool window whatever the size of the title.
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+from . import maintenance
+from .switchPaths import SWITCH_PYTHON
+
+# zstandard and pycryptodome are imported by the first decompression, the launches and the title
+# index only read headers and don't pay for them. When the image doesn't provide them they come
+# from SWITCH_PYTHON, where batocera-switch-updater.sh installs them: nothing is pip installed at launch
+zstandard = None
+AES = None
+if str(SWITCH_PYTHON) not in sys.path:
+    sys.path.append(str(SWITCH_PYTHON))
+
+eslog = logging.getLogger(__name__)
+
+NCZ_HEADER_SIZE = 0x4000
+CHUNK_SIZE = 0x100000
+HFS0_ALIGN = 0x200
+CRYPTO_CTR = (3, 4)
+# the journal is saved every JOURNAL_INTERVAL bytes, an interrupted title resumes inside its NCA
+JOURNAL_INTERVAL = 0x4000000
+
+COMPRESSED_SUFFIXES = {".nsz": ".nsp", ".xcz": ".xci"}
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class NszError(Exception):
+    pass
+
+
+@dataclass
+class _Entry:
+    name: str
+    offset: int
+    size: int
+    hashed_size: int = 0
+    sha256: bytes = b""
+
+
+@dataclass
+class _Section:
+    offset: int
+    size: int
+    crypto_type: int
+    key: bytes
+    counter: bytes
+
+
+@dataclass
+class _Ncz:
+    sections: list[_Section]
+    data_offset: int
+    block_size: int = 0
+    block_sizes: tuple[int, ...] = ()
+    starts: list[int] = field(default_factory=list)
+
+    @property
+    def nca_size(self) -> int:
+        return NCZ_HEADER_SIZE + sum(s.size for s in self.sections)
+
+
+@dataclass
+class _Segment:
+    kind: str  # "bytes", "copy" or "ncz"
+    size: int
+    data: bytes = b""
+    source: int = 0
+    name: str = ""
+    ncz: _Ncz | None = None
+
+
+def output_path(rom: str | Path) -> Path:
+    rom = Path(rom)
+    suffix = COMPRESSED_SUFFIXES.get(rom.suffix.lower())
+    if suffix is None:
+        raise NszError(f"{rom} is not a nsz or xcz file")
+    return rom.with_suffix(suffix)
+
+
+def default_threads() -> int:
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _cstr(table: bytes, offset: int) -> str:
+    end = table.index(b"\0", offset)
+    return table[offset:end].decode()
+
+
+def _uncompressed_name(name: str) -> str:
+    if name.lower().endswith(".ncz"):
+        return name[:-4] + ".nca"
+    return name
+
+
+def _align(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+def _build_strtab(names: list[str], size: int) -> tuple[bytes, list[int]]:
+    offsets = []
+    table = b""
+    for name in names:
+        offsets.append(len(table))
+        table += name.encode() + b"\0"
+    return table.ljust(max(size, _align(len(table), 0x10)), b"\0"), offsets
+
+
+def _read_pfs0(f: BinaryIO, base: int) -> tuple[list[_Entry], int]:
+    f.seek(base)
+    magic, count, strtab_size = struct.unpack("<4sII4x", f.read(0x10))
+    if magic != b"PFS0":
+        raise NszError("no PFS0 header found")
+    table = f.read(0x18 * count)
+    strtab = f.read(strtab_size)
+    header_size = 0x10 + 0x18 * count + strtab_size
+    entries = []
+    for i in range(count):
+        offset, size, name_offset = struct.unpack_from("<QQI4x", table, 0x18 * i)
+        entries.append(_Entry(_cstr(strtab, name_offset), base + header_size + offset, size))
+    return entries, strtab_size
+
+
+def _read_hfs0(f: BinaryIO, base: int) -> tuple[list[_Entry], int]:
+    f.seek(base)
+    magic, count, strtab_size = struct.unpack("<4sII4x", f.read(0x10))
+    if magic != b"HFS0":
+        raise NszError("no HFS0 header found")
+    table = f.read(0x40 * count)
+    strtab = f.read(strtab_size)
+    header_size = 0x10 + 0x40 * count + strtab_size
+    entries = []
+    for i in range(count):
+        offset, size, name_offset, hashed_size, digest = struct.unpack_from("<QQII8x32s", table, 0x40 * i)
+        entries.append(_Entry(_cstr(strtab, name_offset), base + header_size + offset, size, hashed_size, digest))
+    return entries, strtab_size
+
+
+def titleIds(rom: str | Path) -> list[str]:
+    # title ids of the tickets of a nsp/nsz or of the secure partition of a xci/xcz, from the headers
+    # only. A ticket is named after its rights id, the title id followed by the key generation
+    with open(rom, "rb") as f:
+        if Path(rom).suffix.lower() in (".xci", ".xcz"):
+            f.seek(0x100)
+            head = f.read(0x40)
+            if head[:4] != b"HEAD":
+                raise NszError("no XCI header found")
+            root, _ = _read_hfs0(f, struct.unpack_from("<Q", head, 0x30)[0])
+            secure = next((p for p in root if p.name == "secure"), None)
+            entries = _read_hfs0(f, secure.offset)[0] if secure is not None else []
+        else:
+            entries, _ = _read_pfs0(f, 0)
+    names = (e.name for e in entries)
+    return sorted({n[:16].upper() for n in names if n.lower().endswith(".tik") and len(n) == 36})
+
+
+def _pack_pfs0(names: list[str], layout: list[tuple[int, int]], strtab_size: int) -> bytes:
+    strtab, name_offsets = _build_strtab(names, strtab_size)
+    header = struct.pack("<4sII4x", b"PFS0", len(names), len(strtab))
+    for (offset, size), name_offset in zip(layout, name_offsets):
+        header += struct.pack("<QQI4x", offset, size, name_offset)
+    return header + strtab
+
+
+def _pack_hfs0(entries: list[_Entry], layout: list[tuple[int, int]], strtab_size: int) -> bytes:
+    strtab, name_offsets = _build_strtab([e.name for e in entries], strtab_size)
+    header = struct.pack("<4sII4x", b"HFS0", len(entries), len(strtab))
+    for entry, (offset, size), name_offset in zip(entries, layout, name_offsets):
+        header += struct.pack("<QQII8x32s", offset, size, name_offset, entry.hashed_size, entry.sha256)
+    return header + strtab
+
+
+def _read_ncz(f: BinaryIO, base: int) -> _Ncz:
+    f.seek(base + NCZ_HEADER_SIZE)
+    magic, count = struct.unpack("<8sQ", f.read(0x10))
+    if magic != b"NCZSECTN":
+        raise NszError("no NCZSECTN header found")
+    sections = []
+    for _ in range(count):
+        offset, size, crypto_type, _, key, counter = struct.unpack("<QQQQ16s16s", f.read(0x40))
+        sections.append(_Section(offset, size, crypto_type, key, counter))
+    if not sections:
+        raise NszError("ncz has no sections")
+    # the region between the fixed header and the first section is stored in clear
+    if sections[0].offset > NCZ_HEADER_SIZE:
+        sections.insert(0, _Section(NCZ_HEADER_SIZE, sections[0].offset - NCZ_HEADER_SIZE, 1, b"", b""))
+
+    ncz = _Ncz(sections, f.tell(), starts=[s.offset for s in sections])
+    if f.read(8) == b"NCZBLOCK":
+        _version, _type, _unused, exponent, blocks, _decompressed = struct.unpack("<BBBBIQ", f.read(0x10))
+        ncz.block_sizes = struct.unpack(f"<{blocks}I", f.read(4 * blocks))
+        ncz.block_size = 1 << exponent
+        ncz.data_offset = f.tell()
+    return ncz
+
+
+def _load_codecs() -> bool:
+    global zstandard, AES
+    if zstandard is None:
+        try:
+            import zstandard
+        except ImportError:
+            pass
+    if AES is None:
+        try:
+            from Cryptodome.Cipher import AES
+        except ImportError:
+            try:
+                from Crypto.Cipher import AES
+            except ImportError:
+                pass
+    return zstandard is not None and AES is not None
+
+
+def _encrypt(ncz: _Ncz, position: int, data: bytes) -> bytes:
+    # split the plain chunk on section boundaries and apply AES-CTR where the section asks for it
+    view = memoryview(data)
+    pieces = []
+    done = 0
+    while done < len(data):
+        offset = position + done
+        index = bisect.bisect_right(ncz.starts, offset) - 1
+        if index < 0:
+            raise NszError(f"offset {offset:#x} is not covered by any section")
+        section = ncz.sections[index]
+        length = min(len(data) - done, section.offset + section.size - offset)
+        if length <= 0:
+            raise NszError(f"offset {offset:#x} is not covered by any section")
+        piece = view[done:done + length]
+        if section.crypto_type in CRYPTO_CTR:
+            cipher = AES.new(section.key, AES.MODE_CTR, nonce=section.counter[:8], initial_value=offset >> 4)
+            if offset & 0xF:
+                cipher.encrypt(bytes(offset & 0xF))
+            piece = cipher.encrypt(piece)
+        pieces.append(piece)
+        done += length
+    return b"".join(pieces)
+
+
+def _decompress_block(ncz: _Ncz, position: int, raw: bytes, size: int) -> bytes:
+    if len(raw) < size:
+        raw = zstandard.ZstdDecompressor().decompress(raw, max_output_size=size)
+    if len(raw) != size:
+        raise NszError(f"block at {position:#x} decompressed to {len(raw)} bytes instead of {size}")
+    return _encrypt(ncz, position, raw)
+
+
+class Decompressor:
+    def __init__(self, source: str | Path, destination: str | Path | None = None,
+                 threads: int | None = None, progress: ProgressCallback | None = None):
+        self.source = Path(source)
+        self.destination = Path(destination) if destination is not None else output_path(self.source)
+        self.threads = threads or default_threads()
+        self.progress = progress
+        self.partial = self.destination.with_name(self.destination.name + ".part")
+        self.journal = self.destination.with_name(self.destination.name + ".part.json")
+        self.done = 0
+        self.total = 0
+        self.stamp: list[int] = []
+        self.journaled = 0
+
+    def run(self) -> Path:
+        if not _load_codecs():
+            raise NszError("nsz decompression needs the zstandard and pycryptodome(x) modules, "
+                           f"the switch updater installs them in {SWITCH_PYTHON}")
+
+        with self.source.open("rb") as f:
+            segments = self._plan(f)
+            self.total = sum(s.size for s in segments)
+
+            stat = self.source.stat()
+            self.stamp = [stat.st_size, stat.st_mtime_ns]
+            first, within = self._resume_point(segments)
+            offset = sum(s.size for s in segments[:first]) + within
+            mode = "r+b" if offset > 0 else "wb"
+            with self.partial.open(mode) as out, ThreadPoolExecutor(self.threads) as pool:
+                out.truncate(offset)
+                out.seek(offset)
+                self.done = self.journaled = offset
+                self._report()
+                for index in range(first, len(segments)):
+                    self._write(f, out, pool, segments[index], within if index == first else 0)
+                    self._save_journal(out)
+
+        if self.partial.stat().st_size != self.total:
+            raise NszError(f"{self.partial} has {self.partial.stat().st_size} bytes, expected {self.total}")
+        os.replace(self.partial, self.destination)
+        self.journal.unlink(missing_ok=True)
+        eslog.info(f"decompressed {self.source} to {self.destination}")
+        return self.destination
+
+    def planned_size(self) -> int:
+        # size of the decompressed title, read from the container headers only
+        with self.source.open("rb") as f:
+            return sum(s.size for s in self._plan(f))
+
+    def _plan(self, f: BinaryIO) -> list[_Segment]:
+        if self.source.suffix.lower() == ".xcz":
+            return self._plan_xci(f)
+        return self._plan_nsp(f)
+
+    def _resume_point(self, segments: list[_Segment]) -> tuple[int, int]:
+        # the segment to resume and the bytes of it kept, brought back to a point it can restart at
+        if not self.partial.exists() or not self.journal.exists():
+            return 0, 0
+        try:
+            state = json.loads(self.journal.read_text())
+            offset = int(state["offset"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0, 0
+        if state.get("source") != self.stamp or not 0 < offset <= sum(s.size for s in segments):
+            return 0, 0
+        if self.partial.stat().st_size < offset:
+            return 0, 0
+        start = 0
+        for index, segment in enumerate(segments):
+            if offset < start + segment.size:
+                within = self._restart(segment, offset - start)
+                eslog.info(f"resuming {self.destination} at {(start + within) >> 20} MiB, segment {index}")
+                return index, within
+            start += segment.size
+        return len(segments), 0
+
+    @staticmethod
+    def _restart(segment: _Segment, within: int) -> int:
+        # copies restart at any byte, ncz payloads at the block (or chunk of the zstd stream) holding it
+        if segment.kind == "copy":
+            return within
+        if segment.kind == "bytes" or within < NCZ_HEADER_SIZE:
+            return 0
+        step = segment.ncz.block_size or CHUNK_SIZE
+        return NCZ_HEADER_SIZE + (within - NCZ_HEADER_SIZE) // step * step
+
+    def _save_journal(self, out: BinaryIO) -> None:
+        out.flush()
+        os.fsync(out.fileno())
+        temporary = self.journal.with_suffix(".tmp")
+        temporary.write_text(json.dumps({"source": self.stamp, "offset": out.tell()}))
+        os.replace(temporary, self.journal)
+        self.journaled = out.tell()
+
+    def _report(self) -> None:
+        if self.progress is not None:
+            self.progress(self.done, self.total)
+
+    def _sink(self, out: BinaryIO, data: bytes, digest=None) -> None:
+        maintenance.checkpoint("nsz")
+        out.write(data)
+        if digest is not None:
+            digest.update(data)
+        self.done += len(data)
+        self._report()
+        if self.done - self.journaled >= JOURNAL_INTERVAL:
+            self._save_journal(out)
+
+    def _write(self, f: BinaryIO, out: BinaryIO, pool: ThreadPoolExecutor, segment: _Segment,
+               within: int = 0) -> None:
+        # within: bytes of the segment already in the output, from a resumed journal
+        if segment.kind == "bytes":
+            self._sink(out, segment.data)
+        elif segment.kind == "copy":
+            f.seek(segment.source + within)
+            remaining = segment.size - within
+            while remaining > 0:
+                data = f.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    raise NszError(f"unexpected end of {self.source}")
+                self._sink(out, data)
+                remaining -= len(data)
+        else:
+            self._write_ncz(f, out, pool, segment, within)
+
+    def _write_ncz(self, f: BinaryIO, out: BinaryIO, pool: ThreadPoolExecutor, segment: _Segment,
+                   within: int = 0) -> None:
+        ncz = segment.ncz
+        digest = hashlib.sha256()
+        start = out.tell() - within
+        if within:
+            # the hash covers the whole NCA, the part written before the interruption is read back
+            out.seek(start)
+            remaining = within
+            while remaining > 0:
+                data = out.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    raise NszError(f"unexpected end of {self.partial}")
+                digest.update(data)
+                remaining -= len(data)
+        else:
+            f.seek(segment.source)
+            self._sink(out, f.read(NCZ_HEADER_SIZE), digest)
+
+        position = max(within, NCZ_HEADER_SIZE)
+        tasks = self._block_tasks(f, ncz, position) if ncz.block_size else self._stream_tasks(f, ncz, position)
+        # keep a bounded window of chunks in flight, results are written in submission order
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(*task))
+            if len(pending) >= self.threads * 2:
+                self._sink(out, pending.popleft().result(), digest)
+        while pending:
+            self._sink(out, pending.popleft().result(), digest)
+
+        written = out.tell() - start
+        if written != segment.size:
+            raise NszError(f"{segment.name}: wrote {written} bytes, expected {segment.size}")
+        stem = segment.name.split(".")[0].lower()
+        if len(stem) == 32 and all(c in "0123456789abcdef" for c in stem):
+            if digest.hexdigest()[:32] != stem:
+                raise NszError(f"{segment.name}: hash mismatch, got {digest.hexdigest()[:32]}")
+            eslog.debug(f"{segment.name}: hash verified")
+        else:
+            eslog.debug(f"{segment.name}: no hash in the name, not verified")
+
+    def _block_tasks(self, f: BinaryIO, ncz: _Ncz, position: int = NCZ_HEADER_SIZE) -> Iterator[tuple]:
+        # position is on a block boundary, the blocks before it are skipped unread
+        first = (position - NCZ_HEADER_SIZE) // ncz.block_size
+        f.seek(ncz.data_offset + sum(ncz.block_sizes[:first]))
+        end = ncz.nca_size
+        for compressed in ncz.block_sizes[first:]:
+            size = min(ncz.block_size, end - position)
+            yield _decompress_block, ncz, position, f.read(compressed), size
+            position += size
+
+    def _stream_tasks(self, f: BinaryIO, ncz: _Ncz, position: int = NCZ_HEADER_SIZE) -> Iterator[tuple]:
+        # a single zstd stream cannot be split, decompress here and encrypt in the pool. It can't be
+        # entered in the middle either, a resumed one is decompressed up to position and discarded
+        f.seek(ncz.data_offset)
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        skipped = NCZ_HEADER_SIZE
+        while skipped < position:
+            data = reader.read(min(CHUNK_SIZE, position - skipped))
+            if not data:
+                raise NszError(f"compressed stream ended at {skipped:#x}, expected {ncz.nca_size:#x}")
+            skipped += len(data)
+        end = ncz.nca_size
+        while position < end:
+            wanted = min(CHUNK_SIZE, end - position)
+            chunk = b""
+            while len(chunk) < wanted:
+                data = reader.read(wanted - len(chunk))
+                if not data:
+                    raise NszError(f"compressed stream ended at {position + len(chunk):#x}, expected {end:#x}")
+                chunk += data
+            yield _encrypt, ncz, position, chunk
+            position += wanted
+
+    def _plan_files(self, f: BinaryIO, entries: list[_Entry], first: int, align: int) -> tuple[list[tuple[int, int]], list[_Segment]]:
+        # lay files out in their original order, relative to the start of the container data
+        layout: list[tuple[int, int]] = [(0, 0)] * len(entries)
+        segments = []
+        position = first
+        for index in sorted(range(len(entries)), key=lambda i: entries[i].offset):
+            entry = entries[index]
+            position = _align(position, align)
+            if entry.name.lower().endswith(".ncz"):
+                ncz = _read_ncz(f, entry.offset)
+                segment = _Segment("ncz", ncz.nca_size, source=entry.offset, name=entry.name, ncz=ncz)
+            else:
+                segment = _Segment("copy", entry.size, source=entry.offset, name=entry.name)
+            layout[index] = (position, segment.size)
+            segments.append(segment)
+            position += segment.size
+        return layout, self._padded(segments, layout)
+
+    @staticmethod
+    def _padded(segments: list[_Segment], layout: list[tuple[int, int]]) -> list[_Segment]:
+        result = []
+        position = None
+        for segment, (offset, size) in zip(segments, sorted(layout)):
+            if position is not None and offset > position:
+                result.append(_Segment("bytes", offset - position, data=bytes(offset - position)))
+            result.append(segment)
+            position = offset + size
+        return result
+
+    def _plan_nsp(self, f: BinaryIO) -> list[_Segment]:
+        entries, strtab_size = _read_pfs0(f, 0)
+        layout, segments = self._plan_files(f, entries, 0, 1)
+        header = _pack_pfs0([_uncompressed_name(e.name) for e in entries], layout, strtab_size)
+        return [_Segment("bytes", len(header), data=header)] + segments
+
+    def _plan_xci(self, f: BinaryIO) -> list[_Segment]:
+        f.seek(0)
+        head = bytearray(f.read(0x200))
+        if head[0x100:0x104] != b"HEAD":
+            raise NszError("no XCI header found")
+        root_offset, root_hashed = struct.unpack_from("<QQ", head, 0x130)
+        root, root_strtab = _read_hfs0(f, root_offset)
+        root_size = 0x10 + 0x40 * len(root) + root_strtab
+        base = root_offset + root_size
+
+        root_layout: list[tuple[int, int]] = [(0, 0)] * len(root)
+        first = min((p.offset for p in root), default=base) - base
+        body = []
+        position = first
+        for index in sorted(range(len(root)), key=lambda i: root[i].offset):
+            partition = root[index]
+            start = _align(position, HFS0_ALIGN)
+            if start > position:
+                body.append(_Segment("bytes", start - position, data=bytes(start - position)))
+            if partition.name == "secure":
+                segments = self._plan_partition(f, partition)
+                partition.sha256 = hashlib.sha256(segments[0].data[:partition.hashed_size]).digest()
+            else:
+                segments = [_Segment("copy", partition.size, source=partition.offset, name=partition.name)]
+            size = sum(s.size for s in segments)
+            root_layout[index] = (start, size)
+            body.extend(segments)
+            position = start + size
+
+        root_header = _pack_hfs0(root, root_layout, root_strtab)
+        struct.pack_into("<QQ32s", head, 0x130, root_offset, root_hashed,
+                         hashlib.sha256(root_header[:root_hashed]).digest())
+        plan = [_Segment("bytes", len(head), data=bytes(head)),
+                _Segment("copy", root_offset - len(head), source=len(head)),
+                _Segment("bytes", len(root_header), data=root_header)]
+        if first > 0:
+            plan.append(_Segment("bytes", first, data=bytes(first)))
+        return plan + body
+
+    def _plan_partition(self, f: BinaryIO, partition: _Entry) -> list[_Segment]:
+        entries, strtab_size = _read_hfs0(f, partition.offset)
+        header_size = 0x10 + 0x40 * len(entries) + strtab_size
+        first = min((e.offset for e in entries), default=0) - partition.offset - header_size
+        layout, segments = self._plan_files(f, entries, first, HFS0_ALIGN)
+        for entry in entries:
+            entry.name = _uncompressed_name(entry.name)
+        header = _pack_hfs0(entries, layout, strtab_size)
+        plan = [_Segment("bytes", len(header), data=header)]
+        if first > 0:
+            plan.append(_Segment("bytes", first, data=bytes(first)))
+        return plan + segments
+
+
+def decompress(source: str | Path, destination: str | Path | None = None,
+               threads: int | None = None, progress: ProgressCallback | None = None) -> Path:
+    return Decompressor(source, destination, threads, progress).run()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="decompress nsz/xcz titles to nsp/xci")
+    parser.add_argument("source", help="nsz or xcz file")
+    parser.add_argument("destination", nargs="?", help="output file, next to the source by default")
+    parser.add_argument("-t", "--threads", type=int, help="worker threads, all cpus by default")
+    args = parser.parse_args(argv)
+
+    last = [-1]
+
+    def progress(done: int, total: int) -> None:
+        percent = done * 100 // total if total else 100
+        if percent != last[0]:
+            last[0] = percent
+            print(f"\r{percent:3d}% {done >> 20}/{total >> 20} MiB", end="", flush=True)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        destination = decompress(args.source, args.destination, args.threads, progress)
+    except (NszError, OSError) as e:
+        print()
+        eslog.error(f"nsz decompression failed: {e}")
+        return 1
+    print()
+    print(destination)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
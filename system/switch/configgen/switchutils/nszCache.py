@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+# Bounded cache of decompressed nsz/xcz titles
+# Entries are keyed on the source size, mtime and a digest of its first bytes, so renaming a rom
+# keeps its entry and replacing it invalidates it. Least recently used entries are evicted when the
+# size budget is exceeded, except the ones pinned by a running game. The cache lock is only held to
+# pin and to pick the evicted entries, a title is decompressed under the lock of its own entry and
+# evicted entries are deleted after the lock is released: nothing that may pause at a maintenance
+# checkpoint keeps a launch of another title waiting.
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import maintenance, nsz
+from .switchPaths import NSZ_CACHE
+
+eslog = logging.getLogger(__name__)
+
+GIB = 1 << 30
+DEFAULT_BUDGET = 32 * GIB
+HEADER_DIGEST_SIZE = 0x10000
+ENTRY_FILE = "entry.json"
+PIN_PREFIX = "pin."
+EVICTED_PREFIX = ".evicted."
+# shown in a fullscreen xterm while the launcher decompresses a title, like the old converter script
+PROGRESS_FILE = Path("/tmp/switch-nsz-progress.txt")
+PROGRESS_LOG_STEP = 10
+
+
+def _pid_alive(pid: int) -> bool:
+    return Path(f"/proc/{pid}").exists()
+
+
+class NszCache:
+    def __init__(self, root: Path = NSZ_CACHE, budget: int = DEFAULT_BUDGET):
+        self.root = Path(root)
+        self.budget = budget
+
+    @staticmethod
+    def key(source: str | Path) -> str:
+        source = Path(source)
+        stat = source.stat()
+        digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}:".encode())
+        with source.open("rb") as f:
+            digest.update(f.read(HEADER_DIGEST_SIZE))
+        return digest.hexdigest()[:32]
+
+    def entry(self, source: str | Path) -> Path:
+        return self.root / self.key(source)
+
+    def lookup(self, source: str | Path) -> Path | None:
+        target = self.entry(source) / nsz.output_path(source).name
+        if target.exists():
+            return target
+        return None
+
+    def acquire(self, source: str | Path, threads: int | None = None,
+                progress: nsz.ProgressCallback | None = None) -> Path:
+        # return the cached nsp/xci for source, decompressing it first if needed, and pin it
+        source = Path(source)
+        entry = self.entry(source)
+        target = entry / nsz.output_path(source).name
+        with self._locked():
+            entry.mkdir(parents=True, exist_ok=True)
+            self._pin(entry)
+        try:
+            with self._locked(entry):
+                if not target.exists():
+                    decompressor = nsz.Decompressor(source, target, threads, progress)
+                    self.evict(reserve=decompressor.planned_size(), keep=entry)
+                    eslog.info(f"nsz cache miss for {source}, decompressing")
+                    decompressor.run()
+                else:
+                    eslog.info(f"nsz cache hit for {source}")
+                (entry / ENTRY_FILE).write_text(json.dumps({"source": str(source), "last_used": time.time()}))
+        except BaseException:
+            self.release(target)
+            raise
+        return target
+
+    def release(self, target: str | Path) -> None:
+        (Path(target).parent / f"{PIN_PREFIX}{os.getpid()}").unlink(missing_ok=True)
+
+    @contextmanager
+    def pinned(self, source: str | Path, threads: int | None = None,
+               progress: nsz.ProgressCallback | None = None) -> Iterator[Path]:
+        target = self.acquire(source, threads, progress)
+        try:
+            yield target
+        finally:
+            self.release(target)
+
+    def _sizes(self) -> Iterator[tuple[Path, int]]:
+        for entry in self.root.iterdir() if self.root.is_dir() else ():
+            if entry.is_dir() and not entry.name.startswith("."):
+                yield entry, sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+    def usage(self) -> int:
+        return sum(size for _, size in self._sizes())
+
+    def evict(self, reserve: int = 0, keep: Path | None = None) -> None:
+        with self._locked():
+            entries = []
+            total = 0
+            for entry, size in self._sizes():
+                total += size
+                if entry == keep or self._is_pinned(entry):
+                    continue
+                entries.append((self._last_used(entry), size, entry))
+
+            for _, size, entry in sorted(entries):
+                if total + reserve <= self.budget:
+                    break
+                # moved out of the cache under the lock so it can't be pinned again, deleted below
+                eslog.info(f"evicting {entry} from the nsz cache ({size >> 20} MiB)")
+                try:
+                    entry.rename(self.root / f"{EVICTED_PREFIX}{entry.name}.{os.getpid()}")
+                except OSError as e:
+                    eslog.warning(f"unable to evict {entry}: {e}")
+                    continue
+                total -= size
+            if total + reserve > self.budget:
+                eslog.warning(f"nsz cache over budget: {(total + reserve) >> 20} MiB used for {self.budget >> 20} MiB")
+        self._purge()
+
+    def _purge(self) -> None:
+        # also picks up the evicted entries of a process killed while deleting them
+        for evicted in self.root.glob(f"{EVICTED_PREFIX}*"):
+            maintenance.checkpoint("nsz cache")
+            shutil.rmtree(evicted, ignore_errors=True)
+
+    @contextmanager
+    def _locked(self, directory: Path | None = None) -> Iterator[None]:
+        # the cache lock, or the lock of a single entry
+        directory = directory or self.root
+        directory.mkdir(parents=True, exist_ok=True)
+        with (directory / ".lock").open("w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _pin(entry: Path) -> None:
+        (entry / f"{PIN_PREFIX}{os.getpid()}").touch()
+
+    @staticmethod
+    def _is_pinned(entry: Path) -> bool:
+        for pin in entry.glob(f"{PIN_PREFIX}*"):
+            pid = pin.name[len(PIN_PREFIX):]
+            if pid.isdigit() and _pid_alive(int(pid)):
+                return True
+            pin.unlink(missing_ok=True)
+        return False
+
+    @staticmethod
+    def _last_used(entry: Path) -> float:
+        try:
+            return json.loads((entry / ENTRY_FILE).read_text())["last_used"]
+        except (OSError, ValueError, KeyError):
+            return 0.0
+
+
+class ProgressScreen:
+    # progress callback of a launch time decompression, only a cache miss reports progress so the
+    # screen is opened at the first report
+    def __init__(self, rom: str | Path, path: Path = PROGRESS_FILE):
+        self.rom = Path(rom)
+        self.path = path
+        self.window: subprocess.Popen | None = None
+        self.last = -1
+
+    def __call__(self, done: int, total: int) -> None:
+        percent = done * 100 // total if total else 100
+        if percent == self.last:
+            return
+        if self.last < 0:
+            self._open()
+        self.last = percent
+        if percent % PROGRESS_LOG_STEP == 0:
+            eslog.info(f"decompressing {self.rom.name}: {percent}% {done >> 20}/{total >> 20} MiB")
+        try:
+            with self.path.open("a") as f:
+                f.write(f" {percent:3d}%  {done >> 20}/{total >> 20} MiB\n")
+        except OSError:
+            pass
+
+    def _open(self) -> None:
+        try:
+            self.path.write_text("╔═════════════════════════════════════════════╗\n"
+                                 "║ CONVERTING NSZ TO NSP . . .                 ║\n"
+                                 "╚═════════════════════════════════════════════╝\n"
+                                 f" {self.rom.name}\n\n")
+            self.window = subprocess.Popen(
+                ["xterm", "-fs", "8", "-fullscreen", "-fg", "black", "-bg", "gray", "-fa", "Monospace", "-en", "UTF-8",
+                 "-e", "tail", "-n", "+1", "-f", str(self.path)],
+                env={**os.environ, "DISPLAY": os.environ.get("DISPLAY", ":0.0")},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            # the log still has the progress
+            eslog.debug(f"no progress screen: {e}")
+
+    def close(self) -> None:
+        if self.window is not None:
+            self.window.terminate()
+            try:
+                self.window.wait(5)
+            except subprocess.TimeoutExpired:
+                self.window.kill()
+            self.window = None
+        self.path.unlink(missing_ok=True)
+
+
+def fromConfig(config) -> NszCache:
+    budget = DEFAULT_BUDGET
+    if "nsz_cache_size" in config and config["nsz_cache_size"] not in ("", "auto"):
+        budget = int(float(config["nsz_cache_size"]) * GIB)
+    return NszCache(budget=budget)
+
+
+@contextmanager
+def launchRom(system, rom: str) -> Iterator[str]:
+    # hand the emulator a cached nsp/xci for compressed roms, pinned until the game exits
+    if Path(rom).suffix.lower() not in nsz.COMPRESSED_SUFFIXES or \
+            (system.isOptSet("nsz_cache") and system.config["nsz_cache"] == "0"):
+        yield rom
+        return
+    cache = fromConfig(system.config)
+    screen = ProgressScreen(rom)
+    try:
+        target = cache.acquire(rom, progress=screen)
+    except (nsz.NszError, OSError) as e:
+        eslog.error(f"unable to decompress {rom}, launching it as is: {e}")
+        yield rom
+        return
+    finally:
+        screen.close()
+    try:
+        yield str(target)
+    finally:
+        cache.release(target)
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+# Deduplicated save snapshots
+# At gameStop the save folder of the emulator (yuzu nand/user/save, Ryujinx bis/user/save) is compared
+# with the last snapshot by size and mtime only, so a game that saved nothing costs a directory walk.
+# Changed files are streamed in fixed-size chunks, the save files of a title are rewritten in place so
+# their unchanged blocks keep their offsets. Chunks that aren't in the store yet are compressed with
+# zstd in a thread pool, and the snapshot itself is a manifest of chunk digests. The last
+# switch.save_snapshots_keep snapshots of every title are kept. A restore only rewrites the files
+# that differ, after snapshotting the current state so it can be undone.
+#   python -m switchutils.saveSnapshots list yuzu
+#   python -m switchutils.saveSnapshots restore yuzu 20240101-120000-0100F2C0115B6000 --title
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import stat
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .nsz import default_threads
+from .switchPaths import RYUJINX_SAVES, SAVE_SNAPSHOTS, YUZU_SAVES
+
+# imported after nsz, which puts the modules installed by the updater on the path
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+eslog = logging.getLogger(__name__)
+
+SAVE_ROOTS = {"yuzu": YUZU_SAVES, "ryujinx": RYUJINX_SAVES}
+DEFAULT_KEEP = 10
+ZSTD_LEVEL = 3
+# uncompressed chunks held before they are written out
+PENDING_LIMIT = 64 << 20
+
+CHUNK_SIZE = 64 << 10
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def family(emulator: str) -> str | None:
+    for name in SAVE_ROOTS:
+        if emulator.startswith(name):
+            return name
+    return None
+
+
+def readChunks(path: Path) -> Iterator[bytes]:
+    # a save file is read CHUNK_SIZE at a time, never whole
+    with path.open("rb") as f:
+        while piece := f.read(CHUNK_SIZE):
+            yield piece
+
+
+def digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class ChunkStore:
+    def __init__(self, root: Path, threads: int | None = None):
+        self.root = Path(root)
+        self.threads = threads or default_threads()
+        self._local = threading.local()
+
+    def path(self, name: str) -> Path:
+        return self.root / name[:2] / name
+
+    def has(self, name: str) -> bool:
+        path = self.path(name)
+        return path.with_suffix(".zst").exists() or path.exists()
+
+    def _compress(self, data: bytes) -> bytes:
+        # compressor objects aren't thread safe, every worker has its own
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return compressor.compress(data)
+
+    def _write(self, item: tuple[str, bytes]) -> int:
+        name, data = item
+        path = self.path(name)
+        if zstandard is not None:
+            data = self._compress(data)
+            path = path.with_suffix(".zst")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+        return len(data)
+
+    def put(self, chunks: dict[str, bytes]) -> int:
+        if not chunks:
+            return 0
+        with ThreadPoolExecutor(min(self.threads, len(chunks))) as pool:
+            return sum(pool.map(self._write, chunks.items()))
+
+    def get(self, name: str) -> bytes:
+        path = self.path(name)
+        try:
+            compressed = path.with_suffix(".zst").read_bytes()
+        except FileNotFoundError:
+            try:
+                return path.read_bytes()
+            except FileNotFoundError:
+                raise SnapshotError(f"chunk {name} is missing from {self.root}") from None
+        if zstandard is None:
+            raise SnapshotError("restoring compressed snapshots needs the zstandard module")
+        return zstandard.ZstdDecompressor().decompress(compressed)
+
+    def sweep(self, live: set[str]) -> int:
+        removed = 0
+        for path in self.root.glob("*/*") if self.root.is_dir() else ():
+            if path.name.split(".")[0] not in live:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+def scan(root: Path) -> dict[str, os.stat_result]:
+    # regular files of the save folder by relative path, stat only
+    found = {}
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        try:
+            entries = os.scandir(root / relative)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f"{relative}/{entry.name}" if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    found[name] = entry.stat(follow_symlinks=False)
+    return found
+
+
+class SnapshotStore:
+    def __init__(self, root: Path = SAVE_SNAPSHOTS, saves: dict[str, Path] | None = None,
+                 threads: int | None = None):
+        self.root = Path(root)
+        self.saves = saves or SAVE_ROOTS
+        self.chunks = ChunkStore(self.root / "chunks", threads)
+
+    def saveRoot(self, emulator: str) -> Path:
+        name = family(emulator)
+        if name is None or name not in self.saves:
+            raise SnapshotError(f"no save folder known for {emulator}")
+        # the save folder is usually a symlink to /userdata/saves
+        return self.saves[name].resolve()
+
+    def manifests(self, emulator: str) -> list[Path]:
+        folder = self.root / (family(emulator) or emulator)
+        return sorted(folder.glob("*.json")) if folder.is_dir() else []
+
+    def load(self, emulator: str, name: str) -> dict:
+        path = self.root / (family(emulator) or emulator) / f"{name.removesuffix('.json')}.json"
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"unable to read the snapshot {path}: {e}") from e
+
+    def latest(self, emulator: str) -> dict | None:
+        for path in reversed(self.manifests(emulator)):
+            try:
+                return json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+        return None
+
+    def snapshot(self, emulator: str, title: str | None = None, keep: int = DEFAULT_KEEP,
+                 reason: str = "gameStop") -> dict | None:
+        # None when the saves didn't change since the last snapshot
+        root = self.saveRoot(emulator)
+        if not root.is_dir():
+            return None
+        previous = self.latest(emulator)
+        known = previous["files"] if previous is not None else {}
+        current = scan(root)
+        files = {}
+        changed = []
+        for name, st in current.items():
+            entry = known.get(name)
+            if entry is not None and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+                files[name] = entry
+            else:
+                changed.append(name)
+        if not changed and files.keys() == known.keys():
+            return None
+
+        pending: dict[str, bytes] = {}
+        pending_size = stored = 0
+        for name in changed:
+            st = current[name]
+            digests = []
+            size = 0
+            for piece in readChunks(root / name):
+                key = digest(piece)
+                digests.append(key)
+                size += len(piece)
+                if key not in pending and not self.chunks.has(key):
+                    pending[key] = piece
+                    pending_size += len(piece)
+                if pending_size > PENDING_LIMIT:
+                    stored += self.chunks.put(pending)
+                    pending, pending_size = {}, 0
+            files[name] = {"size": size, "mtime": st.st_mtime_ns, "mode": stat.S_IMODE(st.st_mode),
+                           "chunks": digests}
+        stored += self.chunks.put(pending)
+
+        manifest = {"emulator": family(emulator), "title": title or "unknown", "created": time.time(),
+                    "reason": reason, "files": files}
+        manifest["id"] = self._write(manifest)
+        eslog.info(f"save snapshot {manifest['id']}: {len(changed)} files changed, {stored >> 10} KiB stored")
+        self.prune(emulator, keep)
+        return manifest
+
+    def _write(self, manifest: dict) -> str:
+        # chunks are all written before the manifest pointing to them
+        folder = self.root / manifest["emulator"]
+        folder.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(manifest["created"]))
+        name = f"{stamp}-{manifest['title']}"
+        number = 1
+        while (folder / f"{name}.json").exists():
+            number += 1
+            name = f"{stamp}.{number}-{manifest['title']}"
+        temporary = folder / f".{name}.tmp"
+        temporary.write_text(json.dumps(manifest, separators=(",", ":")))
+        os.replace(temporary, folder / f"{name}.json")
+        return name
+
+    def prune(self, emulator: str, keep: int = DEFAULT_KEEP) -> None:
+        # the newest manifest, the one the next snapshot compares against, is always kept
+        titles: dict[str, list[Path]] = {}
+        for path in self.manifests(emulator):
+            titles.setdefault(path.stem.split("-", 2)[-1], []).append(path)
+        removed = [path for paths in titles.values() for path in paths[:-max(keep, 1)]]
+        if not removed:
+            return
+        for path in removed:
+            path.unlink(missing_ok=True)
+        live = set()
+        for folder in self.root.iterdir():
+            if folder.is_dir() and folder.name != "chunks":
+                for path in folder.glob("*.json"):
+                    for entry in json.loads(path.read_text())["files"].values():
+                        live.update(entry["chunks"])
+        eslog.info(f"removed {len(removed)} old save snapshots and {self.chunks.sweep(live)} chunks")
+
+    def restore(self, emulator: str, name: str, include: Callable[[str], bool] | None = None) -> dict[str, int]:
+        manifest = self.load(emulator, name)
+        include = include or (lambda path: True)
+        root = self.saveRoot(emulator)
+        self.snapshot(emulator, manifest.get("title"), keep=len(self.manifests(emulator)) + 1,
+                      reason=f"before restoring {name}")
+        current = scan(root)
+        stats = {"kept": 0, "written": 0, "removed": 0}
+        for path, entry in manifest["files"].items():
+            if not include(path):
+                continue
+            st = current.get(path)
+            if st is not None and st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime"]:
+                stats["kept"] += 1
+                continue
+            target = root / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            temporary = target.with_name(f".{target.name}.restore")
+            with temporary.open("wb") as f:
+                for chunk in entry["chunks"]:
+                    f.write(self.chunks.get(chunk))
+            os.chmod(temporary, entry["mode"])
+            os.utime(temporary, ns=(entry["mtime"], entry["mtime"]))
+            os.replace(temporary, target)
+            stats["written"] += 1
+        for path in current.keys() - manifest["files"].keys():
+            if include(path):
+                (root / path).unlink(missing_ok=True)
+                stats["removed"] += 1
+        return stats
+
+
+def fromConfig(system, rom: str) -> dict | None:
+    from .sessionDb import titleId
+
+    keep = DEFAULT_KEEP
+    if system.isOptSet("save_snapshots_keep"):
+        keep = max(int(system.config["save_snapshots_keep"]), 1)
+    emulator = system.config["emulator"]
+    if family(emulator) is None:
+        return None
+    try:
+        return SnapshotStore().snapshot(emulator, titleId(rom) if rom else None, keep)
+    except (OSError, ValueError, KeyError, SnapshotError) as e:
+        eslog.warning(f"unable to snapshot the {emulator} saves: {e}")
+        return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="snapshot and restore the switch saves")
+    parser.add_argument("--store", type=Path, default=SAVE_SNAPSHOTS)
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="snapshots, oldest first")
+    listing.add_argument("emulator", choices=sorted(SAVE_ROOTS))
+    listing.add_argument("--title", help="only the snapshots of this title id")
+    taking = commands.add_parser("snapshot", help="snapshot the saves now")
+    taking.add_argument("emulator", choices=sorted(SAVE_ROOTS))
+    taking.add_argument("--title")
+    restoring = commands.add_parser("restore", help="bring the saves back to a snapshot")
+    restoring.add_argument("emulator", choices=sorted(SAVE_ROOTS))
+    restoring.add_argument("snapshot")
+    only = restoring.add_mutually_exclusive_group()
+    only.add_argument("--path", help="only restore the files below this save folder path")
+    only.add_argument("--title", action="store_true", help="only restore the folders named after the snapshot title")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = SnapshotStore(args.store)
+    try:
+        if args.command == "list":
+            for path in store.manifests(args.emulator):
+                manifest = json.loads(path.read_text())
+                if args.title and manifest["title"].upper() != args.title.upper():
+                    continue
+                size = sum(entry["size"] for entry in manifest["files"].values())
+                print(f"{path.stem:<44} {len(manifest['files']):>6} files {size >> 10:>10} KiB  {manifest['reason']}")
+        elif args.command == "snapshot":
+            manifest = store.snapshot(args.emulator, args.title, reason="manual")
+            print(manifest["id"] if manifest is not None else "saves unchanged since the last snapshot")
+        else:
+            include = None
+            if args.path:
+                prefix = args.path.strip("/")
+                include = lambda path: path == prefix or path.startswith(prefix + "/")
+            elif args.title:
+                title = store.load(args.emulator, args.snapshot)["title"].upper()
+                include = lambda path: title in path.upper().split("/")
+            print(store.restore(args.emulator, args.snapshot, include))
+    except (OSError, SnapshotError) as e:
+        eslog.error(f"{args.command} failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+
+# Idle-time maintenance scheduler
+# Firmware sync, translations, updater checks, shader cache pruning and nsz pre-conversion used to
+# run from the startup and launcher scripts, at boot while ES loads. The scheduler daemon started by
+# batocera-switch-startup waits BOOT_DELAY, then runs the jobs that are due one at a time, with the
+# SCHED_IDLE cpu policy and the idle io class, and only while no game runs. Intervals are hours,
+# SCHEDULE_<JOB>= in ~/switch/CONFIG.txt, 0 disables a job. The last run and its duration
+# are kept in scheduler.json. The title index and the configgen bundle are refreshed as well so
+# launches find them current.
+#   python -m switchutils.scheduler status
+#   python -m switchutils.scheduler run --force firmware_sync
+
+from __future__ import annotations
+
+import argparse
+import ctypes
+import fcntl
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import bundle, maintenance, nsz, nszCache, titleIndex
+from .firmwareSync import FirmwareSync
+from .slots import retention
+from .switchPaths import RYUJINX_GAMES, SCHEDULER_STATE, SWITCH_CONFIG, SWITCH_EXTRA, SWITCH_ROMDIR, YUZU_SHADERS
+from .updater import Updater, readConfig, selectedEmulators
+
+eslog = logging.getLogger(__name__)
+
+BOOT_DELAY = 300
+TICK = 60
+HOUR = 3600
+# shader caches of titles not played for that many days are removed, SHADER_CACHE_DAYS=
+DEFAULT_SHADER_CACHE_DAYS = 180
+SCRIPT_TIMEOUT = 600
+
+# ioprio_set(2) isn't wrapped by the os module
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+SYS_IOPRIO_SET = {"x86_64": 251, "i686": 289, "aarch64": 30, "armv7l": 314}
+
+
+class JobError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    run: Callable[[dict[str, str]], str]
+    # default hours between two runs
+    interval: float
+
+
+def syncFirmware(config: dict[str, str]) -> str:
+    stats = FirmwareSync().run()
+    return f"{len(stats)} locations updated" if stats else "in sync"
+
+
+def installTranslations(config: dict[str, str]) -> str:
+    script = SWITCH_EXTRA / "batocera-switch-translator.sh"
+    if not script.is_file():
+        return "no translator"
+    result = subprocess.run(["bash", str(script)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            timeout=SCRIPT_TIMEOUT)
+    if result.returncode != 0:
+        raise JobError(f"{script.name} exited with {result.returncode}")
+    return "done"
+
+
+def checkUpdates(config: dict[str, str]) -> str:
+    base_url = config.get("UPDATE_URL", "")
+    if not base_url:
+        return "no UPDATE_URL"
+    results = Updater(base_url, selectedEmulators(config), keep=retention(config)).run()
+    if any(r.startswith("failed") for r in results.values()):
+        raise JobError(", ".join(f"{e}: {r}" for e, r in results.items()))
+    return ", ".join(f"{e}: {r}" for e, r in results.items())
+
+
+def _newest(path: Path) -> float:
+    newest = path.stat().st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                newest = max(newest, os.stat(os.path.join(root, name)).st_mtime)
+            except OSError:
+                continue
+    return newest
+
+
+def _size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def shaderCaches() -> list[Path]:
+    caches = [p for p in YUZU_SHADERS.iterdir() if p.is_dir()] if YUZU_SHADERS.is_dir() else []
+    if RYUJINX_GAMES.is_dir():
+        caches += [p / "cache" / "shader" for p in RYUJINX_GAMES.iterdir() if (p / "cache" / "shader").is_dir()]
+    return caches
+
+
+def pruneShaderCaches(config: dict[str, str]) -> str:
+    try:
+        days = float(config.get("SHADER_CACHE_DAYS", "") or DEFAULT_SHADER_CACHE_DAYS)
+    except ValueError:
+        days = DEFAULT_SHADER_CACHE_DAYS
+    cutoff = time.time() - days * 24 * HOUR
+    removed = freed = 0
+    for cache in shaderCaches():
+        maintenance.checkpoint("shader cache pruning")
+        try:
+            if _newest(cache) >= cutoff:
+                continue
+            size = _size(cache)
+        except OSError:
+            continue
+        eslog.info(f"removing the shader cache {cache}, unused for {days:g} days ({size >> 20} MiB)")
+        shutil.rmtree(cache, ignore_errors=True)
+        removed += 1
+        freed += size
+    return f"{removed} caches removed, {freed >> 20} MiB freed"
+
+
+def preconvertNsz(config: dict[str, str]) -> str:
+    # newest roms first, only into the free part of the budget: nothing played is evicted for a guess
+    cache = nszCache.fromConfig({"nsz_cache_size": config.get("NSZ_CACHE_SIZE", "")})
+    roms = [p for p in SWITCH_ROMDIR.rglob("*") if p.suffix.lower() in nsz.COMPRESSED_SUFFIXES and p.is_file()]
+    roms.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    used = cache.usage()
+    converted = 0
+    # stops at the next chunk when a game starts: the launcher may need the entry being decompressed,
+    # it resumes the partial title from its journal
+    with maintenance.interruptible():
+        for rom in roms:
+            if maintenance.pause.sessionReason() is not None:
+                break
+            try:
+                if cache.lookup(rom) is not None:
+                    continue
+                planned = nsz.Decompressor(rom).planned_size()
+                if used + planned > cache.budget:
+                    break
+                with cache.pinned(rom):
+                    pass
+            except maintenance.Interrupted as e:
+                eslog.info(str(e))
+                break
+            except (nsz.NszError, OSError) as e:
+                eslog.warning(f"unable to pre-convert {rom}: {e}")
+                continue
+            used += planned
+            converted += 1
+    return f"{converted} titles decompressed, {used >> 20} MiB cached"
+
+
+def indexTitles(config: dict[str, str]) -> str:
+    # the launch then only stats the library
+    index = titleIndex.TitleIndex()
+    read = index.refresh()
+    return f"{len(index.files)} files, {read} indexed"
+
+
+def bundleConfiggen(config: dict[str, str]) -> str:
+    if not bundle.stale():
+        return "up to date"
+    return f"{bundle.build()} modules bundled"
+
+
+JOBS = (
+    Job("firmware_sync", syncFirmware, 6),
+    Job("translations", installTranslations, 24),
+    Job("updater", checkUpdates, 24),
+    Job("shader_prune", pruneShaderCaches, 24 * 7),
+    Job("nsz_preconvert", preconvertNsz, 12),
+    Job("title_index", indexTitles, 6),
+    Job("startup_bundle", bundleConfiggen, 6),
+)
+
+
+def lowerPriority() -> None:
+    # both are inherited by the threads and processes the jobs start afterwards
+    try:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    except (AttributeError, OSError) as e:
+        eslog.warning(f"unable to use SCHED_IDLE: {e}")
+    number = SYS_IOPRIO_SET.get(platform.machine())
+    if number is not None and ctypes.CDLL(None, use_errno=True).syscall(
+            number, IOPRIO_WHO_PROCESS, 0, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) == 0:
+        return
+    try:
+        subprocess.run(["ionice", "-c", "3", "-p", str(os.getpid())], stderr=subprocess.DEVNULL, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        eslog.warning("unable to use the idle io class")
+
+
+class Scheduler:
+    def __init__(self, jobs: tuple[Job, ...] = JOBS, state: Path = SCHEDULER_STATE, config: Path = SWITCH_CONFIG):
+        self.jobs = jobs
+        self.state_path = Path(state)
+        self.config_path = Path(config)
+        self.state: dict[str, dict] = self._load()
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            state = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def _save(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.state_path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.state, indent=2))
+        os.replace(temporary, self.state_path)
+
+    @staticmethod
+    def interval(job: Job, config: dict[str, str]) -> float:
+        try:
+            return float(config.get(f"SCHEDULE_{job.name.upper()}", "") or job.interval) * HOUR
+        except ValueError:
+            return job.interval * HOUR
+
+    def nextRun(self, job: Job, config: dict[str, str]) -> float | None:
+        interval = self.interval(job, config)
+        if interval <= 0:
+            return None
+        return self.state.get(job.name, {}).get("last_run", 0) + interval
+
+    def due(self, config: dict[str, str], now: float | None = None) -> list[Job]:
+        now = time.time() if now is None else now
+        due = [(next_run, job) for job in self.jobs
+               if (next_run := self.nextRun(job, config)) is not None and next_run <= now]
+        return [job for _, job in sorted(due, key=lambda d: d[0])]
+
+    def runJob(self, job: Job, config: dict[str, str]) -> str:
+        eslog.info(f"running {job.name}")
+        started, clock = time.time(), time.monotonic()
+        try:
+            result = job.run(config)
+        except Exception as e:
+            eslog.error(f"{job.name} failed: {e}")
+            result = f"failed: {e}"
+        duration = time.monotonic() - clock
+        self.state[job.name] = {"last_run": started, "duration": round(duration, 3), "result": result}
+        self._save()
+        eslog.info(f"{job.name} ran in {duration:.1f}s: {result}")
+        return result
+
+    def runDue(self, names: list[str] | None = None, force: bool = False) -> list[str]:
+        config = readConfig(self.config_path)
+        if force:
+            jobs = [job for job in self.jobs if not names or job.name in names]
+        else:
+            jobs = [job for job in self.due(config) if not names or job.name in names]
+        ran = []
+        for job in jobs:
+            # a game started since the last job, the rest waits for the next idle tick
+            if not force and maintenance.pause.reason() is not None:
+                break
+            self.runJob(job, config)
+            ran.append(job.name)
+        return ran
+
+    def serve(self) -> None:
+        time.sleep(BOOT_DELAY)
+        while True:
+            self.runDue()
+            time.sleep(TICK)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="run the switch maintenance jobs when the system is idle")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("daemon", help="run the due jobs for as long as the system is up")
+    running = commands.add_parser("run", help="run the due jobs once")
+    running.add_argument("--force", action="store_true", help="run the jobs even if they aren't due")
+    running.add_argument("jobs", nargs="*", help=", ".join(job.name for job in JOBS))
+    commands.add_parser("status", help="last run, duration and next run of every job")
+    args = parser.parse_args(argv)
+    unknown = set(getattr(args, "jobs", ())) - {job.name for job in JOBS}
+    if unknown:
+        parser.error(f"unknown jobs: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.INFO)
+    scheduler = Scheduler()
+    if args.command == "status":
+        config = readConfig(scheduler.config_path)
+        for job in scheduler.jobs:
+            state = scheduler.state.get(job.name, {})
+            next_run = scheduler.nextRun(job, config)
+            last = time.strftime("%Y-%m-%d %H:%M", time.localtime(state["last_run"])) if "last_run" in state else "never"
+            upcoming = "disabled" if next_run is None else time.strftime("%Y-%m-%d %H:%M", time.localtime(next_run))
+            print(f"{job.name:<16} last {last:<16} {state.get('duration', 0):>8.1f}s  next {upcoming:<16}"
+                  f" {state.get('result', '')}")
+        return 0
+
+    lowerPriority()
+    if args.command == "run":
+        scheduler.runDue(args.jobs, args.force)
+        return 0
+    # a single daemon, the ones started by the next runs of batocera-switch-startup leave
+    scheduler.state_path.parent.mkdir(parents=True, exist_ok=True)
+    lock = scheduler.state_path.with_suffix(".lock").open("w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        eslog.info("the scheduler is already running")
+        return 0
+    scheduler.serve()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+# Local session database
+# Every launch is recorded in a SQLite database: rom, title id, emulator and its installed version, a
+# hash of the settings, launch latency, session duration, exit code, peak RSS and CPU time. Nothing is
+# written while a game starts: the session is queued at gameStop and written by a background thread
+# while the launcher winds down. Sessions that could not be written, the database being locked or
+# unwritable, are spooled to a JSON lines file and go in with the next batch.
+#   python -m switchutils.sessionDb rank --by launch
+#   python -m switchutils.sessionDb regressions
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import statistics
+import sys
+import threading
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+
+from . import nsz, slots
+from .switchPaths import SESSION_DB
+
+eslog = logging.getLogger(__name__)
+
+SPOOL_SUFFIX = ".spool"
+# a version is a regression when its median is this much worse than the previous version's
+DEFAULT_THRESHOLD = 0.2
+# settings that change on every launch or don't change the emulator behaviour
+VOLATILE_SETTINGS = {"retroachievements.password", "state_filename", "state_slot", "emulator-forced", "core-forced"}
+
+_TITLE_ID = re.compile(r"[\[(]([0-9A-Fa-f]{16})[\])]")
+
+# schema versions, applied in order on databases whose user_version is older
+MIGRATIONS = (
+    """
+    CREATE TABLE sessions (
+        id INTEGER PRIMARY KEY,
+        started REAL NOT NULL,
+        rom TEXT NOT NULL,
+        title_id TEXT,
+        emulator TEXT NOT NULL,
+        version TEXT,
+        settings_hash TEXT,
+        launch REAL,
+        duration REAL,
+        exit_code INTEGER,
+        peak_rss INTEGER,
+        cpu_time REAL
+    );
+    CREATE INDEX sessions_title ON sessions (title_id, rom, emulator, version);
+    """,
+    # json of the sessionSampler summary
+    "ALTER TABLE sessions ADD COLUMN resources TEXT;",
+    # json of the logAnalyzer report
+    "ALTER TABLE sessions ADD COLUMN log_events TEXT;",
+    # json of the frameTimes summary
+    "ALTER TABLE sessions ADD COLUMN frame_times TEXT;",
+)
+
+
+@dataclass
+class Session:
+    started: float
+    rom: str
+    title_id: str | None
+    emulator: str
+    version: str | None
+    settings_hash: str | None
+    launch: float | None
+    duration: float | None
+    exit_code: int | None
+    peak_rss: int | None
+    cpu_time: float | None
+    resources: str | None = None
+    log_events: str | None = None
+    frame_times: str | None = None
+
+
+def titleId(rom: str | Path) -> str | None:
+    # from the usual [0100...] tag of the file name, the tickets of the container otherwise
+    match = _TITLE_ID.search(Path(rom).name)
+    if match is not None:
+        return match[1].upper()
+    try:
+        ids = nsz.titleIds(rom)
+    except (OSError, nsz.NszError, ValueError, UnicodeDecodeError):
+        return None
+    return ids[0] if ids else None
+
+
+def settingsHash(settings: dict) -> str:
+    stable = {k: str(v) for k, v in settings.items() if k not in VOLATILE_SETTINGS}
+    return hashlib.sha256(json.dumps(stable, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def emulatorVersion(emulator: str) -> str | None:
+    # the install slot in use, its version.txt for emulators installed without slots
+    target = slots.EMULATORS.get(emulator)
+    if target is None:
+        return None
+    current = slots.Slots(target).current()
+    if current is not None:
+        return current.name
+    try:
+        return slots.versionFile(target).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def fromRecord(record) -> Session:
+    # a launchMetrics.LaunchRecord, the title id and version are resolved here, after the game
+    return Session(record.started_at, record.rom or "", titleId(record.rom) if record.rom else None,
+                   record.emulator, emulatorVersion(record.emulator), settingsHash(record.settings),
+                   record.launch, record.duration, record.exit_code, record.peak_rss, record.cpu_time,
+                   json.dumps(asdict(record.resources)) if record.resources is not None else None,
+                   json.dumps(record.log_events) if record.log_events is not None else None,
+                   json.dumps(record.frame_times) if record.frame_times is not None else None)
+
+
+def connect(path: Path = SESSION_DB) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path, timeout=2)
+    db.row_factory = sqlite3.Row
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        with db:
+            db.executescript(migration)
+            db.execute(f"PRAGMA user_version = {number}")
+    return db
+
+
+def insert(db: sqlite3.Connection, sessions: list[Session]) -> None:
+    columns = [f.name for f in fields(Session)]
+    with db:
+        db.executemany(f"INSERT INTO sessions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                       [tuple(getattr(s, c) for c in columns) for s in sessions])
+
+
+class SessionWriter:
+    def __init__(self, path: Path = SESSION_DB):
+        self.path = Path(path)
+        self.spool = self.path.with_name(self.path.name + SPOOL_SUFFIX)
+        self.pending: list = []
+        self._thread: threading.Thread | None = None
+
+    def add(self, record) -> None:
+        self.pending.append(record)
+
+    def _spooled(self) -> list[Session]:
+        try:
+            lines = self.spool.read_text().splitlines()
+        except OSError:
+            return []
+        sessions = []
+        for line in lines:
+            try:
+                sessions.append(Session(**json.loads(line)))
+            except (TypeError, ValueError):
+                continue
+        return sessions
+
+    def write(self, records: list) -> None:
+        sessions = []
+        try:
+            sessions = [fromRecord(r) for r in records]
+            spooled = self._spooled()
+            db = connect(self.path)
+            try:
+                insert(db, spooled + sessions)
+            finally:
+                db.close()
+            self.spool.unlink(missing_ok=True)
+        except Exception as e:
+            eslog.warning(f"sessions spooled, unable to write {self.path}: {e}")
+            try:
+                with self.spool.open("a") as f:
+                    for session in sessions:
+                        f.write(json.dumps(asdict(session)) + "\n")
+            except OSError:
+                pass
+
+    def flush(self) -> None:
+        # writes the pending sessions in one transaction, in the background
+        records, self.pending = self.pending, []
+        if records:
+            self._thread = threading.Thread(target=self.write, args=(records,), name="sessionDb", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float = 5.0) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+writer = SessionWriter()
+
+
+def rank(db: sqlite3.Connection, by: str, limit: int) -> list[sqlite3.Row]:
+    column = {"launch": "launch", "duration": "duration", "rss": "peak_rss", "cpu": "cpu_time",
+              "stutter": "json_extract(log_events, '$.compile_seconds')",
+              "frametime": "json_extract(frame_times, '$.p99')"}[by]
+    return db.execute(f"""
+        SELECT COALESCE(title_id, rom) AS title, emulator, COUNT(*) AS sessions,
+               AVG(launch) AS launch, MAX(peak_rss) AS peak_rss, AVG(cpu_time) AS cpu_time,
+               AVG(duration) AS duration, SUM(exit_code != 0) AS failures
+        FROM sessions WHERE {column} IS NOT NULL
+        GROUP BY title, emulator ORDER BY AVG({column}) DESC LIMIT ?""", (limit,)).fetchall()
+
+
+@dataclass
+class Regression:
+    title: str
+    emulator: str
+    metric: str
+    previous: str
+    version: str
+    before: float
+    after: float
+
+
+def regressions(db: sqlite3.Connection, threshold: float = DEFAULT_THRESHOLD) -> list[Regression]:
+    # per title and emulator, the last version against the one before it, by median
+    rows = db.execute("""
+        SELECT COALESCE(title_id, rom) AS title, emulator, version, launch, peak_rss, cpu_time, duration, started
+        FROM sessions WHERE version IS NOT NULL AND exit_code = 0 ORDER BY started""").fetchall()
+    runs: dict[tuple[str, str], dict[str, list]] = {}
+    for row in rows:
+        runs.setdefault((row["title"], row["emulator"]), {}).setdefault(row["version"], []).append(row)
+    found = []
+    for (title, emulator), versions in runs.items():
+        if len(versions) < 2:
+            continue
+        # dicts keep the order of the first session of every version
+        previous, version = list(versions)[-2:]
+        for metric in ("launch", "peak_rss"):
+            before = [r[metric] for r in versions[previous] if r[metric] is not None]
+            after = [r[metric] for r in versions[version] if r[metric] is not None]
+            if not before or not after:
+                continue
+            before_median, after_median = statistics.median(before), statistics.median(after)
+            if before_median > 0 and after_median > before_median * (1 + threshold):
+                found.append(Regression(title, emulator, metric, previous, version, before_median, after_median))
+    return found
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="report on the recorded switch sessions")
+    parser.add_argument("--db", type=Path, default=SESSION_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    ranking = commands.add_parser("rank", help="slowest or heaviest titles first")
+    ranking.add_argument("--by", choices=["launch", "duration", "rss", "cpu", "stutter", "frametime"], default="launch")
+    ranking.add_argument("-n", "--limit", type=int, default=20)
+    regression = commands.add_parser("regressions", help="titles that got slower or bigger after an emulator update")
+    regression.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD)
+    commands.add_parser("flush", help="write the spooled sessions")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "flush":
+        SessionWriter(args.db).write([])
+        return 0
+    db = connect(args.db)
+    if args.command == "rank":
+        print(f"{'title':<34} {'emulator':<18} {'runs':>5} {'launch':>8} {'rss MiB':>8} {'cpu s':>8} {'fails':>5}")
+        for row in rank(db, args.by, args.limit):
+            rss = row["peak_rss"] / (1 << 20) if row["peak_rss"] is not None else 0
+            print(f"{row['title'][-34:]:<34} {row['emulator']:<18} {row['sessions']:>5} {row['launch'] or 0:>8.2f}"
+                  f" {rss:>8.0f} {row['cpu_time'] or 0:>8.1f} {row['failures'] or 0:>5}")
+        return 0
+    found = regressions(db, args.threshold)
+    for r in found:
+        print(f"{r.title} {r.emulator}: {r.metric} {r.before:.2f} -> {r.after:.2f} ({r.previous} -> {r.version})")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+# In-session resource sampler
+# While the emulator runs, a thread reads /proc/<pid>/stat, status and io for every process of the
+# emulator tree and the /proc/pressure files, at switch.sampler_interval seconds (1 by default). Each
+# sample is a CSV row of the session file, the summary at exit (CPU use and saturation, memory
+# growth, I/O and PSI stalls) goes into the session record. The tree is rescanned every few samples
+# and only the files of known processes are read in between, a few hundred microseconds a sample.
+#   python -m switchutils.sessionSampler /userdata/system/switch/sessions/<session>.csv
+
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .switchPaths import SESSION_SAMPLES
+
+eslog = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 1.0
+# samples between two scans of /proc for new processes of the tree
+RESCAN = 10
+# session files kept
+RETENTION = 30
+# memory growth is measured after the loading of the game
+WARMUP = 60.0
+# share of all the cores above which a sample counts as saturated
+SATURATION = 0.95
+PRESSURE = ("cpu", "io", "memory")
+COLUMNS = ("t", "cpu", "threads", "rss_kib", "swap_kib", "read_kib", "write_kib",
+           "cpu_some", "io_some", "io_full", "memory_some", "memory_full")
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK")
+_PAGE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _read(path: str) -> bytes | None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        return os.read(fd, 4096)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+
+@dataclass
+class ProcessSample:
+    ppid: int
+    ticks: int
+    threads: int
+    rss: int
+    swap: int = 0
+    read: int = 0
+    write: int = 0
+
+
+def readProcess(pid: int, details: bool = True) -> ProcessSample | None:
+    stat = _read(f"/proc/{pid}/stat")
+    if stat is None:
+        return None
+    # the command name may hold spaces and parentheses, the fields start after the last one
+    fields = stat.rpartition(b")")[2].split()
+    try:
+        sample = ProcessSample(int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[17]), int(fields[21]) * _PAGE)
+    except (IndexError, ValueError):
+        return None
+    if not details:
+        return sample
+    status = _read(f"/proc/{pid}/status") or b""
+    for line in status.splitlines():
+        if line.startswith(b"VmSwap:"):
+            sample.swap = int(line.split()[1]) * 1024
+            break
+    for line in (_read(f"/proc/{pid}/io") or b"").splitlines():
+        if line.startswith(b"read_bytes:"):
+            sample.read = int(line.split()[1])
+        elif line.startswith(b"write_bytes:"):
+            sample.write = int(line.split()[1])
+    return sample
+
+
+def processTree(root: int) -> set[int]:
+    parents: dict[int, list[int]] = {}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            sample = readProcess(int(name), details=False)
+            if sample is not None:
+                parents.setdefault(sample.ppid, []).append(int(name))
+    tree, queue = set(), [root]
+    while queue:
+        pid = queue.pop()
+        if pid not in tree:
+            tree.add(pid)
+            queue.extend(parents.get(pid, ()))
+    return tree
+
+
+def readPressure() -> dict[str, int]:
+    # cumulated stall times in microseconds, empty when the kernel has no PSI
+    totals = {}
+    for resource in PRESSURE:
+        for line in (_read(f"/proc/pressure/{resource}") or b"").splitlines():
+            kind, _, values = line.partition(b" ")
+            total = values.rpartition(b"total=")[2]
+            if total.isdigit():
+                totals[f"{resource}_{kind.decode()}"] = int(total)
+    return totals
+
+
+@dataclass
+class ResourceSummary:
+    samples: int = 0
+    seconds: float = 0.0
+    # percents of one core
+    cpu_mean: float = 0.0
+    cpu_peak: float = 0.0
+    # share of the samples with every core busy
+    cpu_saturated: float = 0.0
+    threads_peak: int = 0
+    rss_first: int = 0
+    rss_peak: int = 0
+    rss_last: int = 0
+    # least squares slope of the rss after the warmup
+    rss_growth_per_hour: float = 0.0
+    swap_peak: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    # stall seconds from /proc/pressure
+    cpu_some: float = 0.0
+    io_some: float = 0.0
+    io_full: float = 0.0
+    memory_some: float = 0.0
+    memory_full: float = 0.0
+    # cpu used by the sampler, percents of one core
+    overhead: float = 0.0
+
+
+class Sampler:
+    def __init__(self, path: Path | None = None, interval: float = DEFAULT_INTERVAL):
+        self.path = path
+        self.interval = max(interval, 0.1)
+        self.summary = ResourceSummary()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._cores = os.cpu_count() or 1
+        # running sums of the regression of rss over time
+        self._fit = [0, 0.0, 0.0, 0.0, 0.0]
+
+    def start(self, pid: int) -> None:
+        self._thread = threading.Thread(target=self._run, args=(pid,), name="sessionSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> ResourceSummary:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 1)
+        s = self.summary
+        eslog.info(f"session resources: cpu {s.cpu_mean:.0f}% (peak {s.cpu_peak:.0f}%), rss {s.rss_peak >> 20} MiB "
+                   f"({s.rss_growth_per_hour / (1 << 20):+.0f} MiB/h), io stalls {s.io_some:.1f}s, "
+                   f"sampler {s.overhead:.2f}% of a core")
+        return s
+
+    def _run(self, root: int) -> None:
+        output = None
+        try:
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                output = self.path.open("w", newline="")
+                writer = csv.writer(output)
+                writer.writerow(COLUMNS)
+            self._loop(root, writer if output is not None else None)
+        except Exception as e:
+            eslog.warning(f"resource sampler stopped: {e}")
+        finally:
+            if output is not None:
+                output.close()
+
+    def _loop(self, root: int, writer) -> None:
+        began, cpu_began = time.monotonic(), time.thread_time()
+        pids: set[int] = {root}
+        previous: dict[int, ProcessSample] = {}
+        pressure = readPressure()
+        last = began
+        count = 0
+        while not self._stop.wait(self.interval):
+            if count % RESCAN == 0:
+                pids = processTree(root) or {root}
+            now = time.monotonic()
+            current = {}
+            for pid in pids:
+                sample = readProcess(pid)
+                if sample is not None:
+                    current[pid] = sample
+            if root not in current:
+                break
+            stalls = readPressure()
+            self._add(now - began, now - last, previous, current, pressure, stalls, writer)
+            previous, pressure, last = current, stalls, now
+            pids = set(current)
+            count += 1
+        summary = self.summary
+        summary.seconds = time.monotonic() - began
+        if summary.seconds > 0:
+            summary.overhead = (time.thread_time() - cpu_began) / summary.seconds * 100
+        n, st, sr, stt, str_ = self._fit
+        if n > 1 and n * stt - st * st > 0:
+            summary.rss_growth_per_hour = (n * str_ - st * sr) / (n * stt - st * st) * 3600
+
+    def _add(self, t: float, dt: float, previous: dict[int, ProcessSample], current: dict[int, ProcessSample],
+             pressure: dict[str, int], stalls: dict[str, int], writer) -> None:
+        # processes only count from their second sample, so a rescan never adds a whole lifetime at once
+        ticks = sum(s.ticks - previous[p].ticks for p, s in current.items() if p in previous)
+        cpu = ticks / _CLK_TCK / dt * 100 if previous else 0.0
+        rss = sum(s.rss for s in current.values())
+        swap = sum(s.swap for s in current.values())
+        read = sum(max(s.read - previous[p].read, 0) for p, s in current.items() if p in previous)
+        write = sum(max(s.write - previous[p].write, 0) for p, s in current.items() if p in previous)
+        threads = sum(s.threads for s in current.values())
+        stalled = {k: max(v - pressure.get(k, v), 0) / 1e6 for k, v in stalls.items()}
+
+        summary = self.summary
+        summary.samples += 1
+        summary.cpu_mean += (cpu - summary.cpu_mean) / summary.samples
+        summary.cpu_peak = max(summary.cpu_peak, cpu)
+        saturated = 1.0 if cpu >= SATURATION * 100 * self._cores else 0.0
+        summary.cpu_saturated += (saturated - summary.cpu_saturated) / summary.samples
+        summary.threads_peak = max(summary.threads_peak, threads)
+        summary.rss_first = summary.rss_first or rss
+        summary.rss_peak = max(summary.rss_peak, rss)
+        summary.rss_last = rss
+        summary.swap_peak = max(summary.swap_peak, swap)
+        summary.read_bytes += read
+        summary.write_bytes += write
+        for key, seconds in stalled.items():
+            if hasattr(summary, key):
+                setattr(summary, key, getattr(summary, key) + seconds)
+        if t >= WARMUP:
+            fit = self._fit
+            fit[0] += 1
+            fit[1] += t
+            fit[2] += rss
+            fit[3] += t * t
+            fit[4] += t * rss
+
+        if writer is not None:
+            percent = {k: f"{v / dt * 100:.1f}" for k, v in stalled.items()}
+            writer.writerow((f"{t:.1f}", f"{cpu:.1f}", threads, rss >> 10, swap >> 10, read >> 10, write >> 10,
+                             *(percent.get(k, "") for k in COLUMNS[7:])))
+
+
+def sessionPath(started: float, emulator: str, root: Path = SESSION_SAMPLES) -> Path:
+    # one csv per session, the oldest ones beyond the retention are removed
+    try:
+        files = sorted(root.glob("*.csv"))
+        for old in files[:max(len(files) - RETENTION + 1, 0)]:
+            old.unlink(missing_ok=True)
+    except OSError:
+        pass
+    return root / f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{emulator}.csv"
+
+
+def fromConfig(system, started: float) -> Sampler | None:
+    if system.isOptSet("sampler") and system.config["sampler"] == "0":
+        return None
+    interval = DEFAULT_INTERVAL
+    if system.isOptSet("sampler_interval"):
+        try:
+            interval = float(system.config["sampler_interval"])
+        except ValueError:
+            pass
+    return Sampler(sessionPath(started, system.config.get("emulator", "unknown")), interval)
+
+
+def summarize(path: Path) -> ResourceSummary:
+    # the summary of a session file, from its rows
+    summary = ResourceSummary()
+    cores = os.cpu_count() or 1
+    with path.open(newline="") as f:
+        rows = list(csv.DictReader(f))
+    previous = 0.0
+    for row in rows:
+        t, cpu, rss = float(row["t"]), float(row["cpu"]), int(row["rss_kib"]) << 10
+        dt = t - previous
+        previous = t
+        summary.samples += 1
+        summary.cpu_mean += (cpu - summary.cpu_mean) / summary.samples
+        summary.cpu_peak = max(summary.cpu_peak, cpu)
+        saturated = 1.0 if cpu >= SATURATION * 100 * cores else 0.0
+        summary.cpu_saturated += (saturated - summary.cpu_saturated) / summary.samples
+        summary.threads_peak = max(summary.threads_peak, int(row["threads"]))
+        summary.rss_first = summary.rss_first or rss
+        summary.rss_peak = max(summary.rss_peak, rss)
+        summary.rss_last = rss
+        summary.swap_peak = max(summary.swap_peak, int(row["swap_kib"]) << 10)
+        summary.read_bytes += int(row["read_kib"]) << 10
+        summary.write_bytes += int(row["write_kib"]) << 10
+        for key in COLUMNS[7:]:
+            if row[key]:
+                setattr(summary, key, getattr(summary, key) + float(row[key]) / 100 * dt)
+    summary.seconds = previous
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="sample the resources of a process tree, or summarize a session file")
+    parser.add_argument("target", help="pid to sample until it exits, or a session csv file")
+    parser.add_argument("-o", "--output", type=Path, help="csv file of the samples")
+    parser.add_argument("-i", "--interval", type=float, default=DEFAULT_INTERVAL)
+    args = parser.parse_args(argv)
+
+    if args.target.isdigit():
+        sampler = Sampler(args.output, args.interval)
+        sampler.start(int(args.target))
+        try:
+            sampler._thread.join()
+        except KeyboardInterrupt:
+            pass
+        summary = sampler.stop()
+    else:
+        summary = summarize(Path(args.target))
+    for key, value in asdict(summary).items():
+        print(f"{key:<20} {value:.2f}" if isinstance(value, float) else f"{key:<20} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
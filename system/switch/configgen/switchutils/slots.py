@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+# Versioned install slots for the emulators
+# Every update is installed into its own slot, /userdata/system/switch/slots/<emulator>/<version>-<sha>,
+# holding the AppImage and its version.txt. A `current` symlink selects the slot that is launched and
+# a `previous` symlink the one it replaced, both swapped with a rename so a launch never sees a half
+# installed emulator and a rollback is a single symlink swap.
+# ES still launches the scripts the shell updater writes in the switch folder (yuzu.AppImage,
+# Ryujinx.AppImage...), they set up keys, saves, libraries and the nsz conversion before running
+# the emulator binary of extra/<emulator>/. Activating a slot points that binary at the `current`
+# symlink; an emulator installed by the shell updater replaces it and drops the `current` link,
+# the last install wins either way.
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from .switchPaths import SWITCH_EXTRA, SWITCH_HOME, SWITCH_SLOTS
+
+eslog = logging.getLogger(__name__)
+
+# slots kept per emulator, current and previous included
+DEFAULT_RETENTION = 2
+CURRENT = "current"
+PREVIOUS = "previous"
+VERSION_FILE = "version.txt"
+
+# emulator -> (AppImage name, folder of extra/ with the version.txt, binary of that folder the
+# launcher script runs)
+TARGETS: dict[str, tuple[str, str, str]] = {
+    "YUZU": ("yuzu.AppImage", "yuzu", "yuzu"),
+    "YUZUEA": ("yuzuEA.AppImage", "yuzuea", "yuzu"),
+    "RYUJINX": ("Ryujinx.AppImage", "ryujinx", "Ryujinx.AppImage"),
+    "RYUJINXLDN": ("Ryujinx-LDN.AppImage", "ryujinxldn", "Ryujinx-LDN.AppImage"),
+    "RYUJINXAVALONIA": ("Ryujinx-Avalonia.AppImage", "ryujinxavalonia", "Ryujinx-Avalonia.AppImage"),
+}
+
+# emulator names used by es_systems / the generators
+EMULATORS = {
+    "yuzu": "YUZU",
+    "yuzu-early-access": "YUZUEA",
+    "ryujinx": "RYUJINX",
+    "ryujinx-ldn": "RYUJINXLDN",
+    "ryujinx-avalonia": "RYUJINXAVALONIA",
+}
+
+
+class SlotError(Exception):
+    pass
+
+
+class Slots:
+    def __init__(self, emulator: str, root: Path = SWITCH_SLOTS, extra: Path = SWITCH_EXTRA):
+        self.emulator = emulator
+        self.root = Path(root) / emulator.lower()
+        self.extra = Path(extra)
+
+    @property
+    def appimage(self) -> str:
+        return TARGETS[self.emulator][0]
+
+    def _link(self, name: str) -> Path | None:
+        link = self.root / name
+        try:
+            return self.root / os.readlink(link)
+        except OSError:
+            return None
+
+    def current(self) -> Path | None:
+        return self._link(CURRENT)
+
+    def previous(self) -> Path | None:
+        return self._link(PREVIOUS)
+
+    def list(self) -> list[Path]:
+        if not self.root.is_dir():
+            return []
+        slots = [p for p in self.root.iterdir() if p.is_dir() and not p.is_symlink() and not p.name.startswith(".")]
+        return sorted(slots, key=lambda p: p.stat().st_mtime)
+
+    def create(self, name: str) -> Path:
+        # an empty slot to install into, out of the way of the launched one
+        slot = self.root / name
+        if slot == self.current():
+            raise SlotError(f"{self.emulator}: slot {name} is in use")
+        shutil.rmtree(slot, ignore_errors=True)
+        slot.mkdir(parents=True)
+        return slot
+
+    def _swap(self, name: str, slot: Path) -> None:
+        temporary = self.root / f".{name}.tmp"
+        temporary.unlink(missing_ok=True)
+        temporary.symlink_to(slot.name)
+        os.replace(temporary, self.root / name)
+
+    def activate(self, slot: Path) -> None:
+        if not (slot / self.appimage).is_file():
+            raise SlotError(f"{slot} holds no {self.appimage}")
+        current = self.current()
+        if current == slot:
+            return
+        if current is not None and current.is_dir():
+            self._swap(PREVIOUS, current)
+        self._swap(CURRENT, slot)
+        self._publish()
+        eslog.info(f"{self.emulator}: {slot.name} activated")
+
+    def rollback(self) -> Path:
+        previous = self.previous()
+        if previous is None or not previous.is_dir():
+            raise SlotError(f"{self.emulator}: no previous slot to roll back to")
+        current = self.current()
+        self._swap(CURRENT, previous)
+        if current is not None:
+            self._swap(PREVIOUS, current)
+        self._publish()
+        eslog.info(f"{self.emulator}: rolled back to {previous.name}")
+        return previous
+
+    def _publish(self) -> None:
+        # the binary run by the launcher script follows the `current` symlink, a rollback needs no relink
+        binary = launchedBinary(self.emulator, self.extra)
+        binary.parent.mkdir(parents=True, exist_ok=True)
+        temporary = binary.with_name(f".{binary.name}.tmp")
+        temporary.unlink(missing_ok=True)
+        temporary.symlink_to(self.root / CURRENT / self.appimage)
+        os.replace(temporary, binary)
+
+    def prune(self, retention: int = DEFAULT_RETENTION) -> list[Path]:
+        keep = {self.current(), self.previous()}
+        slots = self.list()
+        removed = []
+        for slot in slots:
+            if len(slots) - len(removed) <= retention:
+                break
+            if slot in keep:
+                continue
+            shutil.rmtree(slot, ignore_errors=True)
+            removed.append(slot)
+        return removed
+
+
+def appImage(emulator: str, home: Path = SWITCH_HOME) -> Path:
+    # the launcher script of the shell updater, what the generators run whatever installed the emulator
+    return Path(home) / TARGETS[emulator][0]
+
+
+def launchedBinary(emulator: str, extra: Path = SWITCH_EXTRA) -> Path:
+    _, folder, binary = TARGETS[emulator]
+    return Path(extra) / folder / binary
+
+
+def versionFile(emulator: str, root: Path = SWITCH_SLOTS, extra: Path = SWITCH_EXTRA) -> Path:
+    current = Path(root) / emulator.lower() / CURRENT / VERSION_FILE
+    if current.is_file():
+        return current
+    return Path(extra) / TARGETS[emulator][1] / VERSION_FILE
+
+
+def retention(config: dict[str, str]) -> int:
+    value = config.get("UPDATE_KEEP_SLOTS", "")
+    if value.isdigit():
+        return max(int(value), 1)
+    return DEFAULT_RETENTION
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="manage the emulator install slots")
+    parser.add_argument("action", choices=["list", "rollback"])
+    parser.add_argument("emulators", nargs="*", help="emulators, all by default")
+    parser.add_argument("--root", type=Path, default=SWITCH_SLOTS, help="slots folder")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    status = 0
+    for emulator in [e.upper() for e in args.emulators] or list(TARGETS):
+        slots = Slots(emulator, args.root)
+        if args.action == "rollback":
+            try:
+                slots.rollback()
+            except SlotError as e:
+                eslog.error(e)
+                status = 1
+            continue
+        for slot in slots.list():
+            marker = "*" if slot == slots.current() else "-" if slot == slots.previous() else " "
+            print(f"{emulator} {marker} {slot.name}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Final
+
+from configgen.batoceraPaths import BIOS, CACHE, CONFIGS, ROMS
+
+SWITCH_HOME: Final = Path('/userdata/system/switch')
+SWITCH_EXTRA: Final = SWITCH_HOME / 'extra'
+SWITCH_PYTHON: Final = SWITCH_EXTRA / 'python'
+SWITCH_ROMDIR: Final = ROMS / 'switch'
+SWITCH_BIOS: Final = BIOS / 'switch'
+SWITCH_PRODKEYS: Final = SWITCH_BIOS / 'prod.keys'
+SWITCH_FIRMWARE: Final = SWITCH_BIOS / 'firmware'
+SWITCH_CONFIG: Final = SWITCH_HOME / 'CONFIG.txt'
+SWITCH_SLOTS: Final = SWITCH_HOME / 'slots'
+SWITCH_METRICS: Final = SWITCH_HOME / 'metrics' / 'switch_launcher.prom'
+SESSION_DB: Final = SWITCH_HOME / 'sessions.db'
+SESSION_SAMPLES: Final = SWITCH_HOME / 'sessions'
+SESSION_LOCK: Final = Path('/var/run/switch-session.json')
+LAUNCH_VIEW: Final = Path('/var/run/switch-games')
+HOST_SNAPSHOT: Final = Path('/var/run/switch-host.json')
+SCHEDULER_STATE: Final = SWITCH_HOME / 'scheduler.json'
+SAVE_SNAPSHOTS: Final = SWITCH_HOME / 'snapshots'
+FRAME_LOGS: Final = SWITCH_HOME / 'frametimes'
+FRAME_TUNING: Final = SWITCH_HOME / 'tuning.json'
+BATOCERA_CONF: Final = Path('/userdata/system/batocera.conf')
+SWITCH_CACHE: Final = CACHE / 'switch'
+NSZ_CACHE: Final = SWITCH_CACHE / 'nsz'
+FIRMWARE_MANIFESTS: Final = SWITCH_CACHE / 'firmware'
+TITLE_INDEX: Final = SWITCH_CACHE / 'titles.json'
+
+RYUJINX_REGISTERED: Final = CONFIGS / 'Ryujinx' / 'bis' / 'system' / 'Contents' / 'registered'
+YUZU_REGISTERED: Final = CONFIGS / 'yuzu' / 'nand' / 'system' / 'Contents' / 'registered'
+RYUJINX_GAMES: Final = CONFIGS / 'Ryujinx' / 'games'
+RYUJINX_SAVES: Final = CONFIGS / 'Ryujinx' / 'bis' / 'user' / 'save'
+YUZU_SHADERS: Final = CONFIGS / 'yuzu' / 'shader'
+YUZU_SAVES: Final = CONFIGS / 'yuzu' / 'nand' / 'user' / 'save'
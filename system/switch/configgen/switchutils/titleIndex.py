@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+# Persistent title index of the switch roms
+# Maps every nsp/nsz/xci/xcz below roms/switch to its title ids, from the [0100...] tags of the file
+# name or the container headers, so the base game, its updates and its DLC are paired without the
+# emulator parsing the whole library. The index is refreshed with a stat of every file, only new or
+# changed files are read again. At launch the paired files are linked into /var/run/switch-games,
+# the only game folder of the emulator for that session.
+#   python -m switchutils.titleIndex refresh
+#   python -m switchutils.titleIndex related "/userdata/roms/switch/Some Game.nsp"
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from . import nsz
+from .switchPaths import LAUNCH_VIEW, SWITCH_ROMDIR, TITLE_INDEX
+
+eslog = logging.getLogger(__name__)
+
+ROM_SUFFIXES = {".nsp", ".nsz", ".xci", ".xcz"}
+
+_TITLE_TAG = re.compile(r"[\[(]([0-9A-Fa-f]{16})[\])]")
+
+
+def baseId(title_id: str) -> str:
+    # updates are the base id + 0x800, DLC the base id + 0x1000 + their index
+    value = int(title_id, 16)
+    if value & 0xFFF == 0:
+        return f"{value:016X}"
+    if value & 0xFFF == 0x800:
+        return f"{value & ~0xFFF:016X}"
+    return f"{(value & ~0xFFF) ^ 0x1000:016X}"
+
+
+def kind(title_id: str) -> str:
+    low = int(title_id, 16) & 0xFFF
+    return "base" if low == 0 else "update" if low == 0x800 else "dlc"
+
+
+def fileTitleIds(path: str | Path) -> list[str]:
+    tags = _TITLE_TAG.findall(Path(path).name)
+    if tags:
+        return sorted({t.upper() for t in tags})
+    try:
+        return nsz.titleIds(path)
+    except (OSError, nsz.NszError, ValueError, UnicodeDecodeError, struct.error):
+        return []
+
+
+@dataclass
+class TitleFile:
+    size: int
+    mtime: int
+    ids: list[str] = field(default_factory=list)
+
+
+class TitleIndex:
+    def __init__(self, root: Path = SWITCH_ROMDIR, path: Path = TITLE_INDEX):
+        self.root = Path(root)
+        self.path = Path(path)
+        self.files: dict[str, TitleFile] = self._load()
+
+    def _load(self) -> dict[str, TitleFile]:
+        try:
+            data = json.loads(self.path.read_text())
+            if data.get("root") != str(self.root):
+                return {}
+            return {name: TitleFile(**entry) for name, entry in data["files"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps({"root": str(self.root),
+                                         "files": {name: asdict(entry) for name, entry in self.files.items()}}))
+        os.replace(temporary, self.path)
+
+    def _scan(self) -> dict[str, os.stat_result]:
+        found = {}
+        pending = [self.root]
+        while pending:
+            folder = pending.pop()
+            try:
+                entries = os.scandir(folder)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        pending.append(Path(entry.path))
+                    elif os.path.splitext(entry.name)[1].lower() in ROM_SUFFIXES:
+                        try:
+                            found[entry.path] = entry.stat()
+                        except OSError:
+                            continue
+        return found
+
+    def refresh(self) -> int:
+        # number of files read, 0 when the library didn't change
+        current = self._scan()
+        read = 0
+        files = {}
+        for name, st in current.items():
+            entry = self.files.get(name)
+            if entry is None or entry.size != st.st_size or entry.mtime != st.st_mtime_ns:
+                entry = TitleFile(st.st_size, st.st_mtime_ns, fileTitleIds(name))
+                read += 1
+            files[name] = entry
+        if read or files.keys() != self.files.keys():
+            self.files = files
+            self.save()
+        return read
+
+    def titles(self) -> dict[str, list[str]]:
+        # files of every base title id
+        titles: dict[str, list[str]] = {}
+        for name, entry in self.files.items():
+            for base in {baseId(i) for i in entry.ids}:
+                titles.setdefault(base, []).append(name)
+        return titles
+
+    def ids(self, rom: str | Path) -> list[str]:
+        entry = self.files.get(str(rom))
+        return entry.ids if entry is not None else fileTitleIds(rom)
+
+    def related(self, rom: str | Path) -> list[Path]:
+        # the rom, then the other files of its titles: updates, DLC and other dumps of the game
+        rom = Path(rom)
+        bases = {baseId(i) for i in self.ids(rom)}
+        found = [Path(name) for name, other in self.files.items()
+                 if Path(name) != rom and bases & {baseId(i) for i in other.ids}]
+        return [rom] + sorted(found)
+
+
+def launchView(rom: str | Path, root: Path = SWITCH_ROMDIR, view: Path = LAUNCH_VIEW) -> Path | None:
+    # a folder of symlinks to the rom and to its updates and DLC, listed by the emulator instead of
+    # the library. None when the title of the rom is unknown, the emulator has to scan for them itself
+    index = TitleIndex(root)
+    read = index.refresh()
+    if read:
+        eslog.info(f"title index: {read} files indexed")
+    rom = Path(rom)
+    removeView(view)
+    bases = {baseId(i) for i in index.ids(rom)}
+    if not bases:
+        return None
+    # other dumps of the base game, or the nsz the launched nsp was decompressed from, are left out
+    files = [rom] + [path for path in index.related(rom)[1:]
+                     if any(kind(i) != "base" for i in index.files[str(path)].ids if baseId(i) in bases)]
+    view.mkdir(parents=True)
+    for number, path in enumerate(files):
+        link = view / path.name
+        if link.is_symlink():
+            link = view / f"{number}-{path.name}"
+        link.symlink_to(path.absolute())
+    return view
+
+
+def removeView(view: Path = LAUNCH_VIEW) -> None:
+    shutil.rmtree(view, ignore_errors=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="index the switch roms by title id")
+    parser.add_argument("--root", type=Path, default=SWITCH_ROMDIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("refresh", help="index the new and changed roms")
+    commands.add_parser("list", help="files of every title")
+    related = commands.add_parser("related", help="the updates and DLC of a rom")
+    related.add_argument("rom", type=Path)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    index = TitleIndex(args.root)
+    read = index.refresh()
+    if args.command == "refresh":
+        print(f"{len(index.files)} files, {read} read")
+    elif args.command == "list":
+        for base, names in sorted(index.titles().items()):
+            print(base)
+            for name in sorted(names):
+                ids = ", ".join(f"{i} {kind(i)}" for i in index.files[name].ids if baseId(i) == base)
+                print(f"  {name} ({ids})")
+    else:
+        for path in index.related(args.rom.absolute()):
+            print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+# Emulator update engine
+# Downloads every emulator selected in EMULATORS= of ~/switch/CONFIG.txt concurrently from a
+# mirror publishing a manifest.json, resumes interrupted transfers with HTTP ranges, checks the
+# sha256 from the manifest and only then activates it in a new install slot (see slots.py).
+#
+# manifest.json:
+#   {"emulators": {"YUZU": {"file": "yuzu-1734.AppImage", "size": 123, "sha256": "...", "version": "1734"}}}
+# "file" is relative to the manifest url unless it is an absolute url. An optional "blocks" entry
+# points to the block manifest of the file, the installed AppImage is then patched with delta.py and
+# only the blocks it lacks are downloaded.
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import stat
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.client import HTTPException
+from pathlib import Path
+
+from . import delta, maintenance
+from .slots import DEFAULT_RETENTION, TARGETS, VERSION_FILE, SlotError, Slots, launchedBinary, retention
+from .switchPaths import SWITCH_CONFIG, SWITCH_EXTRA, SWITCH_HOME, SWITCH_SLOTS
+
+eslog = logging.getLogger(__name__)
+
+CHUNK_SIZE = 0x100000
+RETRIES = 10
+TIMEOUT = 30
+DEFAULT_EMULATORS = ["YUZU", "YUZUEA", "RYUJINX", "RYUJINXLDN", "RYUJINXAVALONIA"]
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class UpdateError(Exception):
+    pass
+
+
+@dataclass
+class Release:
+    emulator: str
+    url: str
+    size: int
+    sha256: str
+    version: str = ""
+    blocks: str = ""
+
+
+def readConfig(path: Path = SWITCH_CONFIG) -> dict[str, str]:
+    # CONFIG.txt, the user copy of batocera-switch-config.txt, is a shell file, only KEY=value lines matter
+    config = {}
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return config
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        config[key.strip()] = value.strip().strip('"').strip("'")
+    return config
+
+
+def selectedEmulators(config: dict[str, str]) -> list[str]:
+    value = config.get("EMULATORS", "").replace("-", " ").split()
+    return [e for e in value if e in TARGETS] or DEFAULT_EMULATORS
+
+
+def fetchManifest(base_url: str) -> dict[str, Release]:
+    url = urllib.parse.urljoin(base_url.rstrip("/") + "/", "manifest.json")
+    with urllib.request.urlopen(url, timeout=TIMEOUT) as response:
+        data = json.load(response)
+    releases = {}
+    for emulator, entry in data.get("emulators", {}).items():
+        blocks = urllib.parse.urljoin(url, entry["blocks"]) if entry.get("blocks") else ""
+        releases[emulator] = Release(emulator, urllib.parse.urljoin(url, entry["file"]), int(entry["size"]),
+                                     entry["sha256"].lower(), str(entry.get("version", "")), blocks)
+    return releases
+
+
+def download(url: str, destination: Path, size: int, progress: Callable[[int, int], None] | None = None,
+             retries: int = RETRIES) -> None:
+    # append to destination with range requests until it holds size bytes, a dropped connection
+    # only costs a new request from the current offset
+    attempt = 0
+    while True:
+        done = destination.stat().st_size if destination.exists() else 0
+        if done > size:
+            destination.unlink()
+            done = 0
+        if done == size:
+            return
+        request = urllib.request.Request(url, headers={"Range": f"bytes={done}-"} if done else {})
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+                if done and response.status != 206:
+                    # the server ignored the range, start over
+                    done = 0
+                with destination.open("ab" if done else "wb") as out:
+                    while data := response.read(CHUNK_SIZE):
+                        # a pause long enough to drop the connection is resumed like any other drop
+                        maintenance.checkpoint("updater")
+                        out.write(data)
+                        done += len(data)
+                        if progress is not None:
+                            progress(done, size)
+            if done >= size:
+                return
+            raise UpdateError(f"{url}: connection closed at {done}/{size} bytes")
+        except (urllib.error.URLError, HTTPException, OSError, UpdateError) as e:
+            if isinstance(e, urllib.error.HTTPError) and e.code not in (408, 429, 500, 502, 503, 504):
+                raise UpdateError(f"{url}: {e}") from e
+            attempt += 1
+            if attempt > retries:
+                raise UpdateError(f"{url}: giving up after {retries} retries: {e}") from e
+            eslog.warning(f"{url}: {e}, resuming (attempt {attempt}/{retries})")
+            time.sleep(min(2 ** attempt, 30) / 10)
+
+
+def sha256sum(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class Updater:
+    def __init__(self, base_url: str, emulators: list[str], home: Path = SWITCH_HOME, slots: Path = SWITCH_SLOTS,
+                 keep: int = DEFAULT_RETENTION, progress: ProgressCallback | None = None, extra: Path = SWITCH_EXTRA):
+        self.base_url = base_url
+        self.emulators = emulators
+        self.home = Path(home)
+        self.slots = Path(slots)
+        self.extra = Path(extra)
+        self.keep = keep
+        self.staging = self.home / ".updates"
+        self.progress = progress
+        # bytes reused from the installed AppImages by delta updates, per emulator
+        self.saved: dict[str, int] = {}
+
+    def run(self) -> dict[str, str]:
+        releases = fetchManifest(self.base_url)
+        self.staging.mkdir(parents=True, exist_ok=True)
+
+        jobs = []
+        results = {}
+        for emulator in self.emulators:
+            release = releases.get(emulator)
+            if release is None:
+                results[emulator] = "not in manifest"
+            elif self._is_current(release):
+                results[emulator] = "up to date"
+            else:
+                jobs.append(release)
+
+        with ThreadPoolExecutor(max(1, len(jobs))) as pool:
+            futures = [(release, pool.submit(self._update, release)) for release in jobs]
+            for release, future in futures:
+                try:
+                    future.result()
+                except (UpdateError, SlotError, OSError) as e:
+                    eslog.error(f"{release.emulator} update failed: {e}")
+                    results[release.emulator] = f"failed: {e}"
+                    continue
+                results[release.emulator] = "updated"
+                if self.saved.get(release.emulator):
+                    results[release.emulator] += f" ({self.saved[release.emulator] >> 20} MiB saved by delta)"
+        return results
+
+    @staticmethod
+    def slotName(release: Release) -> str:
+        return f"{release.version or 'unknown'}-{release.sha256[:16]}"
+
+    def target(self, emulator: str) -> Path:
+        # the binary that is launched today, base of the delta updates: the current slot, or what the
+        # shell updater installed
+        current = Slots(emulator, self.slots, self.extra).current()
+        if current is not None:
+            return current / TARGETS[emulator][0]
+        return launchedBinary(emulator, self.extra)
+
+    def _is_current(self, release: Release) -> bool:
+        current = Slots(release.emulator, self.slots, self.extra).current()
+        return current is not None and current.name == self.slotName(release)
+
+    def _update(self, release: Release) -> None:
+        partial = self.staging / f"{release.emulator}-{release.sha256[:16]}.part"
+        if release.blocks and self.target(release.emulator).is_file() and not partial.exists():
+            try:
+                stats = delta.patch(self.target(release.emulator), release.url,
+                                    delta.fetchBlockManifest(release.blocks), partial)
+                self.saved[release.emulator] = stats.saved
+                self.install(release, partial)
+                return
+            except (delta.DeltaError, urllib.error.URLError, HTTPException, OSError, ValueError, KeyError) as e:
+                eslog.warning(f"{release.emulator} delta update failed, downloading it in full: {e}")
+                partial.unlink(missing_ok=True)
+        progress = None
+        if self.progress is not None:
+            progress = lambda done, total: self.progress(release.emulator, done, total)
+        download(release.url, partial, release.size, progress)
+        digest = sha256sum(partial)
+        if digest != release.sha256:
+            partial.unlink(missing_ok=True)
+            raise UpdateError(f"checksum mismatch, got {digest} instead of {release.sha256}")
+        self.install(release, partial)
+
+    def install(self, release: Release, staged: Path) -> None:
+        # staging and slots are on the same filesystem, the file is renamed into a fresh slot which is
+        # then activated with a single symlink swap
+        slots = Slots(release.emulator, self.slots, self.extra)
+        slot = slots.create(self.slotName(release))
+        staged.chmod(staged.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+        staged.replace(slot / TARGETS[release.emulator][0])
+        if release.version:
+            (slot / VERSION_FILE).write_text(release.version.removeprefix("1.1.") + "\n")
+        slots.activate(slot)
+        for removed in slots.prune(self.keep):
+            eslog.info(f"{release.emulator}: removed old slot {removed.name}")
+        eslog.info(f"{release.emulator} {release.version} installed")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="update the switch emulators")
+    parser.add_argument("--base-url", help="mirror publishing manifest.json, UPDATE_URL from the config by default")
+    parser.add_argument("--config", type=Path, default=SWITCH_CONFIG, help="the user config, ~/switch/CONFIG.txt")
+    parser.add_argument("--home", type=Path, default=SWITCH_HOME, help="install folder")
+    parser.add_argument("emulators", nargs="*", help="emulators to update, EMULATORS from the config by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    config = readConfig(args.config)
+    base_url = args.base_url or config.get("UPDATE_URL", "")
+    if not base_url:
+        eslog.error("no update mirror configured, set UPDATE_URL in ~/switch/CONFIG.txt")
+        return 1
+    emulators = [e.upper() for e in args.emulators] or selectedEmulators(config)
+
+    def progress(emulator: str, done: int, total: int) -> None:
+        if done == total or done % (16 * CHUNK_SIZE) < CHUNK_SIZE:
+            print(f"{emulator}: {done >> 20}/{total >> 20} MiB", flush=True)
+
+    try:
+        results = Updater(base_url, emulators, home=args.home, slots=args.home / "slots", keep=retention(config),
+                          progress=progress, extra=args.home / "extra").run()
+    except (urllib.error.URLError, HTTPException, OSError, ValueError, KeyError) as e:
+        eslog.error(f"unable to read the update manifest: {e}")
+        return 1
+    for emulator, result in results.items():
+        print(f"{emulator}: {result}")
+    return 0 if not any(r.startswith("failed") for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
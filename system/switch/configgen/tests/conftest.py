@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the tests import switchutils the way switchlauncher.py does, from the configgen folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
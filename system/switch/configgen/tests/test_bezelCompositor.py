@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+# the PIL path is bezelsUtil of the batocera configgen, the SDL one needs libSDL2 and SDL2_image
+bezelsUtil = pytest.importorskip("configgen.utils.bezels")
+Image = pytest.importorskip("PIL.Image")
+ImageChops = pytest.importorskip("PIL.ImageChops")
+
+from switchutils import bezelCompositor  # noqa: E402
+
+WIDTH, HEIGHT = 1920, 1080
+
+
+@pytest.fixture(scope="module")
+def compositor():
+    try:
+        return bezelCompositor.Compositor()
+    except ImportError as e:
+        pytest.skip(f"no SDL: {e}")
+
+
+class FakeSystem:
+    name = "switch"
+
+    def __init__(self, config: dict[str, str]):
+        self.config = config
+
+    def isOptSet(self, key: str) -> bool:
+        return key in self.config
+
+    def getOptBoolean(self, key: str) -> bool:
+        return self.config[key] in ("1", "true", "True")
+
+
+def bezel(path: Path) -> Path:
+    # opaque gradient columns, a translucent band and the transparent game area
+    image = Image.new("RGBA", (WIDTH, HEIGHT))
+    column = WIDTH // 8
+    ramp = Image.linear_gradient("L")
+    edge = Image.merge("RGBA", (ramp.resize((column, HEIGHT)), ramp.rotate(90).resize((column, HEIGHT)),
+                                Image.new("L", (column, HEIGHT), 128), Image.new("L", (column, HEIGHT), 255)))
+    image.paste(edge, (0, 0))
+    image.paste(edge, (WIDTH - column, 0))
+    image.paste((200, 40, 90, 96), (column, 0, column * 2, HEIGHT))
+    image.save(path)
+    return path
+
+
+def tattoo(path: Path, width: int, height: int) -> Path:
+    # opaque, translucent and transparent pixels
+    image = Image.new("RGBA", (width, height))
+    image.putdata([(255 - x % 256, y % 256, (x + y) % 256, (0, 64, 160, 255)[(x // 16 + y // 16) % 4])
+                   for y in range(height) for x in range(width)])
+    image.save(path)
+    return path
+
+
+def delta(first: Path, second: Path) -> int:
+    with Image.open(first) as a, Image.open(second) as b:
+        assert a.size == b.size
+        return max(high for _, high in ImageChops.difference(a.convert("RGBA"), b.convert("RGBA")).getextrema())
+
+
+@pytest.mark.parametrize("corner", ["NW", "NE", "SE", "SW"])
+def test_tattoo(tmp_path, compositor, corner):
+    # the tattoo is already 225px wide on 1080p: no resampling, only the blending is compared.
+    # The SW/SE corners and the translucent band put it over translucent bezel pixels
+    source = bezel(tmp_path / "bezel.png")
+    system = FakeSystem({"bezel.tattoo": "custom", "bezel.tattoo_file": str(tattoo(tmp_path / "tattoo.png", 225, 300)),
+                         "bezel.tattoo_corner": corner})
+    pil = tmp_path / "pil.png"
+    bezelsUtil.tatooImage(source, pil, system)
+    sdl = compositor.compose(source, tmp_path / "sdl.png", WIDTH, HEIGHT,
+                             tattoo=bezelCompositor.tattooFromConfig(system))
+    assert delta(pil, sdl) <= 1
+
+
+def test_tattoo_over_translucent(tmp_path, compositor):
+    # a tattoo as wide as the translucent band, the case SDL_BLENDMODE_BLEND got wrong
+    source = tmp_path / "bezel.png"
+    Image.new("RGBA", (WIDTH, HEIGHT), (200, 40, 90, 96)).save(source)
+    system = FakeSystem({"bezel.tattoo": "custom", "bezel.tattoo_file": str(tattoo(tmp_path / "tattoo.png", 225, 225))})
+    pil = tmp_path / "pil.png"
+    bezelsUtil.tatooImage(source, pil, system)
+    sdl = compositor.compose(source, tmp_path / "sdl.png", WIDTH, HEIGHT,
+                             tattoo=bezelCompositor.tattooFromConfig(system))
+    assert delta(pil, sdl) <= 1
+
+
+@pytest.mark.parametrize("size, ratio", [("thin", None), ("medium", None), ("big", "4:3")])
+def test_gun_borders(tmp_path, compositor, size, ratio):
+    source = bezel(tmp_path / "bezel.png")
+    inner, outer = bezelsUtil.gunBordersSize(size)
+    color = bezelsUtil.gunsBordersColorFomConfig({})
+    pil = tmp_path / "pil.png"
+    bezelsUtil.gunBorderImage(source, pil, ratio, inner, outer, color)
+    borders = bezelCompositor.GunBorders(inner, outer, ratio, bezelCompositor.parseColor(color))
+    sdl = compositor.compose(source, tmp_path / "sdl.png", WIDTH, HEIGHT, borders=borders)
+    assert delta(pil, sdl) <= 1
+
+
+def test_resize(tmp_path, compositor):
+    # SDL stretches linearly, PIL bicubically: only close on smooth content
+    source = tmp_path / "bezel.png"
+    image = Image.new("RGBA", (1280, 720))
+    image.putdata([(x * 255 // 1280, y * 255 // 720, 128, 255) for y in range(720) for x in range(1280)])
+    image.save(source)
+    pil = tmp_path / "pil.png"
+    bezelsUtil.resizeImage(source, pil, WIDTH, HEIGHT, True)
+    sdl = compositor.compose(source, tmp_path / "sdl.png", WIDTH, HEIGHT, stretch=True)
+    assert delta(pil, sdl) <= 4
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import pytest
+
+# switchutils reads its paths from the batocera configgen package
+pytest.importorskip("configgen.batoceraPaths")
+
+from switchutils import delta  # noqa: E402
+
+BLOCK = 64
+
+
+def build(seed: int, size: int) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def rebuild(tmp_path: Path, monkeypatch, target: bytes, local: bytes) -> delta.DeltaStats:
+    (tmp_path / "target").write_bytes(target)
+    (tmp_path / "local").write_bytes(local)
+    manifest = delta.blockManifest(tmp_path / "target", BLOCK)
+
+    # the mirror serves its ranges from the target bytes
+    def fetch(url, start, end, out, digest):
+        data = target[start:end + 1]
+        out.write(data)
+        digest.update(data)
+        return len(data)
+
+    monkeypatch.setattr(delta, "_fetch_range", fetch)
+    stats = delta.patch(tmp_path / "local", "http://mirror/target", manifest, tmp_path / "rebuilt")
+    assert (tmp_path / "rebuilt").read_bytes() == target
+    return stats
+
+
+def test_aligned_blocks_are_found_without_rolling(tmp_path, monkeypatch):
+    target = build(1, BLOCK * 40 + 17)
+    (tmp_path / "local").write_bytes(target)
+    monkeypatch.setattr(delta, "_roll", lambda *args: pytest.fail("unchanged file rolled"))
+    found = delta.findBlocks(tmp_path / "local", delta.blockManifest(tmp_path / "local", BLOCK))
+    # every block at its own offset, the short last one included
+    assert found == {i: i * BLOCK for i in range(41)}
+
+
+def test_identical_file(tmp_path, monkeypatch):
+    target = build(1, BLOCK * 40)
+    stats = rebuild(tmp_path, monkeypatch, target, target)
+    assert stats.saved == len(target) and stats.requests == 0
+
+
+@pytest.mark.parametrize("where", [0, BLOCK * 10 + 5, BLOCK * 39])
+def test_shifted_file(tmp_path, monkeypatch, where):
+    target = build(2, BLOCK * 40 + 17)
+    local = target[:where] + build(3, 13) + target[where:]
+    stats = rebuild(tmp_path, monkeypatch, target, local)
+    # at most the blocks around the insertion and the short last block are fetched
+    assert stats.saved >= len(target) - 2 * BLOCK - 17
+
+
+def test_edited_file(tmp_path, monkeypatch):
+    target = build(4, BLOCK * 40 + 17)
+    local = bytearray(target)
+    local[BLOCK * 5 + 3] ^= 0xFF
+    local[BLOCK * 20:BLOCK * 22] = build(5, BLOCK * 2)
+    del local[BLOCK * 30:BLOCK * 30 + 9]
+    stats = rebuild(tmp_path, monkeypatch, target, bytes(local))
+    assert stats.saved >= len(target) - 6 * BLOCK - 17
+
+
+def test_unrelated_file(tmp_path, monkeypatch):
+    target = build(6, BLOCK * 10)
+    stats = rebuild(tmp_path, monkeypatch, target, build(7, BLOCK * 10))
+    assert stats.saved == 0 and stats.requests == 1
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+# switchutils reads its paths from the batocera configgen package
+pytest.importorskip("configgen.batoceraPaths")
+
+from switchutils import gpuProfile, hostInfo  # noqa: E402
+
+
+def fakeGpu(root: Path, driver: str, vendor_id: str | None = None, card: str = "card0") -> None:
+    device = root / "sys/class/drm" / card / "device"
+    device.mkdir(parents=True)
+    if vendor_id is not None:
+        # pci gpu: vendor id and a driver symlink
+        (device / "vendor").write_text(f"{vendor_id}\n")
+        (device / "boot_vga").write_text("1\n")
+        os.symlink(f"../../../bus/pci/drivers/{driver}", device / "driver")
+    else:
+        # platform gpu: only the uevent names the driver
+        (device / "uevent").write_text(f"DRIVER={driver}\nOF_NAME=gpu\n")
+
+
+def fakeIcd(root: Path, name: str) -> None:
+    folder = root / "usr/share/vulkan/icd.d"
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / name).write_text(json.dumps({"file_format_version": "1.0.0",
+                                           "ICD": {"library_path": "libvulkan.so", "api_version": "1.3.0"}}))
+
+
+@pytest.mark.parametrize("driver, vendor_id, icds, rule", [
+    ("nvidia", "0x10de", ["nvidia_icd.json"], "nvidia"),
+    ("nvidia", "0x10de", [], "nvidia opengl"),
+    ("nouveau", "0x10de", ["nouveau_icd.x86_64.json"], "nvidia nouveau"),
+    ("nouveau", "0x10de", [], "mesa opengl"),
+    ("amdgpu", "0x1002", ["radeon_icd.x86_64.json"], "amd"),
+    ("i915", "0x8086", ["intel_icd.x86_64.json"], "intel"),
+    ("panfrost", None, ["panfrost_icd.aarch64.json"], "arm"),
+    ("msm", None, ["freedreno_icd.aarch64.json"], "qualcomm"),
+    # lavapipe is no vulkan driver of the gpu
+    ("amdgpu", "0x1002", ["lvp_icd.x86_64.json"], "mesa opengl"),
+    (None, None, ["lvp_icd.x86_64.json"], "fallback"),
+    (None, None, [], "fallback"),
+])
+def test_select(tmp_path, driver, vendor_id, icds, rule):
+    if driver is not None:
+        fakeGpu(tmp_path, driver, vendor_id)
+    for icd in icds:
+        fakeIcd(tmp_path, icd)
+    assert gpuProfile.select(hostInfo.gather(tmp_path)).name == rule
+
+
+def test_select_boot_gpu(tmp_path):
+    # an igpu next to the discrete card with the display
+    fakeGpu(tmp_path, "i915", "0x8086", "card0")
+    (tmp_path / "sys/class/drm/card0/device/boot_vga").write_text("0\n")
+    fakeGpu(tmp_path, "amdgpu", "0x1002", "card1")
+    fakeIcd(tmp_path, "intel_icd.x86_64.json")
+    fakeIcd(tmp_path, "radeon_icd.x86_64.json")
+    assert gpuProfile.select(hostInfo.gather(tmp_path)).name == "amd"
+
+
+class FakeSystem:
+    def __init__(self, config: dict[str, str]):
+        self.config = config
+
+    def isOptSet(self, key: str) -> bool:
+        return key in self.config
+
+
+@pytest.fixture
+def amdHost(tmp_path, monkeypatch):
+    fakeGpu(tmp_path, "amdgpu", "0x1002")
+    fakeIcd(tmp_path, "radeon_icd.x86_64.json")
+    snapshot = hostInfo.gather(tmp_path)
+    monkeypatch.setattr(hostInfo, "host", lambda: snapshot)
+    return snapshot
+
+
+def test_defaults(amdHost):
+    assert gpuProfile.defaults(FakeSystem({})) == dict(next(r for r in gpuProfile.RULES if r.name == "amd").settings)
+
+
+def test_defaults_keep_user_options(amdHost):
+    settings = gpuProfile.defaults(FakeSystem({"yuzu_backend": "0", "async_shaders": "false"}))
+    assert "yuzu_backend" not in settings and "async_shaders" not in settings
+    assert settings["ryu_backend"] == "Vulkan"
+
+
+def test_defaults_gpu_auto_off(amdHost):
+    assert gpuProfile.defaults(FakeSystem({"gpu_auto": "0"})) == {}
+    assert gpuProfile.defaults(FakeSystem({"gpu_auto": "1"})) != {}
@@ -218,6 +218,10 @@ path=/userdata/system/switch/configgen/generators/yuzu
 url=https://raw.githubusercontent.com/ngencokamin/batocera-switch/main/system/switch/configgen/generators/yuzu
 wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/__init__.py" "$url/__init__.py"
 wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuMainlineGenerator.py" "$url/yuzuMainlineGenerator.py"
+wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuGenerator.py" "$url/yuzuGenerator.py"
+wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuControllers.py" "$url/yuzuControllers.py"
+wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuMappings.py" "$url/yuzuMappings.py"
+wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuPaths.py" "$url/yuzuPaths.py"
 # -------------------------------------------------------------------- 
 # FILL /USERDATA/SYSTEM/SWITCH/CONFIGGEN/GENERATORS
 path=/userdata/system/switch/configgen/generators
@@ -232,6 +236,16 @@ wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/Gene
 wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/switchlauncher.py" "$url/switchlauncher.py"
 wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/switchlauncher2.py" "$url/switchlauncher2.py"
 # -------------------------------------------------------------------- 
+# FILL /USERDATA/SYSTEM/SWITCH/CONFIGGEN/SWITCHUTILS
+path=/userdata/system/switch/configgen/switchutils
+url=https://raw.githubusercontent.com/ngencokamin/batocera-switch/main/system/switch/configgen/switchutils
+mkdir -p $path 2>/dev/null
+for file in __init__.py bezelCompositor.py bundle.py delta.py firmwareInstaller.py firmwareSync.py frameTimes.py gpuProfile.py hostInfo.py importTime.py launchMetrics.py logAnalyzer.py maintenance.py mirror.py nsz.py nszCache.py saveSnapshots.py scheduler.py sessionDb.py sessionSampler.py slots.py switchPaths.py titleIndex.py updater.py; do
+   wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/$file" "$url/$file"
+done
+# the precompiled bundle of switchutils/bundle.py was built from the old configgen
+rm -f /userdata/system/switch/configgen.*.zip 2>/dev/null
+# -------------------------------------------------------------------- 
 # FILL /USERDATA/SYSTEM/CONFIGS/EMULATIONSTATION
 path=/userdata/system/configs/emulationstation
 url=https://raw.githubusercontent.com/ngencokamin/batocera-switch/main/system/configs/emulationstation
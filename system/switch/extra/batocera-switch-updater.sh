@@ -898,6 +898,8 @@ if [ -f "$link_yuzu" ]; then
 		   cp $temp/yuzu/squashfs-root/usr/lib/libcrypto* /userdata/system/switch/extra/yuzu/ 2>/dev/null 
 		   cp $temp/yuzu/squashfs-root/usr/lib/libssl* /userdata/system/switch/extra/yuzu/ 2>/dev/null 
 		   cp $temp/yuzu/squashfs-root/usr/lib/libicu* /userdata/system/switch/extra/yuzu/ 2>/dev/null 
+		   # this install takes over from the install slots of switchutils/slots.py: drop the slot link, not the slot
+		   rm -f /userdata/system/switch/extra/yuzu/yuzu /userdata/system/switch/slots/yuzu/current 2>/dev/null
 		   cp $temp/yuzu/squashfs-root/usr/bin/yuzu /userdata/system/switch/extra/yuzu/yuzu 2>/dev/null
 		   cp $temp/yuzu/squashfs-root/usr/bin/yuzu-room /userdata/system/switch/extra/yuzu/yuzu-room 2>/dev/null
 		   cd $temp
@@ -946,10 +948,6 @@ if [ -f "$link_yuzu" ]; then
 		   echo 'if [[ "$rom" = "" ]]; then ' >> "$f"
 		   echo '  DRI_PRIME=1 AMD_VULKAN_ICD=RADV DISABLE_LAYER_AMD_SWITCHABLE_GRAPHICS_1=1 LC_ALL=C NO_AT_BRIDGE=1 QT_FONT_DPI=96 QT_SCALE_FACTOR=1 GDK_SCALE=1 LD_LIBRARY_PATH="/userdata/system/switch/extra/yuzu:${LD_LIBRARY_PATH}" QT_PLUGIN_PATH=/usr/lib/qt/plugins:/userdata/system/switch/extra/lib/qt5plugins:/usr/plugins:${QT_PLUGIN_PATH} QT_QPA_PLATFORM_PLUGIN_PATH=${QT_PLUGIN_PATH} XDG_CONFIG_HOME=/userdata/system/configs XDG_CACHE_HOME=/userdata/system/.cache QT_QPA_PLATFORM=xcb /userdata/system/switch/extra/yuzu/yuzu -f -g > >(tee "$log1") 2> >(tee "$log2" >&2) ' >> "$f" 
 		   echo 'else ' >> "$f"
-		   echo '  rm /tmp/switchromname 2>/dev/null ' >> "$f" 
-		   echo '    echo "$rom" >> /tmp/switchromname 2>/dev/null ' >> "$f" 
-		   echo '      /userdata/system/switch/extra/batocera-switch-nsz-converter.sh ' >> "$f" 
-		   echo '    rom="$(cat /tmp/switchromname)" ' >> "$f"
 		   echo '  fs=$(blkid | grep "$(df -h /userdata | awk '\''END {print $1}'\'')" | sed '\''s,^.*TYPE=,,g'\'' | sed '\''s,",,g'\'' | tr '\''a-z'\'' '\''A-Z'\'') ' >> "$f"
 		   echo '  if [[ "$fs" == *"EXT"* ]] || [[ "$fs" == *"BTR"* ]]; then ' >> "$f"
 		   echo '    rm /tmp/yuzurom 2>/dev/null; ln -sf "$rom" "/tmp/yuzurom"; ROM="/tmp/yuzurom"; ' >> "$f"
@@ -1012,6 +1010,8 @@ if [ -f "$link_yuzuEA" ]; then
 		  cp $temp/yuzuea/squashfs-root/usr/lib/libcrypto* /userdata/system/switch/extra/yuzuea/ 2>/dev/null 
 		  cp $temp/yuzuea/squashfs-root/usr/lib/libssl* /userdata/system/switch/extra/yuzuea/ 2>/dev/null 
 		  cp $temp/yuzuea/squashfs-root/usr/lib/libicu* /userdata/system/switch/extra/yuzuea/ 2>/dev/null 
+		  # this install takes over from the install slots of switchutils/slots.py: drop the slot link, not the slot
+		  rm -f /userdata/system/switch/extra/yuzuea/yuzu /userdata/system/switch/slots/yuzuea/current 2>/dev/null
 		  cp $temp/yuzuea/squashfs-root/usr/bin/yuzu /userdata/system/switch/extra/yuzuea/yuzu 2>/dev/null
 		  cp $temp/yuzuea/squashfs-root/usr/bin/yuzu-room /userdata/system/switch/extra/yuzuea/yuzu-room 2>/dev/null
 		  cd $temp
@@ -1060,10 +1060,6 @@ if [ -f "$link_yuzuEA" ]; then
 		  echo 'if [[ "$rom" = "" ]]; then ' >> "$f"
 		  echo '  DRI_PRIME=1 AMD_VULKAN_ICD=RADV DISABLE_LAYER_AMD_SWITCHABLE_GRAPHICS_1=1 LC_ALL=C NO_AT_BRIDGE=1 QT_FONT_DPI=96 QT_SCALE_FACTOR=1 GDK_SCALE=1 LD_LIBRARY_PATH="/userdata/system/switch/extra/yuzuea:${LD_LIBRARY_PATH}" QT_PLUGIN_PATH=/usr/lib/qt/plugins:/userdata/system/switch/extra/lib/qt5plugins:/usr/plugins:${QT_PLUGIN_PATH} QT_QPA_PLATFORM_PLUGIN_PATH=${QT_PLUGIN_PATH} XDG_CONFIG_HOME=/userdata/system/configs XDG_CACHE_HOME=/userdata/system/.cache QT_QPA_PLATFORM=xcb /userdata/system/switch/extra/yuzuea/yuzu -f -g > >(tee "$log1") 2> >(tee "$log2" >&2) ' >> "$f" 
 		  echo 'else ' >> "$f"
-		  echo '  rm /tmp/switchromname 2>/dev/null ' >> "$f" 
-		  echo '    echo "$rom" >> /tmp/switchromname 2>/dev/null ' >> "$f" 
-		  echo '      /userdata/system/switch/extra/batocera-switch-nsz-converter.sh ' >> "$f" 
-		  echo '    rom="$(cat /tmp/switchromname)" ' >> "$f"
 		  echo '  fs=$(blkid | grep "$(df -h /userdata | awk '\''END {print $1}'\'')" | sed '\''s,^.*TYPE=,,g'\'' | sed '\''s,",,g'\'' | tr '\''a-z'\'' '\''A-Z'\'') ' >> "$f"
 		  echo '  if [[ "$fs" == *"EXT"* ]] || [[ "$fs" == *"BTR"* ]]; then ' >> "$f"
 		  echo '    rm /tmp/yuzurom 2>/dev/null; ln -sf "$rom" "/tmp/yuzurom"; ROM="/tmp/yuzurom"; ' >> "$f"
@@ -1168,6 +1164,8 @@ chmod a+x "$startup" 2>/dev/null
 $extra/$emu/startup 2>/dev/null
 # / 
 path_ryujinx=$extra/$emu/Ryujinx.AppImage
+# this install takes over from the install slots of switchutils/slots.py: drop the slot link, not the slot
+rm -f "$path_ryujinx" /userdata/system/switch/slots/ryujinx/current 2>/dev/null
 cp $temp/$emu/publish/Ryujinx $path_ryujinx 2>/dev/null
 chmod a+x "$path_ryujinx" 2>/dev/null
 # make launcher 
@@ -1217,10 +1215,6 @@ echo 'rm $log1 2>/dev/null && rm $log2 2>/dev/null ' >> "$f"
 echo 'ulimit -H -n 819200; ulimit -S -n 819200; ulimit -S -n 819200 Ryujinx.AppImage;' >> "$f"
 
 echo 'rom="$1" ' >> "$f"
-echo 'rm /tmp/switchromname 2>/dev/null ' >> "$f"
-echo 'echo "$rom" >> /tmp/switchromname 2>/dev/null ' >> "$f"
-echo '/userdata/system/switch/extra/batocera-switch-nsz-converter.sh ' >> "$f"
-echo 'rom="$(cat /tmp/switchromname)" ' >> "$f"
 
 echo 'd=/userdata/system/switch/extra/lib/gdk-pixbuf-2.0/2.10.0/loaders ' >> "$f"
 echo 'export LD_LIBRARY_PATH="/userdata/system/switch/extra/lib:/usr/lib:/lib:/usr/lib32:/lib32:$LD_LIBRARY_PATH" ' >> "$f"
@@ -1315,6 +1309,8 @@ $extra/$emu/startup 2>/dev/null
 # /
 # --------------------------------------------------------
 path_ryujinx=$extra/$emu/Ryujinx-LDN.AppImage
+# this install takes over from the install slots of switchutils/slots.py: drop the slot link, not the slot
+rm -f "$path_ryujinx" /userdata/system/switch/slots/ryujinxldn/current 2>/dev/null
 if [[ -f "$temp/$emu/publish/Ryujinx" ]]; then 
    cp $temp/$emu/publish/Ryujinx $path_ryujinx 2>/dev/null
 elif [[ -f "$temp/$emu/publish/Ryujinx.Ava" ]]; then 
@@ -1368,10 +1364,6 @@ echo 'rm $log1 2>/dev/null && rm $log2 2>/dev/null ' >> "$f"
 echo 'ulimit -H -n 819200; ulimit -S -n 819200; ulimit -S -n 819200 Ryujinx-LDN.AppImage;' >> "$f"
 
 echo 'rom="$1" ' >> "$f"
-echo 'rm /tmp/switchromname 2>/dev/null ' >> "$f"
-echo 'echo "$rom" >> /tmp/switchromname 2>/dev/null ' >> "$f"
-echo '/userdata/system/switch/extra/batocera-switch-nsz-converter.sh ' >> "$f"
-echo 'rom="$(cat /tmp/switchromname)" ' >> "$f"
 
 echo 'd=/userdata/system/switch/extra/lib/gdk-pixbuf-2.0/2.10.0/loaders ' >> "$f"
 echo 'export LD_LIBRARY_PATH="/userdata/system/switch/extra/lib:/usr/lib:/lib:/usr/lib32:/lib32:$LD_LIBRARY_PATH" ' >> "$f"
@@ -1469,6 +1461,8 @@ $extra/$emu/startup 2>/dev/null
 # /
 # --------------------------------------------------------
 path_ryujinx=$extra/$emu/Ryujinx-Avalonia.AppImage
+# this install takes over from the install slots of switchutils/slots.py: drop the slot link, not the slot
+rm -f "$path_ryujinx" /userdata/system/switch/slots/ryujinxavalonia/current 2>/dev/null
 cp $temp/$emu/publish/Ryujinx.Ava $path_ryujinx 2>/dev/null
 chmod a+x "$path_ryujinx" 2>/dev/null
 # make launcher 
@@ -1518,10 +1512,6 @@ echo 'rm $log1 2>/dev/null && rm $log2 2>/dev/null ' >> "$f"
 echo 'ulimit -H -n 819200; ulimit -S -n 819200; ulimit -S -n 819200 Ryujinx-Avalonia.AppImage;' >> "$f"
 
 echo 'rom="$1" ' >> "$f"
-echo 'rm /tmp/switchromname 2>/dev/null ' >> "$f"
-echo 'echo "$rom" >> /tmp/switchromname 2>/dev/null ' >> "$f"
-echo '/userdata/system/switch/extra/batocera-switch-nsz-converter.sh ' >> "$f"
-echo 'rom="$(cat /tmp/switchromname)" ' >> "$f"
 
 echo 'd=/userdata/system/switch/extra/lib/gdk-pixbuf-2.0/2.10.0/loaders ' >> "$f"
 #without preload for avalonia
@@ -2335,9 +2325,9 @@ rm "$f" 2>/dev/null
 # 
 echo '#!/bin/bash' >> "$f"
 echo '#' >> "$f"
-#\ check language
-echo '#\ check language ' >> "$f"
-echo '/userdata/system/switch/extra/batocera-switch-translator.sh 2>/dev/null &' >> "$f"
+#\ maintenance jobs (translations, firmware sync, updates, caches) run later, when the system is idle
+echo '#\ maintenance jobs run later, when the system is idle ' >> "$f"
+echo 'PYTHONPATH=/userdata/system/switch/configgen python -m switchutils.scheduler daemon 2>/dev/null &' >> "$f"
 #\ prepare system 
 echo '#\ prepare system ' >> "$f"
 echo 'cp /userdata/system/switch/extra/batocera-switch-rev /usr/bin/rev 2>/dev/null ' >> "$f"
@@ -2622,6 +2612,10 @@ wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/__in
 ##curl -sSf "$url/__init__.py" -o "$path/__init__.py"
 wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuMainlineGenerator.py" "$url/yuzuMainlineGenerator.py"
 ##curl -sSf "$url/yuzuMainlineGenerator.py" -o "$path/yuzuMainlineGenerator.py"
+wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuGenerator.py" "$url/yuzuGenerator.py"
+wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuControllers.py" "$url/yuzuControllers.py"
+wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuMappings.py" "$url/yuzuMappings.py"
+wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/yuzuPaths.py" "$url/yuzuPaths.py"
 # -------------------------------------------------------------------- 
 # FILL /USERDATA/SYSTEM/SWITCH/CONFIGGEN/GENERATORS/RYUJINX
 path=/userdata/system/switch/configgen/generators/ryujinx
@@ -2655,16 +2649,12 @@ fi
       path=/userdata/system/switch/configgen/sdl2
       url=https://raw.githubusercontent.com/ngencokamin/batocera-switch/main/system/switch/configgen/sdl2
          mkdir -p $path 2>/dev/null
-            if [[ ! -e "$path/$file" ]]; then
-               cd $path
-               wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/$file" "$url/$file"
-               ###curl -sSf "$url/$file" -o "$path/$file"
-            else 
-               if [[ "$(wc -c "$path/$file" | awk '{print $1}')" < "5" ]]; then 
-               cd $path
-               wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/$file" "$url/$file"
-               fi
-            fi
+         # refreshed on every update, the bundled modules change with configgen; a failed download keeps the old file
+         if wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/$file.tmp" "$url/$file"; then
+            mv -f "$path/$file.tmp" "$path/$file"
+         else
+            rm -f "$path/$file.tmp" 2>/dev/null
+         fi
    }
       get __init__.py
       get _internal.py
@@ -2718,6 +2708,31 @@ fi
    chmod 777 $path/* 2>/dev/null
 cd ~/
 # -------------------------------------------------------------------- 
+# FILL /USERDATA/SYSTEM/SWITCH/CONFIGGEN/SWITCHUTILS
+# the launcher, the generators and the converter/firmware scripts import this package
+path=/userdata/system/switch/configgen/switchutils
+url=https://raw.githubusercontent.com/ngencokamin/batocera-switch/main/system/switch/configgen/switchutils
+mkdir -p $path 2>/dev/null
+for file in __init__.py bezelCompositor.py bundle.py delta.py firmwareInstaller.py firmwareSync.py frameTimes.py gpuProfile.py hostInfo.py importTime.py launchMetrics.py logAnalyzer.py maintenance.py mirror.py nsz.py nszCache.py saveSnapshots.py scheduler.py sessionDb.py sessionSampler.py slots.py switchPaths.py titleIndex.py updater.py; do
+   if wget -q --tries=10 --no-check-certificate --no-cache --no-cookies -O "$path/$file.tmp" "$url/$file"; then
+      mv -f "$path/$file.tmp" "$path/$file"
+   else
+      rm -f "$path/$file.tmp" 2>/dev/null
+   fi
+done
+# the precompiled bundle of switchutils/bundle.py was built from the old configgen: drop it, the
+# launcher imports the sources until the scheduler builds it again
+rm -f /userdata/system/switch/configgen.*.zip 2>/dev/null
+# -------------------------------------------------------------------- 
+# NSZ CODECS: zstandard and pycryptodomex for switchutils/nsz.py when the image has none, installed
+# here for the python of the image so a launch never runs pip; again after a batocera update changed it
+py=/userdata/system/switch/extra/python
+if ! PYTHONPATH="$py" python -c "import zstandard; from importlib.util import find_spec; assert find_spec('Cryptodome') or find_spec('Crypto')" 2>/dev/null; then
+   rm -rf "$py" 2>/dev/null
+   python -m pip --version 1>/dev/null 2>/dev/null || python -m ensurepip --default-pip 1>/dev/null 2>/dev/null
+   python -m pip install -q --disable-pip-version-check --no-warn-script-location --target "$py" zstandard pycryptodomex 1>/dev/null 2>/dev/null
+fi
+# -------------------------------------------------------------------- 
 # GET RYUJINX 942 libSDL2.so for updated controllers processing 
 rm /userdata/system/switch/extra/batocera-switch-libSDL2.so 2>/dev/null
 mkdir -p /userdata/system/switch/extra/sdl 2>/dev/null